@@ -9,6 +9,9 @@ from posts.models import Post, Group
 def mock_media(settings):
     with tempfile.TemporaryDirectory() as temp_directory:
         settings.MEDIA_ROOT = temp_directory
+        # Миниатюры строятся сразу, а не в фоновом потоке, который может
+        # писать в каталог уже после его удаления.
+        settings.THUMBNAIL_WORKERS = 0
         yield temp_directory
 
 
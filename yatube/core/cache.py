@@ -0,0 +1,174 @@
+"""Кеш-бэкенд со счётчиками попаданий и промахов.
+
+InstrumentedCache оборачивает настоящий бэкенд, указанный в
+OPTIONS['BACKEND'], и считает попадания и промахи чтений. Счётчики
+общие для всех потоков процесса и отдаются представлением
+core.views.cache_metrics; попадания также идут в метрики текущего
+запроса (core.metrics).
+
+PooledPyLibMCCache - memcached через pylibmc с общим на процесс пулом
+из OPTIONS['POOL_SIZE'] соединений: Django держит свой бэкенд в каждом
+потоке, и без пула у каждого потока было бы своё соединение.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.cache.backends.memcached import PyLibMCCache
+from django.utils.module_loading import import_string
+
+from .metrics import record_cache
+
+_MISSING = object()
+
+
+class CacheStats:
+    def __init__(self, name):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def record(self, hits, misses):
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def as_dict(self):
+        total = self.hits + self.misses
+        return {
+            'backend': self.name,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / total, 4) if total else None,
+        }
+
+
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_stats(name):
+    with _stats_lock:
+        if name not in _stats:
+            _stats[name] = CacheStats(name)
+        return _stats[name]
+
+
+class InstrumentedCache(BaseCache):
+    def __init__(self, location, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS', {}))
+        backend = options.pop('BACKEND')
+        params['OPTIONS'] = options.pop('OPTIONS', {})
+        super().__init__(params)
+        self.backend = import_string(backend)(location, params)
+        self.stats = get_stats(f'{backend}:{location}')
+
+    def get(self, key, default=None, version=None):
+        value = self.backend.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.record(0, 1)
+            return default
+        self.record(1, 0)
+        return value
+
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = self.backend.get_many(keys, version=version)
+        self.record(len(found), len(keys) - len(found))
+        return found
+
+    def record(self, hits, misses):
+        self.stats.record(hits, misses)
+        record_cache(hits, misses)
+
+    def add(self, *args, **kwargs):
+        return self.backend.add(*args, **kwargs)
+
+    def set(self, *args, **kwargs):
+        return self.backend.set(*args, **kwargs)
+
+    def touch(self, *args, **kwargs):
+        return self.backend.touch(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self.backend.delete(*args, **kwargs)
+
+    def has_key(self, *args, **kwargs):
+        return self.backend.has_key(*args, **kwargs)
+
+    def incr(self, *args, **kwargs):
+        return self.backend.incr(*args, **kwargs)
+
+    def decr(self, *args, **kwargs):
+        return self.backend.decr(*args, **kwargs)
+
+    def set_many(self, *args, **kwargs):
+        return self.backend.set_many(*args, **kwargs)
+
+    def delete_many(self, *args, **kwargs):
+        return self.backend.delete_many(*args, **kwargs)
+
+    def clear(self):
+        return self.backend.clear()
+
+    def close(self, **kwargs):
+        return self.backend.close(**kwargs)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PooledClient:
+    """Клиент pylibmc, берущий соединение из пула на каждый вызов."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            with self.pool.reserve(block=True) as client:
+                return getattr(client, name)(*args, **kwargs)
+        return call
+
+
+class PooledPyLibMCCache(PyLibMCCache):
+    def __init__(self, server, params):
+        params = dict(params)
+        options = dict(params.get('OPTIONS') or {})
+        self.pool_size = options.pop('POOL_SIZE', 10)
+        params['OPTIONS'] = options
+        super().__init__(server, params)
+
+    @property
+    def _cache(self):
+        key = (tuple(self._servers), repr(sorted(self._options.items())))
+        with _pools_lock:
+            if key not in _pools:
+                _pools[key] = PooledClient(self._lib.ClientPool(
+                    self._lib.Client(self._servers, **self._options),
+                    self.pool_size,
+                ))
+            return _pools[key]
+
+
+def is_shared_cache(alias='default'):
+    """Видят ли записи в кеш другие процессы."""
+    backend = caches[alias]
+    backend = getattr(backend, 'backend', backend)
+    return not isinstance(backend, (LocMemCache, DummyCache))
+
+
+def cache_stats():
+    """Счётчики попаданий по всем инструментированным кешам."""
+    stats = {}
+    for alias in settings.CACHES:
+        backend = caches[alias]
+        if isinstance(backend, InstrumentedCache):
+            stats[alias] = backend.stats.as_dict()
+    return stats
@@ -0,0 +1,98 @@
+import json
+import os
+import statistics
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = (
+        'Сводит профили медленных запросов: время и число запросов по '
+        'представлениям и самые затратные функции.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dir', default=settings.SLOW_REQUEST_PROFILE_DIR,
+            help='Каталог с профилями',
+        )
+        parser.add_argument(
+            '--url-name', help='Только профили этого представления',
+        )
+        parser.add_argument(
+            '--top', type=int, default=20,
+            help='Сколько функций показать',
+        )
+        parser.add_argument(
+            '--folded',
+            help='Записать объединённые свёрнутые стеки для flamegraph.pl '
+                 'или speedscope',
+        )
+
+    def load_profiles(self, directory, url_name):
+        if not os.path.isdir(directory):
+            raise CommandError(f'Нет каталога {directory}.')
+        profiles = []
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.json'):
+                continue
+            with open(os.path.join(directory, name), encoding='utf-8') as f:
+                profile = json.load(f)
+            if url_name is None or profile['url_name'] == url_name:
+                profiles.append(profile)
+        return profiles
+
+    def write_views(self, profiles):
+        by_view = defaultdict(list)
+        for profile in profiles:
+            by_view[profile['url_name']].append(profile)
+        self.stdout.write('Представления:')
+        for name, items in sorted(
+            by_view.items(), key=lambda item: -len(item[1])
+        ):
+            wall = [profile['wall_ms'] for profile in items]
+            queries = [profile['queries'] for profile in items]
+            self.stdout.write(
+                f'  {name:<24} {len(items):5} профилей, '
+                f'median {statistics.median(wall):8.1f} ms, '
+                f'max {max(wall):8.1f} ms, '
+                f'median {statistics.median(queries):5.0f} queries'
+            )
+
+    def write_functions(self, title, counter, total, top):
+        self.stdout.write(f'{title}:')
+        for function, samples in counter.most_common(top):
+            self.stdout.write(
+                f'  {samples / total:6.1%} {samples:7} {function}'
+            )
+
+    def handle(self, *args, **options):
+        profiles = self.load_profiles(options['dir'], options['url_name'])
+        if not profiles:
+            raise CommandError('Профилей не найдено.')
+        stacks = Counter()
+        for profile in profiles:
+            stacks.update(profile['stacks'])
+        own = Counter()
+        inclusive = Counter()
+        for stack, samples in stacks.items():
+            functions = stack.split(';')
+            own[functions[-1]] += samples
+            for function in set(functions):
+                inclusive[function] += samples
+        total = sum(stacks.values()) or 1
+
+        self.write_views(profiles)
+        self.write_functions(
+            'Собственное время', own, total, options['top']
+        )
+        self.write_functions(
+            'Время с вызванными функциями', inclusive, total, options['top']
+        )
+        if options['folded']:
+            with open(options['folded'], 'w', encoding='utf-8') as output:
+                for stack, samples in stacks.most_common():
+                    output.write(f'{stack} {samples}\n')
+            self.stdout.write(f'Стеки записаны в {options["folded"]}')
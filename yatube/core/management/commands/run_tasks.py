@@ -0,0 +1,106 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+from django.utils.module_loading import autodiscover_modules
+
+from core.taskqueue import (
+    DatabaseBroker, enqueue_periodic, get_broker, run_batch, worker_name
+)
+
+
+def work(batch_size, poll_interval, once, stopping=()):
+    """Цикл воркера: пачки задач, пока они есть, затем пауза. Разовый
+    запуск периодические задачи не ставит."""
+    worker = worker_name()
+    processed = 0
+    while not stopping:
+        if not once:
+            enqueue_periodic()
+        claimed = run_batch(worker, batch_size)
+        processed += claimed
+        if not claimed:
+            if once:
+                break
+            close_old_connections()
+            time.sleep(poll_interval)
+    return processed
+
+
+def work_process(batch_size, poll_interval, once):
+    """Воркер-процесс. SIGTERM и SIGINT останавливают его после текущей
+    пачки задач."""
+    stopping = []
+
+    def stop(signum, frame):
+        stopping.append(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    # Соединения родителя не переносятся через fork.
+    connections.close_all()
+    try:
+        return work(batch_size, poll_interval, once, stopping)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        'Запускает воркеры фоновых задач (core.taskqueue), которые берут '
+        'задачи из брокера TASK_BROKER пачками.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов-воркеров',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.TASK_BATCH_SIZE,
+            help='Сколько задач воркер берёт за раз',
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи в этом процессе и выйти',
+        )
+
+    def handle(self, *args, **options):
+        if not isinstance(get_broker(), DatabaseBroker):
+            raise CommandError(
+                'Воркеры нужны только брокеру с очередью, '
+                f'а TASK_BROKER = {settings.TASK_BROKER}.'
+            )
+        autodiscover_modules('tasks')
+        params = (
+            options['batch_size'], options['poll_interval'], options['once']
+        )
+        if options['once']:
+            processed = work(*params)
+            self.stdout.write(f'Выполнено задач: {processed}')
+            return
+        # Отдельные процессы, а не потоки: задачи не делят GIL.
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=work_process, args=params)
+            for _ in range(options['workers'])
+        ]
+
+        def stop(signum, frame):
+            # Воркеры завершат текущие пачки и выйдут.
+            for process in processes:
+                process.terminate()
+
+        for process in processes:
+            process.start()
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
@@ -0,0 +1,225 @@
+"""Метрики запросов по представлениям.
+
+Middleware RequestMetricsMiddleware для доли запросов
+REQUEST_METRICS_SAMPLE_RATE замеряет полное время ответа, число и время
+SQL-запросов, время рендеринга шаблонов и попадания в кеш. Замеры
+складываются в гистограммы по имени представления, общие для всех
+потоков процесса, и отдаются представлением core.views.request_metrics.
+
+Повторы одного и того же SQL за запрос (N+1) пишутся в лог.
+"""
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+TIME_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+MAX_DUPLICATES = 20
+
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        index = next(
+            (i for i, bound in enumerate(self.bounds) if value <= bound),
+            len(self.bounds),
+        )
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+
+    def as_dict(self):
+        """Накопленные счётчики корзин, как в Prometheus."""
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {
+            'buckets': buckets,
+            'sum': round(self.sum, 3),
+            'count': self.count,
+        }
+
+
+class ViewMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.sampled = 0
+        self.wall_ms = Histogram(TIME_BUCKETS)
+        self.db_ms = Histogram(TIME_BUCKETS)
+        self.render_ms = Histogram(TIME_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.duplicate_requests = 0
+        self.duplicates = Counter()
+
+    def record(self, sample, wall_ms):
+        self.sampled += 1
+        self.wall_ms.observe(wall_ms)
+        self.db_ms.observe(sample.db_ms)
+        self.render_ms.observe(sample.render_ms)
+        self.queries.observe(sample.queries)
+        self.cache_hits += sample.cache_hits
+        self.cache_misses += sample.cache_misses
+        duplicates = sample.duplicates()
+        if duplicates:
+            self.duplicate_requests += 1
+        for sql, count in duplicates.items():
+            if sql in self.duplicates or len(self.duplicates) < MAX_DUPLICATES:
+                self.duplicates[sql] = max(self.duplicates[sql], count)
+        return duplicates
+
+    def as_dict(self):
+        return {
+            'requests': self.requests,
+            'sampled': self.sampled,
+            'wall_ms': self.wall_ms.as_dict(),
+            'db_ms': self.db_ms.as_dict(),
+            'render_ms': self.render_ms.as_dict(),
+            'queries': self.queries.as_dict(),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'duplicate_query_requests': self.duplicate_requests,
+            'duplicate_queries': dict(self.duplicates.most_common()),
+        }
+
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+class RequestSample:
+    """Замеры одного запроса; пишутся из обёртки SQL, бэкенда шаблонов
+    и кеша через текущий поток."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0
+        self.render_ms = 0
+        self.render_depth = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_ms += (time.perf_counter() - start) * 1000
+            self.queries += 1
+            self.statements[sql] += 1
+
+    def duplicates(self):
+        threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        return {
+            sql: count for sql, count in self.statements.items()
+            if count >= threshold
+        }
+
+
+def current_sample():
+    """Замеры текущего запроса или None, если он не попал в выборку."""
+    return getattr(_local, 'sample', None)
+
+
+def record_cache(hits, misses):
+    sample = current_sample()
+    if sample is not None:
+        sample.cache_hits += hits
+        sample.cache_misses += misses
+
+
+class RenderTimer:
+    """Считает время рендеринга шаблона верхнего уровня: вложенные
+    рендеры уже входят в него."""
+
+    def __enter__(self):
+        self.sample = current_sample()
+        if self.sample is not None:
+            self.sample.render_depth += 1
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        if self.sample is None:
+            return
+        self.sample.render_depth -= 1
+        if not self.sample.render_depth:
+            self.sample.render_ms += (time.perf_counter() - self.start) * 1000
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<unresolved>'
+    return match.view_name
+
+
+def request_metrics():
+    """Метрики всех представлений, отсортированные по имени."""
+    with _metrics_lock:
+        return {
+            name: _metrics[name].as_dict() for name in sorted(_metrics)
+        }
+
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.REQUEST_METRICS_SAMPLE_RATE
+        if not rate or random.random() >= rate:
+            response = self.get_response(request)
+            self.store(view_name(request), None, 0)
+            return response
+
+        sample = _local.sample = RequestSample()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(sample))
+            start = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                wall_ms = (time.perf_counter() - start) * 1000
+                _local.sample = None
+        self.store(view_name(request), sample, wall_ms)
+        return response
+
+    def store(self, name, sample, wall_ms):
+        with _metrics_lock:
+            metrics = _metrics.get(name)
+            if metrics is None:
+                metrics = _metrics[name] = ViewMetrics()
+            metrics.requests += 1
+            if sample is None:
+                return
+            duplicates = metrics.record(sample, wall_ms)
+        for sql, count in duplicates.items():
+            logger.warning(
+                '%s: один и тот же запрос выполнен %s раз: %s',
+                name, count, sql,
+            )
@@ -0,0 +1,38 @@
+from django.db import models
+
+PENDING = 'pending'
+FAILED = 'failed'
+
+
+class QueuedTask(models.Model):
+    """Задача в очереди DatabaseBroker (core.taskqueue)."""
+    STATUS_CHOICES = (
+        (PENDING, 'Ожидает'),
+        (FAILED, 'Не выполнена'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы в JSON')
+    status = models.CharField(
+        'Статус', max_length=10, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveSmallIntegerField('Попыток', default=0)
+    run_at = models.DateTimeField('Выполнить не раньше')
+    locked_by = models.CharField('Воркер', max_length=100, blank=True)
+    locked_until = models.DateTimeField(
+        'Аренда до', blank=True, null=True
+    )
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Поставлена', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='task_status_run_at_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk}'
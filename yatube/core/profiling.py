@@ -0,0 +1,166 @@
+"""Профилирование медленных запросов сэмплированием стеков.
+
+Включается переменной окружения SLOW_REQUEST_PROFILING. Фоновый поток
+каждые SLOW_REQUEST_PROFILE_INTERVAL_MS снимает стек потоков, которые
+сейчас обрабатывают запросы (sys._current_frames), и считает свёрнутые
+стеки в формате flamegraph.pl: «модуль.функция;...;модуль.функция».
+Профиль сохраняется, только если запрос шёл дольше
+SLOW_REQUEST_THRESHOLD_MS, в каталог SLOW_REQUEST_PROFILE_DIR, где
+остаются SLOW_REQUEST_PROFILE_KEEP последних файлов. Свести профили
+можно командой manage.py aggregate_profiles.
+"""
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from .metrics import view_name
+
+MAX_STACK_DEPTH = 128
+
+
+def fold_stack(frame):
+    """Стек кадра от корня к вершине одной строкой через «;»."""
+    names = []
+    while frame is not None and len(names) < MAX_STACK_DEPTH:
+        code = frame.f_code
+        module = frame.f_globals.get('__name__', code.co_filename)
+        names.append(f'{module}.{getattr(code, "co_qualname", code.co_name)}')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """Общий для процесса поток, который снимает стеки только
+    зарегистрированных потоков; без них он спит."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.targets = {}
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread = None
+
+    def start(self, thread_id):
+        stacks = Counter()
+        with self.lock:
+            self.targets[thread_id] = stacks
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='stack-sampler', daemon=True
+                )
+                self.thread.start()
+        self.active.set()
+        return stacks
+
+    def stop(self, thread_id):
+        with self.lock:
+            stacks = self.targets.pop(thread_id, Counter())
+            if not self.targets:
+                self.active.clear()
+        return stacks
+
+    def run(self):
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            # Под блокировкой: после stop() стеки запроса уже не меняются.
+            with self.lock:
+                for thread_id, stacks in self.targets.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[fold_stack(frame)] += 1
+            del frames
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = StackSampler(
+                settings.SLOW_REQUEST_PROFILE_INTERVAL_MS / 1000
+            )
+        return _sampler
+
+
+def save_profile(profile, directory, keep):
+    """Пишет профиль в каталог и удаляет старые, кроме keep последних."""
+    os.makedirs(directory, exist_ok=True)
+    name = '{}-{}-{}.json'.format(
+        time.strftime('%Y%m%d-%H%M%S'),
+        re.sub(r'[^\w.]+', '-', profile['url_name']).strip('-'),
+        os.getpid(),
+    )
+    path = os.path.join(directory, name)
+    suffix = 1
+    while os.path.exists(path):
+        path = os.path.join(directory, f'{name[:-5]}-{suffix}.json')
+        suffix += 1
+    with open(path, 'w', encoding='utf-8') as output:
+        json.dump(profile, output, ensure_ascii=False)
+    files = sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime_ns,
+    )
+    for entry in files[:max(len(files) - keep, 0)]:
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+    return path
+
+
+class SlowRequestProfilerMiddleware:
+    def __init__(self, get_response):
+        if not settings.SLOW_REQUEST_PROFILING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampler = get_sampler()
+
+    def __call__(self, request):
+        queries = []
+
+        def count_query(execute, sql, params, many, context):
+            queries.append(None)
+            return execute(sql, params, many, context)
+
+        thread_id = threading.get_ident()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count_query))
+            stacks = self.sampler.start(thread_id)
+            start = time.perf_counter()
+            try:
+                response = self.get_response(request)
+            finally:
+                wall_ms = (time.perf_counter() - start) * 1000
+                self.sampler.stop(thread_id)
+
+        if wall_ms >= settings.SLOW_REQUEST_THRESHOLD_MS:
+            save_profile({
+                'url_name': view_name(request),
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'wall_ms': round(wall_ms, 2),
+                'queries': len(queries),
+                'interval_ms': settings.SLOW_REQUEST_PROFILE_INTERVAL_MS,
+                'created': time.time(),
+                'stacks': dict(stacks),
+            }, settings.SLOW_REQUEST_PROFILE_DIR,
+                settings.SLOW_REQUEST_PROFILE_KEEP)
+        return response
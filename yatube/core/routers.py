@@ -0,0 +1,102 @@
+"""Чтение из реплик для представлений только для чтения.
+
+ReplicaRoutingMiddleware выбирает одну реплику на запрос, если
+представление есть в DATABASE_REPLICA_VIEWS, метод безопасный, а у
+пользователя нет cookie DATABASE_PRIMARY_STICKY_COOKIE. ReplicaRouter
+отправляет в неё чтения моделей приложений DATABASE_REPLICA_APPS, а
+запись и всё остальное (кеш в базе, очередь задач) - в основную базу.
+Если за запрос в таблицы этих приложений что-то записано (INSERT, UPDATE
+или DELETE, их видит обёртка запросов основной базы), ответ ставит эту
+cookie на DATABASE_PRIMARY_STICKY_SECONDS: пока реплики догоняют,
+пользователь читает из основной базы и видит свои изменения.
+"""
+import random
+import re
+import threading
+from functools import lru_cache
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+WRITE_RE = re.compile(
+    r'\s*(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|UPDATE|DELETE\s+FROM)\s+["`]?(\w+)',
+    re.IGNORECASE,
+)
+
+_local = threading.local()
+
+
+@lru_cache(maxsize=None)
+def replica_tables():
+    """Таблицы моделей, которые читаются из реплик."""
+    return frozenset(
+        model._meta.db_table
+        for label in settings.DATABASE_REPLICA_APPS
+        for model in apps.get_app_config(label).get_models(
+            include_auto_created=True
+        )
+    )
+
+
+def track_writes(execute, sql, params, many, context):
+    """Обёртка запросов основной базы: отмечает запись в таблицы,
+    которые читаются из реплик."""
+    result = execute(sql, params, many, context)
+    match = WRITE_RE.match(sql)
+    if match and match.group(1) in replica_tables():
+        _local.wrote = True
+    return result
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        replica = getattr(_local, 'replica', None)
+        if (replica is None
+                or model._meta.app_label not in settings.DATABASE_REPLICA_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return replica
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        _local.replica = None
+        _local.wrote = False
+        try:
+            with connections[DEFAULT_DB_ALIAS].execute_wrapper(track_writes):
+                response = self.get_response(request)
+        finally:
+            _local.replica = None
+        if _local.wrote:
+            response.set_cookie(
+                settings.DATABASE_PRIMARY_STICKY_COOKIE, '1',
+                max_age=settings.DATABASE_PRIMARY_STICKY_SECONDS,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in SAFE_METHODS
+                and request.resolver_match.view_name
+                in settings.DATABASE_REPLICA_VIEWS
+                and settings.DATABASE_PRIMARY_STICKY_COOKIE
+                not in request.COOKIES):
+            _local.replica = random.choice(settings.DATABASE_REPLICAS)
@@ -0,0 +1,200 @@
+"""Очередь фоновых задач.
+
+Задача - функция, зарегистрированная декоратором @task. Вызов
+func.delay(**kwargs) передаёт её брокеру TASK_BROKER, а воркеры
+(manage.py run_tasks) забирают задачи пачками и выполняют. Упавшая
+задача повторяется с паузой TASK_RETRY_DELAY, которая удваивается с
+каждой попыткой; после TASK_MAX_ATTEMPTS попыток задача остаётся в
+брокере со статусом failed.
+
+DatabaseBroker хранит задачи в таблице основной базы, поэтому задача,
+поставленная в транзакции, появится только вместе с её данными. Воркер
+берёт задачи в аренду на TASK_LEASE_SECONDS; задачу умершего воркера
+после этого заберёт другой. Доставка «хотя бы один раз»: задачи должны
+переживать повторное выполнение. ImmediateBroker выполняет задачу сразу
+после фиксации транзакции, без воркеров.
+
+Периодические задачи из TASK_PERIODIC ставят в очередь сами воркеры,
+когда подходит срок.
+"""
+import json
+import logging
+import os
+import socket
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import FAILED, PENDING, QueuedTask
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+_brokers = {}
+
+
+class Task:
+    def __init__(self, func, name, max_attempts):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+        self.__doc__ = func.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def __repr__(self):
+        return f'<Task {self.name}>'
+
+    def delay(self, **kwargs):
+        """Ставит задачу в очередь; аргументы должны сериализоваться
+        в JSON."""
+        self.delay_many([kwargs])
+
+    def delay_many(self, kwargs_list):
+        """Ставит в очередь пачку задач одной записью в брокер."""
+        get_broker().enqueue(self.name, [
+            json.dumps(kwargs, sort_keys=True) for kwargs in kwargs_list
+        ])
+
+
+def task(func=None, *, max_attempts=None):
+    """Регистрирует функцию как фоновую задачу."""
+    def decorator(func):
+        wrapped = Task(
+            func, f'{func.__module__}.{func.__name__}', max_attempts
+        )
+        registry[wrapped.name] = wrapped
+        return wrapped
+    if func is not None:
+        return decorator(func)
+    return decorator
+
+
+def get_broker():
+    path = settings.TASK_BROKER
+    if path not in _brokers:
+        _brokers[path] = import_string(path)()
+    return _brokers[path]
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue_periodic():
+    """Ставит в очередь периодические задачи, срок которых подошёл.
+
+    Срок отмечается ключом в кеше на интервал задачи: с общим кешем
+    задачу за интервал поставит один воркер, с кешем в памяти процесса -
+    каждый, поэтому периодические задачи должны переносить повтор.
+    """
+    for name, interval in settings.TASK_PERIODIC.items():
+        if name in registry and cache.add(f'task:periodic:{name}', True,
+                                          interval):
+            registry[name].delay()
+
+
+def execute(name, payload):
+    registered = registry.get(name)
+    if registered is None:
+        raise LookupError(f'Задача {name} не зарегистрирована')
+    registered(**json.loads(payload))
+
+
+class ImmediateBroker:
+    def enqueue(self, name, payloads):
+        for payload in payloads:
+            transaction.on_commit(
+                lambda payload=payload: self.run(name, payload)
+            )
+
+    def run(self, name, payload):
+        try:
+            execute(name, payload)
+        except Exception:
+            logger.exception('Задача %s упала', name)
+
+
+class DatabaseBroker:
+    def enqueue(self, name, payloads):
+        now = timezone.now()
+        QueuedTask.objects.bulk_create(
+            QueuedTask(name=name, payload=payload, run_at=now)
+            for payload in payloads
+        )
+
+    def claim(self, worker, limit):
+        """Берёт в аренду до limit готовых задач. Условие аренды
+        повторяется в UPDATE, поэтому задачу, которую одновременно
+        выбрали два воркера, получит только один."""
+        now = timezone.now()
+        lease = now + timedelta(seconds=settings.TASK_LEASE_SECONDS)
+        ready = QueuedTask.objects.filter(
+            Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+            status=PENDING,
+            run_at__lte=now,
+        )
+        ids = list(
+            ready.order_by('run_at').values_list('pk', flat=True)[:limit]
+        )
+        if not ids:
+            return []
+        ready.filter(pk__in=ids).update(locked_by=worker, locked_until=lease)
+        return list(QueuedTask.objects.filter(
+            pk__in=ids, locked_by=worker, locked_until=lease
+        ).order_by('run_at'))
+
+    def complete(self, queued):
+        QueuedTask.objects.filter(pk=queued.pk).delete()
+
+    def retry(self, queued, error, delay):
+        QueuedTask.objects.filter(pk=queued.pk).update(
+            attempts=queued.attempts + 1,
+            run_at=timezone.now() + timedelta(seconds=delay),
+            locked_by='',
+            locked_until=None,
+            last_error=error,
+        )
+
+    def fail(self, queued, error):
+        QueuedTask.objects.filter(pk=queued.pk).update(
+            attempts=queued.attempts + 1,
+            status=FAILED,
+            locked_by='',
+            locked_until=None,
+            last_error=error,
+        )
+
+
+def run_batch(worker, limit):
+    """Выполняет пачку задач; возвращает число взятых задач."""
+    broker = get_broker()
+    claimed = broker.claim(worker, limit)
+    for queued in claimed:
+        try:
+            execute(queued.name, queued.payload)
+        except Exception:
+            error = traceback.format_exc()
+            registered = registry.get(queued.name)
+            max_attempts = (
+                registered and registered.max_attempts
+                or settings.TASK_MAX_ATTEMPTS
+            )
+            if queued.attempts + 1 >= max_attempts:
+                logger.error('Задача %s не выполнена:\n%s', queued, error)
+                broker.fail(queued, error)
+            else:
+                broker.retry(
+                    queued, error,
+                    settings.TASK_RETRY_DELAY * 2 ** queued.attempts,
+                )
+        else:
+            broker.complete(queued)
+    return len(claimed)
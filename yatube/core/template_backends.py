@@ -0,0 +1,30 @@
+"""Бэкенд шаблонов Django с замером времени рендеринга.
+
+Время пишется в метрики текущего запроса (core.metrics), если запрос
+попал в выборку.
+"""
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+from .metrics import RenderTimer
+
+
+class InstrumentedTemplate(Template):
+    def render(self, context=None, request=None):
+        with RenderTimer():
+            return super().render(context, request)
+
+
+class InstrumentedTemplates(DjangoTemplates):
+    def from_string(self, template_code):
+        return InstrumentedTemplate(
+            self.engine.from_string(template_code), self
+        )
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(
+                self.engine.get_template(template_name), self
+            )
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
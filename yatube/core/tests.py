@@ -1,5 +1,41 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.core.cache.backends.db import BaseDatabaseCache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connection, connections, router
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import (
+    RequestFactory, SimpleTestCase, TestCase, override_settings
+)
+from django.http import HttpResponse
+from django.urls import resolve, reverse
 from http import HTTPStatus
+from unittest import mock
+
+from posts.models import Post
+
+from .cache import PooledPyLibMCCache, is_shared_cache
+from .models import FAILED, QueuedTask
+from .metrics import RequestMetricsMiddleware, request_metrics, reset_metrics
+from .profiling import SlowRequestProfilerMiddleware, StackSampler
+from .routers import ReplicaRoutingMiddleware, track_writes
+from .taskqueue import enqueue_periodic, get_broker, run_batch, task
+
+TEMP_CACHE_DIR = tempfile.mkdtemp()
 
 
 class ViewTestClass(TestCase):
@@ -9,3 +45,450 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.InstrumentedCache',
+        'LOCATION': TEMP_CACHE_DIR,
+        'KEY_PREFIX': 'test',
+        'OPTIONS': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        },
+    }
+})
+class InstrumentedCacheTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_CACHE_DIR, ignore_errors=True)
+
+    def setUp(self):
+        self.cache = caches['default']
+        self.cache.clear()
+
+    def test_hits_and_misses_counted(self):
+        """Чтения из кеша учитываются как попадания и промахи"""
+        stats = self.cache.stats
+        hits, misses = stats.hits, stats.misses
+        self.assertIsNone(self.cache.get('key'))
+        self.cache.set('key', 'value')
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.cache.get_many(['key', 'other'])
+        self.assertEqual(stats.hits - hits, 2)
+        self.assertEqual(stats.misses - misses, 2)
+
+    def test_file_cache_is_shared(self):
+        """Файловый кеш считается общим для процессов"""
+        self.assertTrue(is_shared_cache())
+
+    def test_cache_metrics_view(self):
+        """Счётчики кеша доступны с внутренних адресов"""
+        self.cache.get('key')
+        response = self.client.get(reverse('core:cache_metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertGreaterEqual(response.json()['default']['misses'], 1)
+
+    def test_cache_metrics_hidden_from_outside(self):
+        """Счётчики кеша не видны с внешних адресов"""
+        response = self.client.get(
+            reverse('core:cache_metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    @override_settings(CACHES={
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    })
+    def test_locmem_cache_is_local(self):
+        """Кеш в памяти процесса не считается общим"""
+        self.assertFalse(is_shared_cache())
+
+
+class FakeMemcachedClient(dict):
+    def __init__(self, servers, **options):
+        self.options = options
+
+    def set(self, key, value, timeout):
+        self[key] = value
+        return True
+
+
+class FakeClientPool:
+    def __init__(self, client, size):
+        self.client = client
+        self.size = size
+        self.reserved = 0
+
+    @contextmanager
+    def reserve(self, block=False):
+        self.reserved += 1
+        yield self.client
+
+
+class PooledMemcachedTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(sys.modules, pylibmc=SimpleNamespace(
+            Client=FakeMemcachedClient, ClientPool=FakeClientPool,
+            NotFound=KeyError,
+        ))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_threads_share_pool(self):
+        """Бэкенды разных потоков берут соединения из одного пула"""
+        params = {'OPTIONS': {'POOL_SIZE': 3, 'binary': True}}
+        backends = [
+            PooledPyLibMCCache('127.0.0.1:11311', params) for _ in range(2)
+        ]
+        backends[0].set('key', 'value')
+        self.assertEqual(backends[1].get('key'), 'value')
+        pool = backends[0]._cache.pool
+        self.assertIs(backends[1]._cache.pool, pool)
+        self.assertEqual(pool.size, 3)
+        self.assertEqual(pool.reserved, 2)
+        self.assertEqual(pool.client.options, {'binary': True})
+
+
+class SQLitePragmaTests(TestCase):
+    def test_profile_applied_to_new_connections(self):
+        """Новое соединение с SQLite получает PRAGMA из SQLITE_PRAGMAS"""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        wrapper = DatabaseWrapper({
+            **connection.settings_dict,
+            'NAME': os.path.join(directory.name, 'db.sqlite3'),
+        }, alias='pragmas')
+        self.addCleanup(wrapper.close)
+        with override_settings(SQLITE_PRAGMAS=settings.SQLITE_PROFILES['wal']):
+            wrapper.ensure_connection()
+
+        def pragma(name):
+            return wrapper.connection.execute(f'PRAGMA {name}').fetchone()[0]
+
+        self.assertEqual(pragma('journal_mode'), 'wal')
+        self.assertEqual(pragma('synchronous'), 1)
+        self.assertEqual(pragma('busy_timeout'), 5000)
+        self.assertEqual(pragma('cache_size'), -64 * 1024)
+
+
+class RequestMetricsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = get_user_model().objects.create_user(username='author')
+        Post.objects.create(author=author, text='Тестовый пост')
+
+    def setUp(self):
+        caches['default'].clear()
+        reset_metrics()
+
+    def test_view_metrics_recorded(self):
+        """Время, SQL, рендеринг и кеш считаются по имени представления"""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        metrics = request_metrics()['posts:index']
+        self.assertEqual(metrics['requests'], 2)
+        self.assertEqual(metrics['sampled'], 2)
+        self.assertEqual(metrics['wall_ms']['count'], 2)
+        self.assertEqual(metrics['wall_ms']['buckets']['+Inf'], 2)
+        self.assertGreater(metrics['queries']['sum'], 0)
+        self.assertGreater(metrics['render_ms']['sum'], 0)
+        self.assertLessEqual(
+            metrics['render_ms']['sum'], metrics['wall_ms']['sum']
+        )
+        self.assertGreater(
+            metrics['cache_hits'] + metrics['cache_misses'], 0
+        )
+        self.assertEqual(metrics['duplicate_query_requests'], 0)
+
+    @override_settings(REQUEST_METRICS_SAMPLE_RATE=0)
+    def test_sampling_disabled(self):
+        """Вне выборки запрос только учитывается в числе запросов"""
+        self.client.get(reverse('posts:index'))
+        metrics = request_metrics()['posts:index']
+        self.assertEqual(metrics['requests'], 1)
+        self.assertEqual(metrics['sampled'], 0)
+        self.assertEqual(metrics['wall_ms']['count'], 0)
+
+    @override_settings(REQUEST_METRICS_DUPLICATE_THRESHOLD=3)
+    def test_duplicate_queries_logged(self):
+        """Повторы одного SQL за запрос попадают в метрики и в лог"""
+        User = get_user_model()
+
+        def view(request):
+            for pk in range(3):
+                User.objects.filter(pk=pk).exists()
+            return None
+
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/')
+        with self.assertLogs('core.metrics', 'WARNING'):
+            RequestMetricsMiddleware(view)(request)
+        metrics = request_metrics()['posts:index']
+        self.assertEqual(metrics['queries']['sum'], 3)
+        self.assertEqual(metrics['duplicate_query_requests'], 1)
+        self.assertEqual(list(metrics['duplicate_queries'].values()), [3])
+
+    def test_request_metrics_view(self):
+        """Метрики запросов доступны с внутренних адресов"""
+        self.client.get(reverse('posts:index'))
+        response = self.client.get(reverse('core:request_metrics'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('posts:index', response.json())
+        response = self.client.get(
+            reverse('core:request_metrics'), REMOTE_ADDR='10.0.0.1'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+def busy_view(request):
+    get_user_model().objects.exists()
+    deadline = time.perf_counter() + 0.05
+    while time.perf_counter() < deadline:
+        pass
+    return HttpResponse()
+
+
+class SlowRequestProfilerTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def request(self):
+        request = RequestFactory().get('/')
+        request.resolver_match = resolve('/')
+        SlowRequestProfilerMiddleware(busy_view)(request)
+
+    def profiles(self):
+        return sorted(os.listdir(self.directory))
+
+    def test_sampler_collects_stacks(self):
+        """Сэмплер снимает стеки только зарегистрированного потока"""
+        sampler = StackSampler(0.001)
+        stacks = sampler.start(threading.get_ident())
+        busy_view(None)
+        self.assertEqual(sampler.stop(threading.get_ident()), stacks)
+        self.assertTrue(any(
+            stack.endswith('core.tests.busy_view') for stack in stacks
+        ))
+
+    def test_slow_request_profiled(self):
+        """Профиль медленного запроса сохраняется с числом SQL-запросов,
+        в каталоге остаются только последние профили"""
+        with override_settings(
+            SLOW_REQUEST_PROFILING=True, SLOW_REQUEST_THRESHOLD_MS=10,
+            SLOW_REQUEST_PROFILE_DIR=self.directory,
+            SLOW_REQUEST_PROFILE_KEEP=2,
+        ):
+            for _ in range(3):
+                self.request()
+        self.assertEqual(len(self.profiles()), 2)
+        with open(os.path.join(self.directory, self.profiles()[0])) as f:
+            profile = json.load(f)
+        self.assertEqual(profile['url_name'], 'posts:index')
+        self.assertEqual(profile['queries'], 1)
+        self.assertGreaterEqual(profile['wall_ms'], 50)
+        self.assertTrue(profile['stacks'])
+
+        output = StringIO()
+        call_command(
+            'aggregate_profiles', dir=self.directory, stdout=output
+        )
+        self.assertIn('posts:index', output.getvalue())
+        self.assertIn('core.tests.busy_view', output.getvalue())
+
+    def test_fast_request_not_profiled(self):
+        """Быстрые запросы не сохраняются, выключенный профайлер
+        не подключается"""
+        with override_settings(
+            SLOW_REQUEST_PROFILING=True, SLOW_REQUEST_THRESHOLD_MS=10000,
+            SLOW_REQUEST_PROFILE_DIR=self.directory,
+        ):
+            self.request()
+        self.assertEqual(self.profiles(), [])
+        with override_settings(SLOW_REQUEST_PROFILING=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                SlowRequestProfilerMiddleware(busy_view)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRoutingTests(SimpleTestCase):
+    def route(self, path='/', method='get', cookies=None, sql=None,
+              model=Post):
+        """База чтения внутри представления и ответ middleware; sql -
+        запрос, который представление выполняет в основной базе."""
+        databases = []
+
+        def view(request):
+            router.db_for_write(model)
+            if sql:
+                wrappers = connections[DEFAULT_DB_ALIAS].execute_wrappers
+                self.assertIn(track_writes, wrappers)
+                track_writes(lambda *args: None, sql, (), False, {})
+            databases.append(router.db_for_read(model))
+            return HttpResponse()
+
+        def get_response(request):
+            middleware.process_view(request, view, (), {})
+            return view(request)
+
+        request = getattr(RequestFactory(), method)(path)
+        request.resolver_match = resolve(path)
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaRoutingMiddleware(get_response)
+        response = middleware(request)
+        return databases[0], response
+
+    def test_read_views_use_replica(self):
+        """Ленты и страницы постов читаются из реплики"""
+        database, response = self.route()
+        self.assertEqual(database, 'replica1')
+        self.assertNotIn('use_primary', response.cookies)
+        self.assertEqual(router.db_for_read(Post), DEFAULT_DB_ALIAS)
+
+    def test_writes_and_other_views_use_primary(self):
+        """Запросы на запись и прочие представления идут в основную базу"""
+        for path, method in (('/', 'post'), ('/create/', 'get')):
+            with self.subTest(path=path, method=method):
+                database, _ = self.route(path, method)
+                self.assertEqual(database, DEFAULT_DB_ALIAS)
+        with mock.patch.object(
+            connections[DEFAULT_DB_ALIAS], 'in_atomic_block', True
+        ):
+            database, _ = self.route()
+        self.assertEqual(database, DEFAULT_DB_ALIAS)
+
+    def test_primary_sticky_after_write(self):
+        """После записи пользователь какое-то время читает из основной
+        базы"""
+        _, response = self.route(
+            method='post', sql='INSERT INTO "posts_post" ("text") VALUES (%s)'
+        )
+        cookie = response.cookies['use_primary']
+        self.assertEqual(
+            cookie['max-age'], settings.DATABASE_PRIMARY_STICKY_SECONDS
+        )
+        database, _ = self.route(cookies={'use_primary': cookie.value})
+        self.assertEqual(database, DEFAULT_DB_ALIAS)
+
+    def test_cache_and_queue_use_primary(self):
+        """Кеш в базе и очередь задач читаются из основной базы, а запись
+        в них не переключает пользователя на основную базу"""
+        cache_entry = BaseDatabaseCache('yatube_cache', {}).cache_model_class
+        for model in (cache_entry, QueuedTask):
+            with self.subTest(model=model.__name__):
+                database, response = self.route(
+                    model=model,
+                    sql=f'UPDATE "{model._meta.db_table}" SET "expires" = %s',
+                )
+                self.assertEqual(database, DEFAULT_DB_ALIAS)
+                self.assertNotIn('use_primary', response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_disabled_without_replicas(self):
+        """Без реплик middleware не подключается"""
+        with self.assertRaises(MiddlewareNotUsed):
+            ReplicaRoutingMiddleware(HttpResponse)
+
+
+task_calls = []
+
+
+@task
+def record_call(value):
+    task_calls.append(value)
+
+
+@task(max_attempts=3)
+def broken_task():
+    raise ValueError('сломано')
+
+
+@override_settings(TASK_BROKER='core.taskqueue.DatabaseBroker')
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        task_calls.clear()
+
+    def run_tasks(self):
+        out = StringIO()
+        call_command('run_tasks', once=True, stdout=out)
+        return out.getvalue()
+
+    def test_tasks_run_and_removed(self):
+        """Воркер выполняет поставленные задачи и удаляет их из очереди"""
+        record_call.delay(value=1)
+        record_call.delay_many([{'value': 2}, {'value': 3}])
+        self.assertEqual(QueuedTask.objects.count(), 3)
+        self.assertIn('Выполнено задач: 3', self.run_tasks())
+        self.assertEqual(task_calls, [1, 2, 3])
+        self.assertFalse(QueuedTask.objects.exists())
+
+    @override_settings(TASK_RETRY_DELAY=0)
+    def test_retry_then_fail(self):
+        """Упавшая задача повторяется, после max_attempts остаётся со
+        статусом failed и текстом ошибки"""
+        broken_task.delay()
+        for attempt in range(1, 3):
+            run_batch('worker', 10)
+            queued = QueuedTask.objects.get()
+            self.assertEqual(queued.attempts, attempt)
+            self.assertNotEqual(queued.status, FAILED)
+            self.assertIsNone(queued.locked_until)
+        run_batch('worker', 10)
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, FAILED)
+        self.assertIn('ValueError: сломано', queued.last_error)
+        self.assertEqual(run_batch('worker', 10), 0)
+
+    def test_retry_delay_grows(self):
+        """Пауза перед повтором удваивается с каждой попыткой"""
+        broken_task.delay()
+        QueuedTask.objects.update(attempts=1)
+        run_batch('worker', 10)
+        queued = QueuedTask.objects.get()
+        delay = (queued.run_at - queued.created).total_seconds()
+        self.assertGreaterEqual(delay, settings.TASK_RETRY_DELAY * 2)
+
+    def test_claim_lease(self):
+        """Задачу в аренде не берёт другой воркер, пока аренда не
+        истекла"""
+        record_call.delay_many([{'value': 1}, {'value': 2}])
+        broker = get_broker()
+        first = broker.claim('first', 1)
+        self.assertEqual(len(first), 1)
+        second = broker.claim('second', 10)
+        self.assertEqual(len(second), 1)
+        self.assertNotEqual(first[0].pk, second[0].pk)
+        self.assertEqual(broker.claim('third', 10), [])
+        QueuedTask.objects.filter(pk=first[0].pk).update(
+            locked_until=first[0].locked_until - timedelta(
+                seconds=settings.TASK_LEASE_SECONDS + 1
+            )
+        )
+        self.assertEqual(
+            [queued.pk for queued in broker.claim('third', 10)],
+            [first[0].pk],
+        )
+
+    @override_settings(TASK_PERIODIC={'core.tests.record_call': 60})
+    def test_periodic_enqueued_once_per_interval(self):
+        """Периодическая задача ставится раз в интервал"""
+        cache.clear()
+        enqueue_periodic()
+        enqueue_periodic()
+        self.assertEqual(
+            list(QueuedTask.objects.values_list('name', flat=True)),
+            ['core.tests.record_call'],
+        )
+
+    @override_settings(TASK_BROKER='core.taskqueue.ImmediateBroker')
+    def test_immediate_broker_needs_no_workers(self):
+        """ImmediateBroker не ставит задачи в очередь, а воркеры с ним не
+        запускаются"""
+        record_call.delay(value=1)
+        self.assertFalse(QueuedTask.objects.exists())
+        with self.assertRaises(CommandError):
+            self.run_tasks()
@@ -0,0 +1,9 @@
+from django.urls import path
+from . import views
+
+app_name = 'core'
+
+urlpatterns = [
+    path('cache/', views.cache_metrics, name='cache_metrics'),
+    path('requests/', views.request_metrics, name='request_metrics'),
+]
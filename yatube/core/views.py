@@ -1,5 +1,10 @@
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import render
 
+from .cache import cache_stats
+from .metrics import request_metrics as collected_request_metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +20,19 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def check_metrics_access(request):
+    if not (request.user.is_staff
+            or request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS):
+        raise Http404
+
+
+def cache_metrics(request):
+    check_metrics_access(request)
+    return JsonResponse(cache_stats())
+
+
+def request_metrics(request):
+    check_metrics_access(request)
+    return JsonResponse(collected_request_metrics())
@@ -1,16 +1,76 @@
 from django.contrib import admin
 from .models import Post, Group, Comment, Follow
+from .paginators import EstimatedCountPaginator
+from .search import filter_matching, query_terms
 
 
-class PostAdmin(admin.ModelAdmin):
+class LargeTableAdmin(admin.ModelAdmin):
+    """Список без COUNT(*) по всей таблице и без выпадающих списков
+    со всеми строками связанных таблиц."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(
+            db_field, request, **kwargs
+        )
+        if formfield is not None and db_field.name in self.list_editable:
+            # Форма списка копируется для каждой строки вместе с готовым
+            # списком вариантов, и связанная таблица читается один раз.
+            formfield.choices = list(iter(formfield.choices))
+        return formfield
+
+
+class IndexedSearchMixin:
+    """Поиск по тексту через поисковый индекс вместо LIKE '%...%'."""
+    search_in_comments = False
+
+    def get_search_results(self, request, queryset, search_term):
+        terms = query_terms(search_term)
+        if not terms:
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return filter_matching(
+            queryset, terms, self.search_in_comments
+        ), False
+
+
+class PostAdmin(IndexedSearchMixin, LargeTableAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     list_editable = ('group',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author',)
     empty_value_display = '-пусто-'
 
 
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('title', 'slug', 'post_count')
+    search_fields = ('title', 'slug')
+
+
+class CommentAdmin(IndexedSearchMixin, LargeTableAdmin):
+    list_display = ('pk', 'text', 'pub_date', 'author', 'post')
+    list_select_related = ('author', 'post')
+    search_fields = ('text',)
+    search_in_comments = True
+    date_hierarchy = 'pub_date'
+    # Порядок ключа совпадает с порядком дат, но не требует сортировки.
+    ordering = ('-pk',)
+    autocomplete_fields = ('author', 'post')
+
+
+class FollowAdmin(LargeTableAdmin):
+    list_display = ('pk', 'user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('=user__username', '=author__username')
+    autocomplete_fields = ('user', 'author')
+
+
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
-admin.site.register(Comment)
-admin.site.register(Follow)
+admin.site.register(Group, GroupAdmin)
+admin.site.register(Comment, CommentAdmin)
+admin.site.register(Follow, FollowAdmin)
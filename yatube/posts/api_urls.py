@@ -0,0 +1,24 @@
+from django.urls import path
+from . import api_views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', api_views.post_list, name='post_list'),
+    path('posts/<int:post_id>/', api_views.post_detail, name='post_detail'),
+    path(
+        'posts/<int:post_id>/comments/',
+        api_views.comment_list,
+        name='comment_list'
+    ),
+    path(
+        'groups/<slug:slug>/posts/',
+        api_views.group_posts,
+        name='group_posts'
+    ),
+    path(
+        'profiles/<str:username>/posts/',
+        api_views.profile_posts,
+        name='profile_posts'
+    ),
+]
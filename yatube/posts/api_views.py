@@ -0,0 +1,112 @@
+"""JSON API лент только для чтения.
+
+Списки листаются курсорами (?cursor=), поля ответа - только нужные
+клиенту. ETag ленты строится из её поколения в кеше (feed_cache), а
+ETag и Last-Modified поста - из update_date и комментариев, поэтому
+повторный опрос без изменений получает 304 без запроса строк постов.
+"""
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.views.decorators.http import condition, require_safe
+
+from .conditional import post_last_modified, post_state
+from .feed_cache import GROUP_FEED, INDEX_FEED, PROFILE_FEED, feed_version
+from .models import Comment, Group, Post, User
+from .paginators import CursorPaginator
+
+JSON_PARAMS = {'ensure_ascii': False, 'separators': (',', ':')}
+
+
+def post_data(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'pub_date': post.pub_date.isoformat(),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+        'comments': post.comment_count,
+    }
+
+
+def comment_data(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'pub_date': comment.pub_date.isoformat(),
+        'author': comment.author.username,
+        'parent': comment.parent_id,
+    }
+
+
+def page_response(request, queryset, serialize):
+    paginator = CursorPaginator(queryset, settings.API_PAGE_SIZE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'results': [serialize(item) for item in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    }, json_dumps_params=JSON_PARAMS)
+
+
+def feed_etag(request, feed, pk=None):
+    return f'{feed_version(feed, pk)}:{request.GET.get("cursor", "")}'
+
+
+def group_id(slug):
+    return get_object_or_404(Group.objects.only('pk'), slug=slug).pk
+
+
+def author_id(username):
+    return get_object_or_404(User.objects.only('pk'), username=username).pk
+
+
+def post_etag(request, post_id):
+    state = post_state(request, post_id)
+    if state is None:
+        return None
+    update_date, comment_count, _, slug = state
+    return '{}:{}:{}:{}:{}'.format(
+        post_id, update_date.timestamp(), comment_count, slug,
+        request.GET.get('cursor', ''),
+    )
+
+
+@require_safe
+@condition(etag_func=lambda request: feed_etag(request, INDEX_FEED))
+def post_list(request):
+    return page_response(request, Post.objects.all(), post_data)
+
+
+@require_safe
+@condition(etag_func=lambda request, slug: feed_etag(
+    request, GROUP_FEED, group_id(slug)
+))
+def group_posts(request, slug):
+    posts = Post.objects.filter(group_id=group_id(slug))
+    return page_response(request, posts, post_data)
+
+
+@require_safe
+@condition(etag_func=lambda request, username: feed_etag(
+    request, PROFILE_FEED, author_id(username)
+))
+def profile_posts(request, username):
+    posts = Post.objects.filter(author_id=author_id(username))
+    return page_response(request, posts, post_data)
+
+
+@require_safe
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return JsonResponse(post_data(post), json_dumps_params=JSON_PARAMS)
+
+
+@require_safe
+@condition(etag_func=post_etag, last_modified_func=post_last_modified)
+def comment_list(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    comments = Comment.objects.filter(post_id=post_id)
+    return page_response(request, comments, comment_data)
@@ -0,0 +1,211 @@
+"""Нагрузочный замер страниц posts через тестовый клиент или сервер WSGI.
+
+Каждый сценарий - один URL из posts/urls.py. Для него считаются
+перцентили времени ответа и число SQL-запросов, а отчёт в JSON можно
+сравнить с сохранённым базовым отчётом и найти регрессии.
+"""
+import statistics
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPErrorProcessor, Request, build_opener
+from wsgiref.simple_server import WSGIRequestHandler, make_server
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+QUERIES_HEADER = 'X-Benchmark-Queries'
+PERCENTILES = (50, 90, 95, 99)
+# Адрес не из INTERNAL_IPS, чтобы не замерять debug toolbar.
+REMOTE_ADDR = '192.0.2.1'
+
+
+def percentile(values, q):
+    """Перцентиль q (0-100) с линейной интерполяцией."""
+    values = sorted(values)
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (
+        position - lower
+    )
+
+
+def summarize(method, path, statuses, timings, queries):
+    """Сводка замеров одного сценария для отчёта."""
+    latency = {
+        f'p{q}': round(percentile(timings, q), 2) for q in PERCENTILES
+    }
+    latency['mean'] = round(statistics.mean(timings), 2)
+    latency['max'] = round(max(timings), 2)
+    return {
+        'method': method,
+        'path': path,
+        'status': statuses[-1],
+        'requests': len(timings),
+        'latency_ms': latency,
+        'queries': {
+            'per_request': statistics.median_low(queries),
+            'max': max(queries),
+            'total': sum(queries),
+        },
+    }
+
+
+def compare_reports(baseline, report, tolerance=0.25, min_delta_ms=5):
+    """Список регрессий отчёта относительно базового.
+
+    Время сравнивается по p95: регрессией считается рост больше чем
+    в 1 + tolerance раз и больше чем на min_delta_ms, чтобы шум на
+    быстрых страницах не ронял сборку. Число запросов на страницу
+    детерминировано, поэтому регрессия - любой его рост.
+    """
+    regressions = []
+    for name, result in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        if result['status'] != base['status']:
+            regressions.append(
+                f'{name}: статус {base["status"]} -> {result["status"]}'
+            )
+        old = base['latency_ms']['p95']
+        new = result['latency_ms']['p95']
+        if new > old * (1 + tolerance) and new - old > min_delta_ms:
+            regressions.append(f'{name}: p95 {old} -> {new} мс')
+        old = base['queries']['per_request']
+        new = result['queries']['per_request']
+        if new > old:
+            regressions.append(f'{name}: запросов {old} -> {new}')
+    return regressions
+
+
+class TestClientTransport:
+    """Запросы через django.test.Client в этом же процессе."""
+
+    mode = 'client'
+
+    def __init__(self, user):
+        self.client = Client(REMOTE_ADDR=REMOTE_ADDR)
+        self.client.force_login(user)
+
+    def request(self, method, path, data=None):
+        """Возвращает (статус, число SQL-запросов)."""
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method.lower())(path, data)
+        return response.status_code, len(queries)
+
+    def close(self):
+        pass
+
+
+def count_queries(application):
+    """Обёртка WSGI-приложения, которая отдаёт число SQL-запросов
+    в заголовке QUERIES_HEADER."""
+    def wrapper(environ, start_response):
+        queries = []
+
+        def execute(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        def counting_start_response(status, headers, exc_info=None):
+            headers.append((QUERIES_HEADER, str(len(queries))))
+            return start_response(status, headers, exc_info)
+
+        environ['REMOTE_ADDR'] = REMOTE_ADDR
+        with connection.execute_wrapper(execute):
+            return application(environ, counting_start_response)
+    return wrapper
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class NoRedirectProcessor(HTTPErrorProcessor):
+    def http_response(self, request, response):
+        return response
+
+    https_response = http_response
+
+
+class ServerTransport:
+    """Запросы по HTTP к серверу wsgiref, запущенному в отдельном
+    потоке. CSRF-токен берётся из cookie, как в браузере."""
+
+    mode = 'server'
+
+    def __init__(self, user):
+        self.server = make_server(
+            '127.0.0.1', 0, count_queries(get_wsgi_application()),
+            handler_class=QuietHandler,
+        )
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, daemon=True
+        )
+        self.thread.start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        self.opener = build_opener(NoRedirectProcessor)
+        client = Client()
+        client.force_login(user)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME:
+                client.cookies[settings.SESSION_COOKIE_NAME].value,
+        }
+        # Форма создания поста выставляет cookie с CSRF-токеном.
+        self.request('GET', reverse('posts:post_create'))
+
+    def request(self, method, path, data=None):
+        """Возвращает (статус, число SQL-запросов)."""
+        headers = {
+            'Cookie': '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        }
+        body = None
+        if method == 'POST':
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get(
+                settings.CSRF_COOKIE_NAME, ''
+            )
+            body = urlencode(data or {}).encode()
+        request = Request(
+            self.base_url + path, data=body, headers=headers, method=method
+        )
+        try:
+            response = self.opener.open(request)
+        except HTTPError as error:
+            response = error
+        with response:
+            response.read()
+            cookie = SimpleCookie()
+            for header in response.headers.get_all('Set-Cookie') or ():
+                cookie.load(header)
+            self.cookies.update(
+                (name, morsel.value) for name, morsel in cookie.items()
+            )
+            return response.status, int(response.headers[QUERIES_HEADER])
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def measure(transport, method, path, data=None, repeat=20, warmup=1):
+    """Выполняет запрос warmup + repeat раз и сводит замеры."""
+    for _ in range(warmup):
+        transport.request(method, path, data)
+    statuses, timings, queries = [], [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        status, count = transport.request(method, path, data)
+        timings.append((time.perf_counter() - start) * 1000)
+        statuses.append(status)
+        queries.append(count)
+    return summarize(method, path, statuses, timings, queries)
@@ -0,0 +1,164 @@
+"""Валидаторы условных GET и заголовки кеширования страниц.
+
+ETag страниц собирается из поколения ленты (feed_cache), счётчиков и
+update_date одним узким запросом, без загрузки постов, и включает
+пользователя: разметка у каждого своя. Анонимные ответы без cookie
+может хранить общий прокси, ответы вошедшим пользователям - только
+браузер, и тот перепроверяет их при каждом показе.
+"""
+import zlib
+from functools import wraps
+
+from django.conf import settings
+from django.db.models import Max
+from django.shortcuts import get_object_or_404
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+from .counters import get_counters
+from .feed_cache import (
+    GROUP_FEED, INDEX_FEED, POST_PAGE, PROFILE_FEED, feed_version
+)
+from .models import Comment, Follow, Group, Post, User
+from .notifications import unread_count
+
+
+def page_cache_headers(view):
+    """Cache-Control и Vary для страниц с условным GET."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = view(request, *args, **kwargs)
+        if response.status_code not in (200, 304):
+            return response
+        patch_vary_headers(response, ('Cookie',))
+        # Страница с CSRF-токеном ставит cookie, общему кешу она не годится.
+        if (request.user.is_authenticated
+                or request.META.get('CSRF_COOKIE_USED')):
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(
+                response, public=True, max_age=0,
+                s_maxage=settings.PAGE_SHARED_MAX_AGE,
+            )
+        return response
+    return wrapper
+
+
+def page_etag(request, *parts):
+    """Версия страницы, пользователь с числом его непрочитанных
+    уведомлений из шапки и параметры запроса."""
+    user = request.user
+    viewer = 'anon'
+    if user.is_authenticated:
+        viewer = f'{user.pk}.{unread_count(user)}'
+    return ':'.join(map(str, (*parts, viewer, request.GET.urlencode())))
+
+
+def per_request(func):
+    """Запоминает результат func на запросе: ETag, кеш страниц и
+    представление читают одни и те же данные одним запросом к базе."""
+    attr = f'_{func.__name__}'
+
+    @wraps(func)
+    def wrapper(request, *args):
+        if not hasattr(request, attr):
+            setattr(request, attr, func(request, *args))
+        return getattr(request, attr)
+    return wrapper
+
+
+@per_request
+def page_group(request, slug):
+    return get_object_or_404(Group, slug=slug)
+
+
+@per_request
+def page_author(request, username):
+    """Автор профиля со счётчиками."""
+    return get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+
+
+@per_request
+def viewer_follows(request, author_id):
+    return request.user.is_authenticated and Follow.objects.filter(
+        user_id=request.user.pk, author_id=author_id
+    ).exists()
+
+
+@per_request
+def post_state(request, post_id):
+    """Время правки и число комментариев поста, число постов автора и
+    слаг его группы; один запрос на ETag и Last-Modified."""
+    return Post.objects.filter(pk=post_id).values_list(
+        'update_date', 'comment_count', 'author__counters__post_count',
+        'group__slug',
+    ).first()
+
+
+def index_version(request):
+    """Версии страниц не зависят от пользователя, ETag дополняет их
+    пользователем и параметрами запроса."""
+    return feed_version(INDEX_FEED)
+
+
+def group_version(request, slug):
+    group = page_group(request, slug)
+    return '{}:{}'.format(
+        feed_version(GROUP_FEED, group.pk),
+        zlib.crc32(f'{group.title}\n{group.description}'.encode()),
+    )
+
+
+def profile_version(request, username):
+    author = page_author(request, username)
+    counters = get_counters(author)
+    return '{}:{}:{}:{}'.format(
+        feed_version(PROFILE_FEED, author.pk), counters.post_count,
+        counters.follower_count, counters.following_count,
+    )
+
+
+def post_version(request, post_id):
+    state = post_state(request, post_id)
+    if state is None:
+        return None
+    update_date, comment_count, post_count, group_slug = state
+    return '{}:{}:{}:{}:{}:{}'.format(
+        post_id, update_date.timestamp(), comment_count, post_count,
+        feed_version(POST_PAGE, post_id), group_slug,
+    )
+
+
+def index_etag(request):
+    return page_etag(request, index_version(request))
+
+
+def group_etag(request, slug):
+    return page_etag(request, group_version(request, slug))
+
+
+def profile_etag(request, username):
+    author = page_author(request, username)
+    return page_etag(
+        request, profile_version(request, username),
+        int(viewer_follows(request, author.pk)),
+    )
+
+
+def post_etag(request, post_id):
+    version = post_version(request, post_id)
+    if version is None:
+        return None
+    return page_etag(request, version)
+
+
+def post_last_modified(request, post_id):
+    """Время правки поста или последнего комментария к нему."""
+    state = post_state(request, post_id)
+    if state is None:
+        return None
+    last_comment = Comment.objects.filter(post_id=post_id).aggregate(
+        last=Max('pub_date')
+    )['last']
+    return max(filter(None, (state[0], last_comment)))
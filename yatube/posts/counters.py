@@ -0,0 +1,128 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики обновляются обработчиками сигналов в той же транзакции, что и
+сама запись, поэтому страницам не нужен COUNT(*) по всей таблице.
+Общее число постов для главной страницы хранится в кеше и может
+немного отставать: на нём строится только навигация по страницам.
+"""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Comment, Follow, Group, Notification, Post, UserCounters,
+)
+
+TOTAL_POSTS_KEY = 'posts:total'
+
+
+def _change(queryset, field, delta):
+    """Атомарно сдвигает счётчик, не опуская его ниже нуля."""
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_counter(user_id, field, delta):
+    queryset = UserCounters.objects.filter(user_id=user_id)
+    if not _change(queryset, field, delta) and delta > 0:
+        UserCounters.objects.get_or_create(user_id=user_id)
+        _change(queryset, field, delta)
+
+
+def change_group_counter(group_id, delta):
+    if group_id is not None:
+        _change(Group.objects.filter(pk=group_id), 'post_count', delta)
+
+
+def change_comment_counter(post_id, delta):
+    if post_id is not None:
+        _change(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def change_reply_counter(comment_id, delta):
+    if comment_id is not None:
+        _change(Comment.objects.filter(pk=comment_id), 'reply_count', delta)
+
+
+def change_unread_counters(user_ids, delta):
+    return _change(
+        UserCounters.objects.filter(user_id__in=user_ids),
+        'unread_notifications', delta,
+    )
+
+
+def recount_unread(user_ids):
+    UserCounters.objects.filter(user_id__in=user_ids).update(
+        unread_notifications=_count(Notification, 'user', is_read=False)
+    )
+
+
+def change_total_post_count(delta):
+    """Сдвигает число постов в кеше после коммита, вместе со сбросом
+    лент."""
+    def change():
+        try:
+            cache.incr(TOTAL_POSTS_KEY, delta)
+        except ValueError:
+            pass
+
+    transaction.on_commit(change)
+
+
+def total_post_count():
+    """Общее число постов из кеша; считается заново раз в таймаут."""
+    count = cache.get(TOTAL_POSTS_KEY)
+    if count is None:
+        count = Post.objects.count()
+        cache.set(
+            TOTAL_POSTS_KEY, count, settings.POSTS_TOTAL_COUNT_TIMEOUT
+        )
+    return count
+
+
+def get_counters(user):
+    """Счётчики пользователя, пустые, если строки ещё нет."""
+    try:
+        return user.counters
+    except UserCounters.DoesNotExist:
+        return UserCounters(user=user)
+
+
+def _count(model, field, **filters):
+    """Подзапрос с числом строк model, ссылающихся на внешнюю строку."""
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}, **filters
+        ).order_by().values(
+            field
+        ).annotate(total=Count('pk')).values('total'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def recount_all():
+    """Пересчитывает все счётчики по данным таблиц."""
+    UserCounters.objects.bulk_create(
+        (
+            UserCounters(user_id=pk)
+            for pk in get_user_model().objects.values_list(
+                'pk', flat=True
+            ).iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    Post.objects.update(comment_count=_count(Comment, 'post'))
+    Comment.objects.update(reply_count=_count(Comment, 'parent'))
+    Group.objects.update(post_count=_count(Post, 'group'))
+    UserCounters.objects.update(
+        post_count=_count(Post, 'author'),
+        follower_count=_count(Follow, 'author'),
+        following_count=_count(Follow, 'user'),
+        unread_notifications=_count(Notification, 'user', is_read=False),
+    )
+    cache.delete(TOTAL_POSTS_KEY)
@@ -0,0 +1,106 @@
+"""Версионированный кеш фрагментов лент.
+
+У каждой ленты (главная, группа, профиль) есть счётчик поколений в кеше.
+Он входит в ключ фрагмента {% cache %} и увеличивается при изменении
+постов ленты, поэтому старые фрагменты просто перестают читаться и
+TTL можно держать большим. Такой же счётчик есть у страницы поста
+(POST_PAGE): его сбрасывает то, что меняет разметку поста мимо самого
+поста, например готовые миниатюры и правка комментариев.
+
+Кеш в памяти процесса (LocMemCache) не общий, и там поколение сбрасывает
+кеш только в своём процессе, поэтому TTL ограничивается
+FEED_CACHE_LOCAL_TIMEOUT.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.cache import is_shared_cache
+
+INDEX_FEED = 'index'
+GROUP_FEED = 'group'
+PROFILE_FEED = 'profile'
+POST_PAGE = 'post'
+
+
+def feed_key(feed, pk=None):
+    if pk is None:
+        return f'feed:{feed}'
+    return f'feed:{feed}:{pk}'
+
+
+def feed_generation(feed, pk=None):
+    key = feed_key(feed, pk)
+    generation = cache.get(key)
+    if generation is None:
+        # Начальное значение от времени: после вытеснения ключа поколение
+        # не совпадёт с одним из старых и не оживит устаревший фрагмент.
+        cache.add(key, time.time_ns(), None)
+        generation = cache.get(key)
+    return generation
+
+
+def feed_version(feed, pk=None):
+    """Версия ленты для ETag. Поколение в кеше процесса не видит сбросов
+    из других процессов, поэтому тогда версия ещё и меняется каждые
+    FEED_CACHE_LOCAL_TIMEOUT секунд, как и фрагменты HTML."""
+    generation = feed_generation(feed, pk)
+    if is_shared_cache():
+        return str(generation)
+    period = int(time.time() // settings.FEED_CACHE_LOCAL_TIMEOUT)
+    return f'{generation}.{period}'
+
+
+def bump_feed(feed, pk=None):
+    key = feed_key(feed, pk)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def bump_post_feeds(author_ids, group_ids):
+    """Сбрасывает ленты, в которых показывается пост, сразу и ещё раз
+    после коммита. Запрос, пришедший до коммита, прочитает старые строки
+    и закеширует их под промежуточным поколением, а второй сброс сделает
+    его недостижимым."""
+    author_ids = set(author_ids)
+    group_ids = set(group_ids) - {None}
+
+    def bump():
+        bump_feed(INDEX_FEED)
+        for author_id in author_ids:
+            bump_feed(PROFILE_FEED, author_id)
+        for group_id in group_ids:
+            bump_feed(GROUP_FEED, group_id)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def bump_post_page(post_id):
+    """Сбрасывает страницу поста сразу и после коммита, как
+    bump_post_feeds."""
+    def bump():
+        bump_feed(POST_PAGE, post_id)
+
+    bump()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(bump)
+
+
+def feed_cache_timeout():
+    if is_shared_cache():
+        return settings.FEED_CACHE_TIMEOUT
+    return settings.FEED_CACHE_LOCAL_TIMEOUT
+
+
+def feed_cache(feed, pk=None):
+    """Контекст для {% cache feed_cache.timeout ... feed_cache.version %}."""
+    return {
+        'version': feed_generation(feed, pk),
+        'timeout': feed_cache_timeout(),
+    }
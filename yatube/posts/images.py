@@ -0,0 +1,88 @@
+"""Обработка картинок постов при загрузке.
+
+Заголовок картинки проверяется до декодирования пикселей, затем картинка
+поворачивается по EXIF, уменьшается до POST_IMAGE_MAX_SIZE и
+перекодируется без метаданных. Результат пишется во временный файл,
+который держится в памяти только до FILE_UPLOAD_MAX_MEMORY_SIZE.
+"""
+import tempfile
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import UploadedFile
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps
+
+SAVE_OPTIONS = {
+    'JPEG': {'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+    'GIF': {},
+    'WEBP': {'method': 4},
+}
+
+
+def _open_header(upload):
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError(
+            'Загрузите правильное изображение.', code='invalid_image'
+        )
+    if image.format not in settings.POST_IMAGE_FORMATS:
+        raise ValidationError(
+            'Формат %(format)s не поддерживается.',
+            code='invalid_format',
+            params={'format': image.format},
+        )
+    width, height = image.size
+    if width * height > settings.POST_IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Слишком большое изображение: %(width)sx%(height)s точек.',
+            code='too_many_pixels',
+            params={'width': width, 'height': height},
+        )
+    return image
+
+
+def process_upload(upload):
+    """Проверяет и нормализует загруженную картинку поста."""
+    if upload.size > settings.POST_IMAGE_MAX_UPLOAD_SIZE:
+        raise ValidationError(
+            'Файл больше %(limit)s.',
+            code='file_too_large',
+            params={
+                'limit': filesizeformat(settings.POST_IMAGE_MAX_UPLOAD_SIZE)
+            },
+        )
+    image = _open_header(upload)
+    image_format = image.format
+    if getattr(image, 'is_animated', False):
+        # Анимацию не перекодируем, достаточно проверки заголовка.
+        upload.seek(0)
+        return upload
+
+    max_size = settings.POST_IMAGE_MAX_SIZE
+    if image_format == 'JPEG':
+        # Декодирует JPEG сразу в уменьшенном масштабе (1/2, 1/4, 1/8).
+        image.draft('RGB', max_size)
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+
+    output = tempfile.SpooledTemporaryFile(
+        max_size=settings.FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    options = dict(SAVE_OPTIONS[image_format])
+    if image_format in ('JPEG', 'WEBP'):
+        options['quality'] = settings.POST_IMAGE_QUALITY
+    image.save(output, image_format, **options)
+    size = output.tell()
+    output.seek(0)
+    return UploadedFile(
+        output,
+        name=upload.name,
+        content_type=Image.MIME.get(image_format, upload.content_type),
+        size=size,
+    )
@@ -0,0 +1,266 @@
+import json
+import platform
+from datetime import datetime
+from urllib.parse import urlencode
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from posts.benchmark import (
+    ServerTransport, TestClientTransport, compare_reports, measure
+)
+from posts.counters import recount_unread
+from posts.models import Comment, Group, Notification, Post
+from posts.notifications import forget_unread
+from posts.paginators import (
+    CURSOR_NEXT, CursorPaginator, encode_cursor, estimate_row_count
+)
+
+User = get_user_model()
+
+BENCHMARK_TEXT = 'Замер производительности'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время ответа и число SQL-запросов всех страниц posts '
+        'на текущей базе и пишет отчёт в JSON.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько замеров сделать для каждой страницы',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=1,
+            help='Сколько запросов сделать до замеров',
+        )
+        parser.add_argument(
+            '--username',
+            help='Пользователь, от имени которого идут запросы; '
+                 'по умолчанию тот, у кого больше всего подписок',
+        )
+        parser.add_argument(
+            '--server', action='store_true',
+            help='Запросы по HTTP к серверу WSGI вместо тестового клиента',
+        )
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда записать отчёт',
+        )
+        parser.add_argument(
+            '--baseline',
+            help='Базовый отчёт: при регрессиях команда завершится ошибкой',
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый относительный рост p95',
+        )
+        parser.add_argument(
+            '--min-delta-ms', type=float, default=5,
+            help='Рост p95 меньше этого не считается регрессией',
+        )
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.order_by(
+                '-counters__following_count', 'pk'
+            ).first()
+        if user is None:
+            raise CommandError('Нет пользователя: заполните базу данными.')
+        return user
+
+    def comment_cursor(self):
+        """Пост с самым большим числом комментариев и курсор на вторую
+        страницу его корневых комментариев (или на продолжение после
+        первого, если страница одна)."""
+        post = Post.objects.order_by('-comment_count', '-pk').first()
+        if post is None:
+            return None, None
+        page = CursorPaginator(
+            Comment.objects.filter(post=post, depth=0),
+            settings.COMMENTS_PER_PAGE,
+        ).get_page(None)
+        if not page.object_list:
+            return None, None
+        cursor = page.next_cursor or encode_cursor(
+            CURSOR_NEXT, page.object_list[0]
+        )
+        return post, cursor
+
+    def deep_thread(self, user, post):
+        """Комментарий на глубине COMMENT_THREAD_DEPTH, у которого есть
+        ответы: его ветка свёрнута и подгружается comment_thread. Если
+        такой ветки нет, строится своя, её удаляет handle."""
+        depth = settings.COMMENT_THREAD_DEPTH
+        comment = Comment.objects.filter(
+            depth=depth, reply_count__gt=0
+        ).order_by('-reply_count', '-pk').first()
+        if comment is not None:
+            return comment
+        parent = None
+        for _ in range(depth + 2):
+            parent = Comment.objects.create(
+                post=post, author=user, parent=parent, text=BENCHMARK_TEXT
+            )
+            if parent.depth == depth:
+                comment = parent
+        return comment
+
+    def get_scenarios(self, user):
+        """Сценарии (имя, метод, путь, данные) для каждого URL posts."""
+        post_id = Comment.objects.order_by('-pk').values_list(
+            'post_id', flat=True
+        ).first()
+        post = (
+            Post.objects.filter(pk=post_id).first()
+            or Post.objects.order_by('-pk').first()
+        )
+        if post is None:
+            raise CommandError('Нет постов: заполните базу данными.')
+        group = post.group or Group.objects.order_by('-post_count').first()
+        author = User.objects.exclude(pk=user.pk).exclude(
+            following__user=user
+        ).order_by('-counters__follower_count', 'pk').first()
+        commented_post, cursor = self.comment_cursor()
+        own_post = Post.objects.create(author=user, text=BENCHMARK_TEXT)
+        thread = self.deep_thread(user, post)
+        word = max(post.text.split(), key=len)
+
+        scenarios = [
+            ('index', 'GET', reverse('posts:index'), None),
+            ('post_detail', 'GET', reverse(
+                'posts:post_detail', args=[post.pk]
+            ), None),
+            ('comment_thread', 'GET', reverse(
+                'posts:comment_thread', args=[thread.post_id, thread.pk]
+            ), None),
+            ('profile', 'GET', reverse(
+                'posts:profile', args=[post.author.username]
+            ), None),
+            ('search', 'GET', '{}?{}'.format(
+                reverse('posts:search'), urlencode({'q': word})
+            ), None),
+            ('follow_index', 'GET', reverse('posts:follow_index'), None),
+            ('notification_list', 'GET', reverse(
+                'posts:notification_list'
+            ), None),
+            ('post_create', 'GET', reverse('posts:post_create'), None),
+            ('post_create_submit', 'POST', reverse('posts:post_create'), {
+                'text': BENCHMARK_TEXT,
+            }),
+            ('post_edit', 'GET', reverse(
+                'posts:post_edit', args=[own_post.pk]
+            ), None),
+            ('post_edit_submit', 'POST', reverse(
+                'posts:post_edit', args=[own_post.pk]
+            ), {'text': BENCHMARK_TEXT}),
+            ('add_comment', 'POST', reverse(
+                'posts:add_comment', args=[post.pk]
+            ), {'text': BENCHMARK_TEXT}),
+        ]
+        if group is not None:
+            scenarios.insert(1, ('group_list', 'GET', reverse(
+                'posts:group_list', args=[group.slug]
+            ), None))
+        if cursor is not None:
+            scenarios.insert(3, ('comment_page', 'GET', '{}?{}'.format(
+                reverse('posts:comment_page', args=[commented_post.pk]),
+                urlencode({'cursor': cursor}),
+            ), None))
+        if author is not None:
+            # Отписка идёт после подписки и оставляет базу как была.
+            scenarios += [
+                ('profile_follow', 'GET', reverse(
+                    'posts:profile_follow', args=[author.username]
+                ), None),
+                ('profile_unfollow', 'GET', reverse(
+                    'posts:profile_unfollow', args=[author.username]
+                ), None),
+            ]
+        return scenarios
+
+    def run(self, transport, scenarios, options):
+        results = {}
+        for name, method, path, data in scenarios:
+            results[name] = measure(
+                transport, method, path, data,
+                repeat=options['repeat'], warmup=options['warmup'],
+            )
+            latency = results[name]['latency_ms']
+            self.stdout.write(
+                f'{name:<20} {results[name]["status"]} '
+                f'p50 {latency["p50"]:8.1f} ms, '
+                f'p95 {latency["p95"]:8.1f} ms, '
+                f'{results[name]["queries"]["per_request"]} queries'
+            )
+        return results
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть не меньше 1.')
+        user = self.get_user(options['username'])
+        last_post = Post.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        last_comment = Comment.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        # Список уведомлений отмечает их прочитанными, вернём как было.
+        unread = list(Notification.objects.filter(
+            user=user, is_read=False
+        ).values_list('pk', flat=True))
+        transport_class = (
+            ServerTransport if options['server'] else TestClientTransport
+        )
+        transport = None
+        try:
+            scenarios = self.get_scenarios(user)
+            transport = transport_class(user)
+            results = self.run(transport, scenarios, options)
+        finally:
+            if transport is not None:
+                transport.close()
+            Comment.objects.filter(author=user, pk__gt=last_comment).delete()
+            Post.objects.filter(author=user, pk__gt=last_post).delete()
+            Notification.objects.filter(pk__in=unread).update(is_read=False)
+            recount_unread([user.pk])
+            forget_unread([user.pk])
+
+        report = {
+            'meta': {
+                'created': datetime.now().isoformat(timespec='seconds'),
+                'mode': transport.mode,
+                'repeat': options['repeat'],
+                'warmup': options['warmup'],
+                'database': connection.vendor,
+                'posts': estimate_row_count(Post, connection.alias),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        with open(options['output'], 'w', encoding='utf-8') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(f'Отчёт записан в {options["output"]}')
+
+        if not options['baseline']:
+            return
+        with open(options['baseline'], encoding='utf-8') as baseline:
+            regressions = compare_reports(
+                json.load(baseline), report,
+                options['tolerance'], options['min_delta_ms'],
+            )
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'Регрессий по сравнению с базовым '
+                               f'отчётом: {len(regressions)}.')
+        self.stdout.write('Регрессий нет.')
@@ -0,0 +1,70 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время загрузки списков админки постов, комментариев и '
+        'подписок на текущей базе.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз загрузить каждую страницу',
+        )
+        parser.add_argument(
+            '--username',
+            help='Суперпользователь для входа; по умолчанию первый найденный',
+        )
+
+    def get_pages(self):
+        post = Post.objects.order_by('-pk').only('text', 'pub_date').first()
+        if post is None:
+            raise CommandError('Нет постов: заполните базу данными.')
+        changelist = reverse('admin:posts_post_changelist')
+        word = max(post.text.split(), key=len)
+        return {
+            'posts': changelist,
+            'posts_page_1000': f'{changelist}?p=999',
+            'posts_search': f'{changelist}?q={word}',
+            'posts_year': f'{changelist}?pub_date__year={post.pub_date.year}',
+            'post_change': reverse('admin:posts_post_change', args=[post.pk]),
+            'comments': reverse('admin:posts_comment_changelist'),
+            'follows': reverse('admin:posts_follow_changelist'),
+        }
+
+    def handle(self, *args, **options):
+        users = User.objects.filter(is_superuser=True)
+        if options['username']:
+            users = users.filter(username=options['username'])
+        user = users.first()
+        if user is None:
+            raise CommandError('Нужен суперпользователь: createsuperuser.')
+        # Адрес не из INTERNAL_IPS, чтобы не замерять debug toolbar.
+        client = Client(REMOTE_ADDR='192.0.2.1')
+        client.force_login(user)
+        for name, url in self.get_pages().items():
+            timings = []
+            for _ in range(options['repeat']):
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = client.get(url)
+                    timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f'{name:<16} {response.status_code} '
+                f'median {statistics.median(timings):8.1f} ms, '
+                f'max {max(timings):8.1f} ms, '
+                f'{len(queries.captured_queries)} queries'
+            )
@@ -0,0 +1,189 @@
+import multiprocessing
+import os
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from posts.benchmark import REMOTE_ADDR, percentile
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+def work(requests, user_id, seed, duration, results):
+    """Шлёт запросы из requests() от имени пользователя duration секунд
+    и кладёт в results время ответов и число ошибок."""
+    # Соединения родителя не переносятся через fork.
+    connections.close_all()
+    client = Client(REMOTE_ADDR=REMOTE_ADDR)
+    client.force_login(User.objects.get(pk=user_id))
+    rnd = random.Random(seed)
+    timings = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        method, path, data = requests(rnd)
+        start = time.perf_counter()
+        try:
+            response = getattr(client, method)(path, data)
+        except Exception:
+            errors += 1
+            continue
+        if response.status_code >= 400:
+            errors += 1
+            continue
+        timings.append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+    results.put((requests.__name__, timings, errors))
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет пропускную способность лент, пока другие процессы пишут '
+        'комментарии, для профилей SQLite из SQLITE_PROFILES.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', choices=settings.SQLITE_PROFILES,
+            help='Профиль SQLite; можно указать несколько, по умолчанию все',
+        )
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--duration', type=float, default=10,
+            help='Длительность замера каждого профиля в секундах',
+        )
+        parser.add_argument(
+            '--conn-max-age', type=int,
+            default=settings.DATABASES[DEFAULT_DB_ALIAS].get(
+                'CONN_MAX_AGE', 0
+            ),
+            help='CONN_MAX_AGE соединений на время замера',
+        )
+
+    def get_requests(self):
+        post_ids = list(
+            Post.objects.order_by('-pk').values_list('pk', flat=True)[:100]
+        )
+        if not post_ids:
+            raise CommandError('Нет постов: заполните базу данными.')
+        index = reverse('posts:index')
+        feeds = [f'{index}?page={page}' for page in range(1, 6)]
+        feeds.append(reverse('posts:follow_index'))
+
+        def read(rnd):
+            if rnd.random() < 0.7:
+                return 'get', rnd.choice(feeds), None
+            return 'get', reverse(
+                'posts:post_detail', args=[rnd.choice(post_ids)]
+            ), None
+
+        def write(rnd):
+            return 'post', reverse(
+                'posts:add_comment', args=[rnd.choice(post_ids)]
+            ), {'text': f'Нагрузочный комментарий {rnd.random()}'}
+
+        return read, write
+
+    def run_profile(self, profile, users, options):
+        read, write = self.get_requests()
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        conn_max_age = settings_dict.get('CONN_MAX_AGE', 0)
+        settings_dict['CONN_MAX_AGE'] = options['conn_max_age']
+        # Отдельные процессы, а не потоки: иначе пропускную способность
+        # ограничивает GIL, а не блокировки базы.
+        context = multiprocessing.get_context('fork')
+        results = context.Queue()
+        workers = [
+            (read, users[0].pk, seed) for seed in range(options['readers'])
+        ] + [
+            (write, users[1 + seed % (len(users) - 1)].pk, 1000 + seed)
+            for seed in range(options['writers'])
+        ]
+        try:
+            with override_settings(
+                SQLITE_PRAGMAS=settings.SQLITE_PROFILES[profile]
+            ):
+                # Новое соединение переключает журнал базы до начала замера.
+                connections.close_all()
+                connection.ensure_connection()
+                connections.close_all()
+                processes = [
+                    context.Process(target=work, args=(
+                        requests, user_id, seed, options['duration'], results
+                    ))
+                    for requests, user_id, seed in workers
+                ]
+                for process in processes:
+                    process.start()
+                collected = [results.get() for _ in processes]
+                for process in processes:
+                    process.join()
+        finally:
+            settings_dict['CONN_MAX_AGE'] = conn_max_age
+            connections.close_all()
+        return tuple(
+            self.summarize(
+                [item for item in collected if item[0] == name],
+                options['duration'],
+            )
+            for name in ('read', 'write')
+        )
+
+    def summarize(self, results, duration):
+        timings = [timing for _, items, _ in results for timing in items]
+        return {
+            'per_second': len(timings) / duration,
+            'p50': statistics.median(timings) if timings else 0,
+            'p95': percentile(timings, 95) if timings else 0,
+            'errors': sum(errors for _, _, errors in results),
+        }
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Команда сравнивает только профили SQLite.')
+        users = list(User.objects.order_by(
+            '-counters__following_count', 'pk'
+        )[:max(options['writers'], 1) + 1])
+        if len(users) < 2:
+            raise CommandError('Нужно хотя бы два пользователя.')
+        last_comment = Comment.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+        # Все профили идут с одними параметрами, различается только PRAGMA.
+        cpus = os.cpu_count() or 1
+        self.stdout.write(
+            f'CONN_MAX_AGE {options["conn_max_age"]}, '
+            f'читателей {options["readers"]}, '
+            f'писателей {options["writers"]}, ядер {cpus}, '
+            f'{options["duration"]:g} с на профиль'
+        )
+        if cpus < options['readers'] + options['writers']:
+            self.stdout.write(
+                'Процессов больше, чем ядер: чтение упирается в процессор, '
+                'и ожидание блокировок в его пропускной способности не видно.'
+            )
+        try:
+            for profile in options['profile'] or settings.SQLITE_PROFILES:
+                reads, writes = self.run_profile(profile, users, options)
+                self.stdout.write(
+                    f'{profile:<10} чтение {reads["per_second"]:7.1f}/с '
+                    f'(p50 {reads["p50"]:6.1f} ms, '
+                    f'p95 {reads["p95"]:6.1f} ms, '
+                    f'ошибок {reads["errors"]}), '
+                    f'запись {writes["per_second"]:6.1f}/с '
+                    f'(p95 {writes["p95"]:6.1f} ms, '
+                    f'ошибок {writes["errors"]})'
+                )
+        finally:
+            Comment.objects.filter(
+                pk__gt=last_comment, author__in=users
+            ).delete()
@@ -0,0 +1,54 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.models import Comment, Follow, Post
+from posts.timeline import follow_feed
+
+PAGE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает планы и время выполнения горячих запросов лент. '
+        'Запустите до и после миграции 0018_feed_indexes на одной базе, '
+        'чтобы сравнить планы.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Сколько раз выполнить каждый запрос для замера времени',
+        )
+
+    def handle(self, *args, **options):
+        post = Post.objects.exclude(group=None).order_by('-pk').first()
+        follow = Follow.objects.order_by('-pk').first()
+        if post is None or follow is None:
+            raise CommandError(
+                'Нужны посты с группой и подписки: заполните базу данными.'
+            )
+        queries = {
+            'index': Post.objects.all(),
+            'group_posts': Post.objects.filter(group_id=post.group_id),
+            'profile': Post.objects.filter(author_id=post.author_id),
+            'follow_index': follow_feed(follow.user),
+            'post_comments': Comment.objects.filter(post_id=post.pk),
+            'profile_following': Follow.objects.filter(
+                user_id=follow.user_id, author_id=follow.author_id
+            ),
+        }
+        for name, queryset in queries.items():
+            page = queryset[:PAGE_SIZE]
+            timings = []
+            for _ in range(options['repeat']):
+                start = time.perf_counter()
+                list(page.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(page.explain())
+            self.stdout.write(
+                f'median {statistics.median(timings):.2f} ms, '
+                f'max {max(timings):.2f} ms\n'
+            )
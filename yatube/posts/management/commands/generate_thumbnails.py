@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.thumbnails import cached_thumbnail, generate_thumbnails
+from posts.variants import picture_sources
+
+
+class Command(BaseCommand):
+    help = (
+        'Строит недостающие миниатюры и адаптивные варианты для картинок '
+        'уже созданных постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.THUMBNAIL_WORKERS or 1,
+            help='Число потоков построения миниатюр',
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Строить заново и уже готовые варианты картинок',
+        )
+
+    def missing(self, image):
+        return (cached_thumbnail(image) is None
+                or picture_sources(image) is None)
+
+    def handle(self, *args, **options):
+        images = Post.objects.exclude(image='').values_list(
+            'image', flat=True
+        ).distinct()
+        names = [
+            name for name in images.iterator()
+            if options['force'] or self.missing(Post(image=name).image)
+        ]
+        generate = partial(generate_thumbnails, force=options['force'])
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as executor:
+                list(executor.map(generate, names))
+        else:
+            for name in names:
+                generate(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(names)}'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts.models import SearchEntry
+from posts.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Строит заново поисковый индекс постов и комментариев.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f'Записей в индексе: {SearchEntry.objects.count()}'
+        ))
@@ -0,0 +1,437 @@
+import math
+import random
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from io import BytesIO
+from time import perf_counter
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from faker import Faker
+from PIL import Image, ImageDraw
+
+from posts import threads, timeline
+from posts.counters import recount_all
+from posts.feed_cache import INDEX_FEED, bump_feed
+from posts.models import (
+    Comment, Follow, Group, Post, SearchEntry, TimelineEntry
+)
+from posts.search import term_weights
+
+User = get_user_model()
+
+PLACEHOLDER_COUNT = 8
+PLACEHOLDER_SIZE = (1200, 800)
+SEARCH_COLUMNS = ('term', 'post_id', 'comment_id', 'weight')
+TIMELINE_COLUMNS = ('user_id', 'post_id', 'pub_date')
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Отключает auto_now и auto_now_add, иначе bulk_create запишет
+    во все даты текущее время."""
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+def insert_rows(model, columns, rows):
+    """Вставляет кортежи значений одним executemany, без объектов
+    моделей: для миллионов строк индекса и лент это в разы быстрее
+    bulk_create."""
+    if not rows:
+        return
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(column) for column in columns),
+        ', '.join(['%s'] * len(columns)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def cumulative(weights):
+    total = 0
+    result = []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу пользователями, группами, постами, комментариями '
+        'и подписками для нагрузочного тестирования. Одинаковые параметры '
+        'и --seed дают одинаковые данные.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument('--comments', type=int, default=50000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя',
+        )
+        parser.add_argument(
+            '--activity', type=float, default=1.1,
+            help='Показатель степенного закона активности и популярности '
+                 'авторов: чем больше, тем сильнее перекос',
+        )
+        parser.add_argument(
+            '--images', type=float, default=0,
+            help='Доля постов с картинкой-заглушкой, от 0 до 1',
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределены посты',
+        )
+        parser.add_argument(
+            '--end', default='2024-01-01',
+            help='Дата, до которой публикуются посты, ГГГГ-ММ-ДД',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix',
+            help='Префикс имён пользователей и slug групп, '
+                 'по умолчанию seed<seed>_',
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Пароль всех созданных пользователей',
+        )
+        parser.add_argument(
+            '--reply-ratio', type=float, default=0.3,
+            help='Доля комментариев-ответов на комментарии того же поста',
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-search-index', action='store_true',
+            help='Не заполнять поисковый индекс; его можно построить '
+                 'позже командой rebuild_search_index',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.prefix = options['prefix'] or f'seed{options["seed"]}_'
+        end = parse_date(options['end'])
+        if end is None:
+            raise CommandError('--end должен быть датой ГГГГ-ММ-ДД.')
+        self.end = timezone.make_aware(
+            datetime.combine(end, datetime.min.time())
+        )
+        self.start = self.end - timedelta(days=options['days'])
+        if User.objects.filter(username__startswith=self.prefix).exists():
+            raise CommandError(
+                f'Пользователи с префиксом {self.prefix} уже есть: '
+                'укажите другой --seed или --prefix.'
+            )
+
+        with transaction.atomic(), explicit_dates(
+            Post._meta.get_field('pub_date'),
+            Post._meta.get_field('update_date'),
+            Comment._meta.get_field('pub_date'),
+        ):
+            users = self.step('Пользователи', self.create_users)
+            groups = self.step('Группы', self.create_groups)
+            # Степенной закон: автор с рангом r пишет и собирает
+            # подписчиков пропорционально 1 / r ** activity.
+            user_weights = cumulative(
+                1 / rank ** options['activity']
+                for rank in range(1, len(users) + 1)
+            )
+            placeholders = self.create_placeholders()
+            posts = self.step(
+                'Посты', self.create_posts,
+                users, user_weights, groups, placeholders,
+            )
+            self.step('Комментарии', self.create_comments, users, posts)
+            follows = self.step(
+                'Подписки', self.create_follows, users, user_weights
+            )
+            self.reset_sequences()
+            self.step('Счётчики', recount_all)
+            self.step('Ленты подписок', self.fill_timelines, follows, posts)
+        bump_feed(INDEX_FEED)
+
+    def step(self, title, function, *args):
+        started = perf_counter()
+        result = function(*args)
+        count = f': {len(result)}' if result is not None else ''
+        self.stdout.write(
+            f'{title}{count} за {perf_counter() - started:.1f} с'
+        )
+        return result
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield range(start, min(total, start + self.batch_size))
+
+    def moment(self, index, total):
+        """Время index-го из total событий, по возрастанию."""
+        span = (self.end - self.start).total_seconds()
+        offset = span * (index + self.rng.random()) / max(total, 1)
+        return self.start + timedelta(seconds=offset)
+
+    def create_users(self):
+        total = self.options['users']
+        first = next_id(User)
+        password = make_password(self.options['password'])
+        for batch in self.batches(total):
+            User.objects.bulk_create([
+                User(
+                    id=first + index,
+                    username=f'{self.prefix}{index}',
+                    first_name=self.fake.first_name(),
+                    last_name=self.fake.last_name(),
+                    password=password,
+                    date_joined=self.start,
+                )
+                for index in batch
+            ])
+        return list(range(first, first + total))
+
+    def create_groups(self):
+        total = self.options['groups']
+        first = next_id(Group)
+        Group.objects.bulk_create([
+            Group(
+                id=first + index,
+                title=self.fake.catch_phrase()[:200],
+                slug=f'{self.prefix}{index}',
+                description=self.fake.paragraph(),
+            )
+            for index in range(total)
+        ])
+        return list(range(first, first + total))
+
+    def create_placeholders(self):
+        """Несколько картинок-заглушек, общих для всех постов."""
+        if not self.options['images']:
+            return []
+        names = []
+        for index in range(PLACEHOLDER_COUNT):
+            name = f'posts/seed/{self.prefix}{index}.jpg'
+            colors = [
+                tuple(self.rng.randrange(256) for _ in range(3))
+                for _ in range(4)
+            ]
+            if not default_storage.exists(name):
+                image = Image.new('RGB', PLACEHOLDER_SIZE, colors[0])
+                draw = ImageDraw.Draw(image)
+                width, height = PLACEHOLDER_SIZE
+                for number, color in enumerate(colors[1:], start=1):
+                    inset = number * min(width, height) // 8
+                    draw.ellipse(
+                        (inset, inset, width - inset, height - inset),
+                        fill=color,
+                    )
+                buffer = BytesIO()
+                image.save(buffer, 'JPEG', quality=80)
+                default_storage.save(name, ContentFile(buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def text(self, sentences):
+        return ' '.join(
+            self.fake.sentence(nb_words=self.rng.randint(4, 14))
+            for _ in range(sentences)
+        )
+
+    def create_posts(self, users, user_weights, groups, placeholders):
+        """Создаёт посты; возвращает [(id, автор, время), ...]."""
+        total = self.options['posts']
+        first = next_id(Post)
+        posts = []
+        for batch in self.batches(total):
+            objects = []
+            entries = []
+            for index in batch:
+                pub_date = self.moment(index, total)
+                author_id = self.rng.choices(
+                    users, cum_weights=user_weights
+                )[0]
+                group_id = None
+                if groups and self.rng.random() < 0.7:
+                    group_id = groups[
+                        min(int(self.rng.paretovariate(1)), len(groups)) - 1
+                    ]
+                image = ''
+                if self.rng.random() < self.options['images']:
+                    image = self.rng.choice(placeholders)
+                post = Post(
+                    id=first + index,
+                    text=self.text(1 + int(self.rng.expovariate(0.7))),
+                    pub_date=pub_date,
+                    update_date=pub_date,
+                    author_id=author_id,
+                    group_id=group_id,
+                    image=image,
+                )
+                objects.append(post)
+                posts.append((post.id, author_id, pub_date))
+                if not self.options['skip_search_index']:
+                    entries += [
+                        (term, post.id, None, weight)
+                        for term, weight in term_weights(post.text)
+                    ]
+            Post.objects.bulk_create(objects)
+            insert_rows(SearchEntry, SEARCH_COLUMNS, entries)
+        return posts
+
+    def create_comments(self, users, posts):
+        """Комментарии чаще достаются постам популярных авторов, часть
+        из них - ответы на уже созданные комментарии поста."""
+        total = self.options['comments']
+        if not posts:
+            return []
+        first = next_id(Comment)
+        author_rank = {user_id: rank for rank, user_id in enumerate(users, 1)}
+        post_weights = cumulative(
+            1 / author_rank[author_id] ** self.options['activity']
+            for _, author_id, _ in posts
+        )
+        # Созданные комментарии поста: (id, путь, глубина, дата).
+        threads_by_post = defaultdict(list)
+        for batch in self.batches(total):
+            objects = []
+            entries = []
+            for index in batch:
+                post_id, _, post_date = self.rng.choices(
+                    posts, cum_weights=post_weights
+                )[0]
+                comment = Comment(
+                    id=first + index,
+                    post_id=post_id,
+                    author_id=self.rng.choice(users),
+                    text=self.text(1),
+                    pub_date=min(
+                        post_date + timedelta(
+                            hours=self.rng.expovariate(1 / 48)
+                        ),
+                        self.end,
+                    ),
+                    path=threads.segment(first + index),
+                )
+                siblings = threads_by_post[post_id]
+                if siblings and self.rng.random() < self.options[
+                    'reply_ratio'
+                ]:
+                    parent_id, path, depth, parent_date = self.rng.choice(
+                        siblings
+                    )
+                    if depth < threads.MAX_DEPTH:
+                        comment.parent_id = parent_id
+                        comment.path = path + comment.path
+                        comment.depth = depth + 1
+                        comment.pub_date = min(
+                            parent_date + timedelta(
+                                hours=self.rng.expovariate(1 / 6)
+                            ),
+                            self.end,
+                        )
+                siblings.append((
+                    comment.id, comment.path, comment.depth, comment.pub_date
+                ))
+                objects.append(comment)
+                if not self.options['skip_search_index']:
+                    entries += [
+                        (term, post_id, comment.id, weight)
+                        for term, weight in term_weights(comment.text, True)
+                    ]
+            Comment.objects.bulk_create(objects)
+            insert_rows(SearchEntry, SEARCH_COLUMNS, entries)
+        return range(first, first + total)
+
+    def create_follows(self, users, user_weights):
+        """Граф подписок с предпочтительным присоединением: на
+        популярных авторов подписываются чаще."""
+        mean = self.options['follows']
+        if not mean or len(users) < 2:
+            return []
+        # Логнормальное распределение числа подписок со средним mean.
+        sigma = 1.0
+        mu = math.log(mean) - sigma ** 2 / 2
+        follows = []
+        batch = []
+        for user_id in users:
+            wanted = min(
+                int(self.rng.lognormvariate(mu, sigma)), len(users) - 1
+            )
+            authors = set(self.rng.choices(
+                users, cum_weights=user_weights, k=wanted
+            ))
+            authors.discard(user_id)
+            for author_id in sorted(authors):
+                follows.append((user_id, author_id))
+                batch.append(Follow(user_id=user_id, author_id=author_id))
+            if len(batch) >= self.batch_size:
+                Follow.objects.bulk_create(batch)
+                batch = []
+        Follow.objects.bulk_create(batch)
+        return follows
+
+    def reset_sequences(self):
+        """Явные id не двигают последовательности PostgreSQL."""
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post, Comment]
+        )
+        with connection.cursor() as cursor:
+            for statement in statements:
+                cursor.execute(statement)
+
+    def fill_timelines(self, follows, posts):
+        """Раскладывает посты по лентам подписчиков, как это сделали бы
+        сигналы при обычном создании постов и подписок."""
+        adapt = connection.ops.adapt_datetimefield_value
+        posts_by_author = defaultdict(list)
+        for post_id, author_id, pub_date in posts:
+            posts_by_author[author_id].append((post_id, adapt(pub_date)))
+        followers = defaultdict(list)
+        for user_id, author_id in follows:
+            followers[author_id].append(user_id)
+        rows = []
+        count = 0
+        for author_id, user_ids in followers.items():
+            if not timeline.is_fanout_author(author_id):
+                Post.objects.filter(author_id=author_id).update(
+                    in_timelines=False
+                )
+                continue
+            for user_id in user_ids:
+                rows += [
+                    (user_id, post_id, pub_date)
+                    for post_id, pub_date in posts_by_author[author_id]
+                ]
+                if len(rows) >= self.batch_size:
+                    insert_rows(TimelineEntry, TIMELINE_COLUMNS, rows)
+                    count += len(rows)
+                    rows = []
+        insert_rows(TimelineEntry, TIMELINE_COLUMNS, rows)
+        return range(count + len(rows))
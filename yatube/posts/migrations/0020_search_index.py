@@ -0,0 +1,215 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:33
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Копия токенизатора и стеммера posts.search на момент миграции: её
+# записи должны совпадать с индексом этой версии, как бы ни менялся
+# стеммер потом.
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+# Вес одного вхождения слова в текст поста и в комментарий; частота
+# слова в тексте учитывается не больше MAX_TERM_FREQUENCY раз.
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+MAX_TERM_FREQUENCY = 5
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'во', 'вот', 'все', 'всё', 'вы', 'да', 'для', 'до', 'его',
+    'ее', 'её', 'если', 'есть', 'еще', 'ещё', 'же', 'за', 'и', 'из',
+    'или', 'им', 'их', 'к', 'как', 'ко', 'когда', 'кто', 'ли', 'мне',
+    'мы', 'на', 'над', 'не', 'него', 'нет', 'ни', 'но', 'ну', 'о', 'об',
+    'он', 'она', 'они', 'оно', 'от', 'по', 'под', 'при', 'с', 'со', 'так',
+    'там', 'те', 'то', 'только', 'ты', 'у', 'уже', 'что', 'чтобы', 'это',
+    'я',
+))
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+
+
+def _strip(word, endings):
+    """Отрезает самое длинное окончание или возвращает None.
+
+    endings - пара групп: окончания первой группы допустимы только
+    после «а» или «я», второй - после любой буквы.
+    """
+    after_a, anywhere = endings
+    candidates = sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in anywhere],
+        key=lambda item: -len(item[0]),
+    )
+    for ending, needs_a in candidates:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if needs_a and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _region(word):
+    """Позиция начала области после первого сочетания гласная-согласная."""
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip_inflection(rv):
+    stripped = _strip(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    rv = _strip(rv, REFLEXIVE) or rv
+    stripped = _strip(rv, ADJECTIVE)
+    if stripped is not None:
+        return _strip(stripped, PARTICIPLE) or stripped
+    for endings in (VERB, NOUN):
+        stripped = _strip(rv, endings)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def _strip_superlative(rv):
+    if rv.endswith('нн'):
+        return rv[:-1]
+    superlative = _strip(rv, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    return rv[:-1] if rv.endswith('ь') else rv
+
+
+def stem(word):
+    """Основа русского слова; слова без кириллицы возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    start = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        None,
+    )
+    if start is None:
+        return word
+    prefix, rv = word[:start], word[start:]
+    r1 = _region(word)
+    r2 = r1 + _region(word[r1:])
+
+    rv = _strip_inflection(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _strip(rv, DERIVATIONAL)
+    if derivational is not None and len(prefix) + len(derivational) >= r2:
+        rv = derivational
+    return prefix + _strip_superlative(rv)
+
+
+def tokenize(text):
+    """Основы значимых слов текста в порядке появления."""
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        if word in STOP_WORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(stem(word)[:MAX_TERM_LENGTH])
+    return terms
+
+
+def term_weights(text, comment=False):
+    weight = COMMENT_WEIGHT if comment else POST_WEIGHT
+    return [
+        (term, min(frequency, MAX_TERM_FREQUENCY) * weight)
+        for term, frequency in Counter(tokenize(text)).items()
+    ]
+
+
+
+def build_index(apps, schema_editor):
+    """Индексирует существующие посты и комментарии."""
+    SearchEntry = apps.get_model('posts', 'SearchEntry')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+
+    texts = (
+        (pk, None, text)
+        for pk, text in Post.objects.values_list('pk', 'text').iterator()
+    )
+    comments = Comment.objects.filter(post__isnull=False).values_list(
+        'post_id', 'pk', 'text'
+    ).iterator()
+    entries = []
+    for source in (texts, comments):
+        for post_id, comment_id, text in source:
+            entries += [
+                SearchEntry(
+                    term=term, weight=weight,
+                    post_id=post_id, comment_id=comment_id,
+                )
+                for term, weight in term_weights(text, comment_id is not None)
+            ]
+            if len(entries) >= 500:
+                SearchEntry.objects.bulk_create(entries)
+                entries = []
+    SearchEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64, verbose_name='Терм')),
+                ('weight', models.PositiveIntegerField(verbose_name='Вес')),
+                ('comment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Comment', verbose_name='Комментарий')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_entries', to='posts.Post', verbose_name='Пост')),
+            ],
+            options={
+                'verbose_name': 'Запись поискового индекса',
+                'verbose_name_plural': 'Записи поискового индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['term', 'post'], name='search_term_post_idx'),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
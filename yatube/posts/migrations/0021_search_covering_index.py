@@ -0,0 +1,21 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0020_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='searchentry',
+            name='search_term_post_idx',
+        ),
+        migrations.AddIndex(
+            model_name='searchentry',
+            index=models.Index(fields=['term', 'post', 'comment'], name='search_term_entry_idx'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:05
+
+from django.db import migrations, models
+
+
+def mark_skipped_posts(apps, schema_editor):
+    """Посты, которых нет ни в одной ленте, хотя у автора есть
+    подписчики, не были разложены: автор был популярным."""
+    Follow = apps.get_model('posts', 'Follow')
+    Post = apps.get_model('posts', 'Post')
+    TimelineEntry = apps.get_model('posts', 'TimelineEntry')
+    Post.objects.filter(
+        author_id__in=Follow.objects.values('author_id')
+    ).exclude(
+        pk__in=TimelineEntry.objects.values('post_id')
+    ).update(in_timelines=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0023_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='in_timelines',
+            field=models.BooleanField(default=True, editable=False, verbose_name='Разложен по лентам подписчиков'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(in_timelines=False), fields=['author'], name='post_not_in_timelines_idx'),
+        ),
+        migrations.RunPython(mark_skipped_posts, migrations.RunPython.noop),
+    ]
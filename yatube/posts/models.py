@@ -1,8 +1,21 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+FEED_FIELDS = (
+    'text',
+    'pub_date',
+    'update_date',
+    'image',
+    'comment_count',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+    'group__title',
+)
+
 
 class Group(models.Model):
     title = models.CharField('Название группы', max_length=200)
@@ -12,6 +25,9 @@ class Group(models.Model):
         unique=True
     )
     description = models.TextField('Описание')
+    post_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False
+    )
 
     class Meta:
         verbose_name = 'Группа'
@@ -21,7 +37,29 @@ class Group(models.Model):
         return self.title
 
 
-class Post(models.Model):
+class AtomicSaveModel(models.Model):
+    """Сохраняет запись в одной транзакции с обработчиками post_save,
+    которые обновляют счётчики."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """Посты для ленты: автор и группа в том же запросе и только
+        нужные шаблонам колонки."""
+        return self.select_related('author', 'group').only(*FEED_FIELDS)
+
+
+class Post(AtomicSaveModel):
     text = models.TextField(
         verbose_name='Текст поста',
         help_text='Текст нового поста'
@@ -54,17 +92,60 @@ class Post(models.Model):
         blank=True,
         help_text='Изображение поста',
     )
+    comment_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False
+    )
+    in_timelines = models.BooleanField(
+        'Разложен по лентам подписчиков', default=True, editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        indexes = [
+            models.Index(fields=['-pub_date'], name='post_date_idx'),
+            models.Index(
+                fields=['author', '-pub_date'], name='post_author_date_idx'
+            ),
+            models.Index(
+                fields=['group', '-pub_date'], name='post_group_date_idx'
+            ),
+            models.Index(
+                fields=['author'],
+                name='post_not_in_timelines_idx',
+                condition=models.Q(in_timelines=False),
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Comment(models.Model):
+# Конец диапазона путей поддерева: больше любого символа сегмента пути.
+PATH_END = '~'
+
+
+class CommentQuerySet(models.QuerySet):
+    def feed(self):
+        """Комментарии для списка: автор в том же запросе."""
+        return self.select_related('author').only(
+            'text', 'pub_date', 'post_id', 'parent_id', 'path', 'depth',
+            'reply_count', 'author__username',
+        )
+
+    def subtree(self, path, max_depth=None):
+        """Комментарий с путём path и его ответы не глубже max_depth
+        в порядке обхода дерева."""
+        queryset = self.filter(path__gte=path, path__lt=path + PATH_END)
+        if max_depth is not None:
+            queryset = queryset.filter(depth__lte=max_depth)
+        return queryset.order_by('path')
+
+
+class Comment(AtomicSaveModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -73,6 +154,15 @@ class Comment(models.Model):
         related_name='comments',
         help_text='Комментарий к посту'
     )
+    parent = models.ForeignKey(
+        'self',
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name='Ответ на',
+        related_name='replies',
+        help_text='Комментарий, на который отвечает этот'
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -88,17 +178,36 @@ class Comment(models.Model):
         'Дата создания',
         auto_now_add=True,
     )
+    path = models.CharField(
+        'Путь в дереве', max_length=255, default='', editable=False
+    )
+    depth = models.PositiveSmallIntegerField(
+        'Глубина', default=0, editable=False
+    )
+    reply_count = models.PositiveIntegerField(
+        'Число ответов', default=0, editable=False
+    )
+
+    objects = CommentQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
+        indexes = [
+            models.Index(
+                fields=['post', '-pub_date'], name='comment_post_date_idx'
+            ),
+            models.Index(
+                fields=['post', 'path'], name='comment_post_path_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -118,6 +227,171 @@ class Follow(models.Model):
         ordering = ['-user']
         verbose_name = 'Подписки'
         verbose_name_plural = 'Подписки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'author'], name='unique_follow'
+            ),
+        ]
 
     def __str__(self):
         return self.user.username
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        verbose_name='Пользователь',
+        related_name='counters',
+    )
+    post_count = models.PositiveIntegerField('Число постов', default=0)
+    follower_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0
+    )
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+    unread_notifications = models.PositiveIntegerField(
+        'Непрочитанные уведомления', default=0
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Читатель',
+        related_name='timeline',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='timeline_entries',
+    )
+    pub_date = models.DateTimeField('Дата создания поста')
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Запись ленты подписок'
+        verbose_name_plural = 'Записи ленты подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_entry'
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'], name='timeline_user_date_idx'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
+
+
+NEW_POST = 'post'
+NEW_COMMENT = 'comment'
+NEW_REPLY = 'reply'
+
+
+class NotificationQuerySet(models.QuerySet):
+    def feed(self):
+        """Уведомления для списка: автор события и пост в том же
+        запросе."""
+        return self.select_related('actor', 'post').only(
+            'kind', 'pub_date', 'is_read', 'post_id', 'comment_id',
+            'actor__username', 'post__text',
+        )
+
+
+class Notification(models.Model):
+    KIND_CHOICES = (
+        (NEW_POST, 'Новый пост'),
+        (NEW_COMMENT, 'Комментарий к посту'),
+        (NEW_REPLY, 'Ответ на комментарий'),
+    )
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Получатель',
+        related_name='notifications',
+    )
+    kind = models.CharField('Событие', max_length=16, choices=KIND_CHOICES)
+    actor = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        verbose_name='Автор события',
+        related_name='+',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='notifications',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        blank=True,
+        null=True,
+        verbose_name='Комментарий',
+        related_name='notifications',
+    )
+    pub_date = models.DateTimeField('Дата создания', auto_now_add=True)
+    is_read = models.BooleanField('Прочитано', default=False)
+
+    objects = NotificationQuerySet.as_manager()
+
+    class Meta:
+        ordering = ['-pub_date']
+        verbose_name = 'Уведомление'
+        verbose_name_plural = 'Уведомления'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date'],
+                name='notification_user_date_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user_id}: {self.kind} {self.post_id}'
+
+
+class SearchEntry(models.Model):
+    term = models.CharField('Терм', max_length=64)
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        verbose_name='Пост',
+        related_name='search_entries',
+    )
+    comment = models.ForeignKey(
+        Comment,
+        on_delete=models.CASCADE,
+        verbose_name='Комментарий',
+        related_name='search_entries',
+        blank=True,
+        null=True,
+    )
+    weight = models.PositiveIntegerField('Вес')
+
+    class Meta:
+        verbose_name = 'Запись поискового индекса'
+        verbose_name_plural = 'Записи поискового индекса'
+        indexes = [
+            models.Index(
+                fields=['term', 'post', 'comment'],
+                name='search_term_entry_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.term}: {self.post_id}'
@@ -0,0 +1,122 @@
+"""Уведомления о новых постах подписок и комментариях.
+
+Уведомления раскладываются фоновыми задачами (posts.tasks) пачками:
+одна вставка строк на пачку получателей и один UPDATE их счётчиков
+непрочитанного в UserCounters. Шапка читает счётчик из кеша, поэтому
+страницам не нужен запрос к базе; ключ сбрасывается при каждом
+изменении счётчика. Кеш в памяти процесса не видит сбросов из воркеров,
+там число обновляется раз в FEED_CACHE_LOCAL_TIMEOUT секунд.
+
+Старые уведомления удаляет периодическая задача expire: прочитанные
+живут NOTIFICATION_READ_KEEP_DAYS дней, остальные -
+NOTIFICATION_KEEP_DAYS, и у пользователя остаются только
+NOTIFICATION_MAX_PER_USER последних.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .counters import change_unread_counters, recount_unread
+from .feed_cache import feed_cache_timeout
+from .models import Notification, UserCounters
+
+
+def unread_key(user_id):
+    return f'notifications:unread:{user_id}'
+
+
+def forget_unread(user_ids):
+    cache.delete_many([unread_key(user_id) for user_id in user_ids])
+
+
+def unread_count(user):
+    """Число непрочитанных уведомлений из кеша, при промахе - из
+    счётчиков."""
+    key = unread_key(user.pk)
+    count = cache.get(key)
+    if count is None:
+        count = UserCounters.objects.filter(user_id=user.pk).values_list(
+            'unread_notifications', flat=True
+        ).first() or 0
+        cache.set(key, count, feed_cache_timeout())
+    return count
+
+
+def deliver(kind, user_ids, actor_id, post_id, comment_id=None):
+    """Создаёт уведомление каждому из user_ids и сдвигает их счётчики.
+
+    Получатели, у которых такое уведомление уже есть, пропускаются:
+    повтор задачи не удваивает уведомления.
+    """
+    user_ids = set(user_ids) - set(Notification.objects.filter(
+        kind=kind, post_id=post_id, comment_id=comment_id,
+        user_id__in=user_ids,
+    ).values_list('user_id', flat=True))
+    if not user_ids:
+        return 0
+    Notification.objects.bulk_create(
+        (
+            Notification(
+                user_id=user_id, kind=kind, actor_id=actor_id,
+                post_id=post_id, comment_id=comment_id,
+            )
+            for user_id in user_ids
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+    )
+    change_unread_counters(user_ids, 1)
+    forget_unread(user_ids)
+    return len(user_ids)
+
+
+def mark_read(user, notification_ids):
+    """Отмечает прочитанными показанные пользователю уведомления и
+    уменьшает его счётчик на их число."""
+    read = Notification.objects.filter(
+        user=user, pk__in=notification_ids, is_read=False
+    ).update(is_read=True)
+    if read and not change_unread_counters([user.pk], -read):
+        # Счётчик разошёлся с таблицей, например после каскадных удалений.
+        recount_unread([user.pk])
+    forget_unread([user.pk])
+
+
+def recount_nonzero_unread():
+    """Пересчитывает ненулевые счётчики непрочитанного: удаление постов
+    и комментариев уносит уведомления каскадом, мимо счётчиков."""
+    user_ids = list(UserCounters.objects.filter(
+        unread_notifications__gt=0
+    ).values_list('user_id', flat=True))
+    recount_unread(user_ids)
+    forget_unread(user_ids)
+
+
+def expire(now=None):
+    """Удаляет устаревшие уведомления и лишние сверх
+    NOTIFICATION_MAX_PER_USER; возвращает число удалённых."""
+    now = now or timezone.now()
+    notifications = Notification.objects.all()
+    deleted, _ = notifications.filter(
+        Q(pub_date__lt=now - timedelta(days=settings.NOTIFICATION_KEEP_DAYS))
+        | Q(is_read=True, pub_date__lt=now - timedelta(
+            days=settings.NOTIFICATION_READ_KEEP_DAYS
+        ))
+    ).delete()
+    limit = settings.NOTIFICATION_MAX_PER_USER
+    crowded = notifications.order_by().values('user_id').annotate(
+        total=Count('pk')
+    ).filter(total__gt=limit).values_list('user_id', flat=True)
+    for user_id in list(crowded):
+        own = notifications.filter(user_id=user_id)
+        pub_date, pk = own.order_by('-pub_date', '-pk').values_list(
+            'pub_date', 'pk'
+        )[limit - 1]
+        removed, _ = own.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        ).delete()
+        deleted += removed
+    recount_nonzero_unread()
+    return deleted
@@ -0,0 +1,158 @@
+"""Кеш целых страниц с «дырами» под пользователя.
+
+На месте фрагментов, которые зависят от пользователя (шапка,
+переключатель лент, кнопка подписки, форма комментария), тег {% hole %}
+оставляет метку, поэтому тело страницы одно на всех и хранится в кеше
+под версией страницы из conditional (поколение ленты, счётчики,
+update_date) и адресом. После рендера метки заменяются фрагментами для
+текущего пользователя. Гостю страница отдаётся из кеша целиком, без
+представления, контекст-процессоров и шаблонов.
+"""
+import hashlib
+import re
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .conditional import viewer_follows
+from .feed_cache import feed_cache_timeout
+from .forms import CommentForm
+from .notifications import unread_count
+
+# Текст постов и комментариев экранируется, поэтому метку в странице
+# может оставить только тег {% hole %}.
+HOLE_RE = re.compile(r'<!--hole:([\w:.@+-]+)-->')
+
+
+def header(request):
+    # Страница ошибки может рендериться до AuthenticationMiddleware.
+    user = getattr(request, 'user', None)
+    return render_to_string('includes/header.html', {
+        'request': request,
+        'user': user,
+        'unread_notifications': (
+            unread_count(user) if user and user.is_authenticated else 0
+        ),
+    })
+
+
+def feed_switcher(request, active):
+    return render_to_string('posts/includes/switcher.html', {
+        'user': request.user,
+        active: True,
+    })
+
+
+def follow_button(request, author_id, username):
+    return render_to_string('posts/includes/follow_button.html', {
+        'user': request.user,
+        'username': username,
+        'following': viewer_follows(request, int(author_id)),
+    })
+
+
+def post_edit_link(request, post_id, author_id):
+    return render_to_string('posts/includes/post_edit_link.html', {
+        'post_id': post_id,
+        'is_author': request.user.pk == int(author_id),
+    })
+
+
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    reply_to = request.GET.get('reply_to', '')
+    return render_to_string('posts/includes/comment_form.html', {
+        'post_id': post_id,
+        'reply_to': reply_to if reply_to.isdigit() else None,
+        'form': CommentForm(),
+        'csrf_token': get_token(request),
+    })
+
+
+HOLES = {
+    func.__name__: func
+    for func in (
+        header, feed_switcher, follow_button, post_edit_link, comment_form
+    )
+}
+
+
+def hole(request, name, *args):
+    """Фрагмент name для пользователя запроса или метка на его месте,
+    если страница рендерится в кеш."""
+    if getattr(request, 'punch_holes', False):
+        return mark_safe(f'<!--hole:{":".join((name, *map(str, args)))}-->')
+    return HOLES[name](request, *args)
+
+
+def fill_holes(request, content):
+    return HOLE_RE.sub(
+        lambda match: hole(request, *match.group(1).split(':')), content
+    )
+
+
+def page_key(version, request):
+    digest = hashlib.md5(
+        f'{version}:{request.get_full_path()}'.encode()
+    ).hexdigest()
+    return f'page:anonymous:{digest}'
+
+
+def cacheable(request, response):
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+def page_cache(version_func):
+    """Кеширует страницу под версией version_func(request, *args).
+
+    Гостю страница отдаётся из кеша целиком. Для вошедшего пользователя
+    представление выполняется (его запросы - те же узкие запросы, что и
+    для ETag), а тело страницы шаблон берёт из фрагмента {% cache %}
+    под request.page_shell, с метками вместо личных фрагментов.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version = version_func(request, *args, **kwargs)
+            if version is None:
+                return view(request, *args, **kwargs)
+            anonymous = not request.user.is_authenticated
+            key = page_key(version, request)
+            if anonymous:
+                content = cache.get(key)
+                if content is not None:
+                    return HttpResponse(content)
+            request.page_shell = {
+                'version': f'{version}:{request.get_full_path()}',
+                'timeout': feed_cache_timeout(),
+            }
+            request.punch_holes = True
+            try:
+                response = view(request, *args, **kwargs)
+            finally:
+                request.punch_holes = False
+            if response.streaming:
+                return response
+            response.content = fill_holes(
+                request, response.content.decode(response.charset)
+            )
+            if anonymous and cacheable(request, response):
+                cache.set(
+                    key, response.content.decode(response.charset),
+                    feed_cache_timeout(),
+                )
+            return response
+        return wrapper
+    return decorator
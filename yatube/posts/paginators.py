@@ -0,0 +1,200 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+CURSOR_NEXT = 'n'
+CURSOR_PREVIOUS = 'p'
+
+
+def encode_cursor(direction, post):
+    """Упаковывает ключ (pub_date, id) поста в непрозрачный токен."""
+    raw = f'{direction}|{post.pub_date.isoformat()}|{post.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Распаковывает токен, для некорректного токена возвращает None."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        direction, pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeError, ValueError):
+        return None
+    if direction not in (CURSOR_NEXT, CURSOR_PREVIOUS) or pub_date is None:
+        return None
+    return direction, pub_date, pk
+
+
+class FeedPaginator(Paginator):
+    """Листает ленту постов. Число постов можно передать готовым из
+    счётчиков, тогда COUNT(*) не выполняется."""
+
+    def __init__(self, object_list, per_page, count=None):
+        super().__init__(object_list.feed(), per_page)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return self.object_list.count()
+
+    def page(self, number):
+        # Срез не обрезается по count: приблизительный счётчик влияет
+        # только на навигацию, но не на состав страницы.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        return self._get_page(
+            self.object_list[bottom:bottom + self.per_page], number, self
+        )
+
+
+class CursorPage(Page):
+    """Страница ленты, которая не знает своего номера и общего числа
+    страниц, а только курсоры на соседние страницы.
+
+    Методы Page, которым нужен номер, вызывают NotImplementedError:
+    шаблонам курсорных страниц - cursor_paginator.html, а не
+    paginator.html.
+    """
+    cursor_mode = True
+
+    def __init__(self, object_list, paginator, cursor, previous_cursor,
+                 next_cursor):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.previous_cursor = previous_cursor
+        self.next_cursor = next_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.cursor or "first"}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def _no_number(self):
+        raise NotImplementedError(
+            'У страницы по курсору нет номера: используйте next_cursor '
+            'и previous_cursor.'
+        )
+
+    def next_page_number(self):
+        self._no_number()
+
+    def previous_page_number(self):
+        self._no_number()
+
+    def start_index(self):
+        self._no_number()
+
+    def end_index(self):
+        self._no_number()
+
+
+class CursorPaginator(FeedPaginator):
+    """Keyset-пагинация по (pub_date, id): каждая страница - один запрос
+    LIMIT без OFFSET и без COUNT(*)."""
+
+    def __init__(self, object_list, per_page, count=None):
+        super().__init__(object_list, per_page, count)
+        self.object_list = self.object_list.order_by('-pub_date', '-pk')
+
+    def get_page(self, cursor):
+        decoded = decode_cursor(cursor)
+        if decoded is None:
+            return self._first_page()
+        direction, pub_date, pk = decoded
+        if direction == CURSOR_NEXT:
+            return self._page_after(cursor, pub_date, pk)
+        return self._page_before(cursor, pub_date, pk)
+
+    def page(self, cursor):
+        return self.get_page(cursor)
+
+    def _first_page(self):
+        rows = list(self.object_list[:self.per_page + 1])
+        return self._build(None, rows, has_previous=False,
+                           has_next=len(rows) > self.per_page)
+
+    def _page_after(self, cursor, pub_date, pk):
+        rows = list(self.object_list.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+        )[:self.per_page + 1])
+        return self._build(cursor, rows, has_previous=True,
+                           has_next=len(rows) > self.per_page)
+
+    def _page_before(self, cursor, pub_date, pk):
+        rows = list(self.object_list.filter(
+            Q(pub_date__gt=pub_date) | Q(pub_date=pub_date, pk__gt=pk)
+        ).reverse()[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return self._build(cursor, rows, has_previous=has_previous,
+                           has_next=True)
+
+    def _build(self, cursor, rows, has_previous, has_next):
+        rows = rows[:self.per_page]
+        previous_cursor = next_cursor = None
+        if rows and has_previous:
+            previous_cursor = encode_cursor(CURSOR_PREVIOUS, rows[0])
+        if rows and has_next:
+            next_cursor = encode_cursor(CURSOR_NEXT, rows[-1])
+        return CursorPage(rows, self, cursor, previous_cursor, next_cursor)
+
+
+def estimate_row_count(model, using):
+    """Оценка числа строк таблицы без COUNT(*) или None.
+
+    PostgreSQL берёт её из статистики планировщика, остальные базы - по
+    диапазону автоинкрементного ключа (два поиска по индексу; после
+    удалений оценка завышена). MIN и MAX в одном запросе SQLite
+    выполняет сканированием таблицы, поэтому границы читаются отдельно.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE relname = %s',
+                [model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+        return None
+    if model._meta.pk.get_internal_type() not in (
+        'AutoField', 'BigAutoField'
+    ):
+        return None
+    keys = model._default_manager.using(using).values_list('pk', flat=True)
+    high = keys.order_by('-pk').first()
+    if high is None:
+        return 0
+    return high - keys.order_by('pk').first() + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор админки для больших таблиц. Без фильтров число строк
+    оценивается, с фильтрами считается не дальше ADMIN_COUNT_LIMIT."""
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_row_count(queryset.model, queryset.db)
+            if estimate is not None:
+                return estimate
+        return queryset[:settings.ADMIN_COUNT_LIMIT].count()
@@ -0,0 +1,237 @@
+"""Полнотекстовый поиск по постам и комментариям.
+
+Индекс - обычная таблица SearchEntry (терм, пост, комментарий, вес),
+поэтому работает на любой базе. Слова приводятся к основе упрощённым
+стеммером Snowball для русского языка: FTS5 в SQLite умеет стемминг
+только для английского. Записи поста и каждого комментария
+обновляются обработчиками сигналов при сохранении, а при удалении
+уходят каскадом.
+"""
+import re
+from collections import Counter
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import Count, Sum
+
+from .models import Comment, Post, SearchEntry
+
+WORD_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+# Вес одного вхождения слова в текст поста и в комментарий; частота
+# слова в тексте учитывается не больше MAX_TERM_FREQUENCY раз.
+POST_WEIGHT = 3
+COMMENT_WEIGHT = 1
+MAX_TERM_FREQUENCY = 5
+
+STOP_WORDS = frozenset((
+    'а', 'без', 'бы', 'был', 'была', 'были', 'было', 'быть', 'в', 'вам',
+    'вас', 'во', 'вот', 'все', 'всё', 'вы', 'да', 'для', 'до', 'его',
+    'ее', 'её', 'если', 'есть', 'еще', 'ещё', 'же', 'за', 'и', 'из',
+    'или', 'им', 'их', 'к', 'как', 'ко', 'когда', 'кто', 'ли', 'мне',
+    'мы', 'на', 'над', 'не', 'него', 'нет', 'ни', 'но', 'ну', 'о', 'об',
+    'он', 'она', 'они', 'оно', 'от', 'по', 'под', 'при', 'с', 'со', 'так',
+    'там', 'те', 'то', 'только', 'ты', 'у', 'уже', 'что', 'чтобы', 'это',
+    'я',
+))
+
+VOWELS = 'аеиоуыэюя'
+PERFECTIVE_GERUND = (
+    ('в', 'вши', 'вшись'),
+    ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'),
+)
+ADJECTIVE = (
+    (),
+    ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+     'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+     'ая', 'яя', 'ою', 'ею'),
+)
+PARTICIPLE = (
+    ('ем', 'нн', 'вш', 'ющ', 'щ'),
+    ('ивш', 'ывш', 'ующ'),
+)
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (
+    ('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+     'ют', 'ны', 'ть', 'ешь', 'нно'),
+    ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+     'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+     'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'),
+)
+NOUN = (
+    (),
+    ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии',
+     'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам',
+     'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия',
+     'ья', 'я'),
+)
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+
+
+def _strip(word, endings):
+    """Отрезает самое длинное окончание или возвращает None.
+
+    endings - пара групп: окончания первой группы допустимы только
+    после «а» или «я», второй - после любой буквы.
+    """
+    after_a, anywhere = endings
+    candidates = sorted(
+        [(ending, True) for ending in after_a]
+        + [(ending, False) for ending in anywhere],
+        key=lambda item: -len(item[0]),
+    )
+    for ending, needs_a in candidates:
+        if not word.endswith(ending):
+            continue
+        stem = word[:-len(ending)]
+        if needs_a and not stem.endswith(('а', 'я')):
+            continue
+        return stem
+    return None
+
+
+def _region(word):
+    """Позиция начала области после первого сочетания гласная-согласная."""
+    for index in range(1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _strip_inflection(rv):
+    stripped = _strip(rv, PERFECTIVE_GERUND)
+    if stripped is not None:
+        return stripped
+    rv = _strip(rv, REFLEXIVE) or rv
+    stripped = _strip(rv, ADJECTIVE)
+    if stripped is not None:
+        return _strip(stripped, PARTICIPLE) or stripped
+    for endings in (VERB, NOUN):
+        stripped = _strip(rv, endings)
+        if stripped is not None:
+            return stripped
+    return rv
+
+
+def _strip_superlative(rv):
+    if rv.endswith('нн'):
+        return rv[:-1]
+    superlative = _strip(rv, SUPERLATIVE)
+    if superlative is not None:
+        return superlative[:-1] if superlative.endswith('нн') else superlative
+    return rv[:-1] if rv.endswith('ь') else rv
+
+
+@lru_cache(maxsize=100_000)
+def stem(word):
+    """Основа русского слова; слова без кириллицы возвращаются как есть."""
+    word = word.lower().replace('ё', 'е')
+    start = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        None,
+    )
+    if start is None:
+        return word
+    prefix, rv = word[:start], word[start:]
+    r1 = _region(word)
+    r2 = r1 + _region(word[r1:])
+
+    rv = _strip_inflection(rv)
+    if rv.endswith('и'):
+        rv = rv[:-1]
+    derivational = _strip(rv, DERIVATIONAL)
+    if derivational is not None and len(prefix) + len(derivational) >= r2:
+        rv = derivational
+    return prefix + _strip_superlative(rv)
+
+
+def tokenize(text):
+    """Основы значимых слов текста в порядке появления."""
+    terms = []
+    for word in WORD_RE.findall(text.lower()):
+        if word in STOP_WORDS or (len(word) < 2 and not word.isdigit()):
+            continue
+        terms.append(stem(word)[:MAX_TERM_LENGTH])
+    return terms
+
+
+def query_terms(query):
+    """Уникальные термы поискового запроса."""
+    return list(dict.fromkeys(tokenize(query)))
+
+
+def term_weights(text, comment=False):
+    """Пары (терм, вес) для текста поста или комментария."""
+    weight = COMMENT_WEIGHT if comment else POST_WEIGHT
+    return [
+        (term, min(frequency, MAX_TERM_FREQUENCY) * weight)
+        for term, frequency in Counter(tokenize(text)).items()
+    ]
+
+
+def _entries(model, text, post_id, comment_id=None):
+    return [
+        model(term=term, weight=weight, post_id=post_id, comment_id=comment_id)
+        for term, weight in term_weights(text, comment_id is not None)
+    ]
+
+
+def index_post(post):
+    """Переиндексирует текст поста, не трогая его комментарии."""
+    SearchEntry.objects.filter(post_id=post.pk, comment__isnull=True).delete()
+    SearchEntry.objects.bulk_create(
+        _entries(SearchEntry, post.text, post.pk),
+        batch_size=settings.SEARCH_BATCH_SIZE,
+    )
+
+
+def index_comment(comment):
+    """Переиндексирует текст комментария."""
+    SearchEntry.objects.filter(comment_id=comment.pk).delete()
+    if comment.post_id is None:
+        return
+    SearchEntry.objects.bulk_create(
+        _entries(SearchEntry, comment.text, comment.post_id, comment.pk),
+        batch_size=settings.SEARCH_BATCH_SIZE,
+    )
+
+
+def rebuild_index():
+    """Строит индекс заново по всем постам и комментариям."""
+    SearchEntry.objects.all().delete()
+    entries = []
+    for pk, text in Post.objects.values_list('pk', 'text').iterator():
+        entries += _entries(SearchEntry, text, pk)
+        if len(entries) >= settings.SEARCH_BATCH_SIZE:
+            SearchEntry.objects.bulk_create(entries)
+            entries = []
+    comments = Comment.objects.filter(post__isnull=False).values_list(
+        'pk', 'post_id', 'text'
+    )
+    for pk, post_id, text in comments.iterator():
+        entries += _entries(SearchEntry, text, post_id, pk)
+        if len(entries) >= settings.SEARCH_BATCH_SIZE:
+            SearchEntry.objects.bulk_create(entries)
+            entries = []
+    SearchEntry.objects.bulk_create(entries)
+
+
+def search_posts(terms):
+    """Посты, содержащие все термы, от самых релевантных."""
+    return Post.objects.filter(search_entries__term__in=terms).annotate(
+        matched_terms=Count('search_entries__term', distinct=True),
+        rank=Sum('search_entries__weight'),
+    ).filter(matched_terms=len(terms)).order_by('-rank', '-pub_date', '-pk')
+
+
+def filter_matching(queryset, terms, comments=False):
+    """Оставляет посты (или комментарии), в собственном тексте которых
+    есть все термы. Каждый терм - отдельный IN по покрывающему индексу
+    (term, post, comment), без группировки по всем совпадениям."""
+    field = 'comment_id' if comments else 'post_id'
+    for term in terms:
+        queryset = queryset.filter(pk__in=SearchEntry.objects.filter(
+            term=term, comment__isnull=not comments
+        ).values(field))
+    return queryset
@@ -0,0 +1,132 @@
+from django.conf import settings
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+
+from . import counters, search, tasks, threads, timeline
+from .feed_cache import bump_post_feeds, bump_post_page
+from .models import Comment, Follow, Group, Post, UserCounters
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def create_user_counters(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(pre_save, sender=Post)
+def remember_post_owner(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance._previous = Post.objects.filter(pk=instance.pk).values_list(
+            'author_id', 'group_id'
+        ).first()
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    update_fields = kwargs.get('update_fields')
+    if update_fields is None or 'text' in update_fields:
+        search.index_post(instance)
+    previous = getattr(instance, '_previous', None)
+    if created or previous is None:
+        counters.change_user_counter(instance.author_id, 'post_count', 1)
+        counters.change_group_counter(instance.group_id, 1)
+        counters.change_total_post_count(1)
+        timeline.fan_out_post(instance)
+        bump_post_feeds([instance.author_id], [instance.group_id])
+        tasks.notify_followers.delay(post_id=instance.pk)
+        return
+    author_id, group_id = previous
+    bump_post_feeds(
+        [author_id, instance.author_id], [group_id, instance.group_id]
+    )
+    if author_id != instance.author_id:
+        counters.change_user_counter(author_id, 'post_count', -1)
+        counters.change_user_counter(instance.author_id, 'post_count', 1)
+    if group_id != instance.group_id:
+        counters.change_group_counter(group_id, -1)
+        counters.change_group_counter(instance.group_id, 1)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'post_count', -1)
+    counters.change_group_counter(instance.group_id, -1)
+    counters.change_total_post_count(-1)
+    bump_post_feeds([instance.author_id], [instance.group_id])
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if not raw:
+        search.index_comment(instance)
+    if created and not raw:
+        threads.assign_path(instance)
+        counters.change_comment_counter(instance.post_id, 1)
+        counters.change_reply_counter(instance.parent_id, 1)
+        bump_comment_feeds(instance)
+        tasks.notify_comment.delay(comment_id=instance.pk)
+    elif not raw and instance.post_id is not None:
+        # Правка текста не меняет ни счётчиков, ни дат поста.
+        bump_post_page(instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.change_comment_counter(instance.post_id, -1)
+    counters.change_reply_counter(instance.parent_id, -1)
+    bump_comment_feeds(instance)
+
+
+def bump_comment_feeds(comment):
+    """Число комментариев показывается в лентах, сбрасываем их."""
+    owner = Post.objects.filter(pk=comment.post_id).values_list(
+        'author_id', 'group_id'
+    ).first()
+    if owner is not None:
+        bump_post_feeds([owner[0]], [owner[1]])
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw, **kwargs):
+    if not created and not raw:
+        bump_group_feeds(instance.pk, group_author_ids(instance.pk))
+
+
+@receiver(pre_delete, sender=Group)
+def remember_group_authors(sender, instance, **kwargs):
+    instance._author_ids = group_author_ids(instance.pk)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump_group_feeds(instance.pk, getattr(instance, '_author_ids', []))
+
+
+def group_author_ids(group_id):
+    return list(Post.objects.filter(group_id=group_id).values_list(
+        'author_id', flat=True
+    ).distinct())
+
+
+def bump_group_feeds(group_id, author_ids):
+    """Название и адрес группы показываются в постах всех лент."""
+    bump_post_feeds(author_ids, [group_id])
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_user_counter(instance.author_id, 'follower_count', 1)
+        counters.change_user_counter(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_counter(instance.author_id, 'follower_count', -1)
+    counters.change_user_counter(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
@@ -0,0 +1,95 @@
+"""Фоновые задачи постов (core.taskqueue)."""
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+
+from core.taskqueue import task
+
+from . import notifications
+from .models import (
+    NEW_COMMENT, NEW_POST, NEW_REPLY, Comment, Follow, Post, User
+)
+
+
+@task
+def notify_followers(post_id):
+    """Раскладывает уведомления о новом посте по подписчикам автора:
+    одна задача send_post_notifications на NOTIFICATION_BATCH_SIZE
+    подписчиков, чтобы пачки отправлялись и повторялись независимо."""
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True
+    ).first()
+    if author_id is None:
+        return
+    follower_ids = Follow.objects.filter(author_id=author_id).order_by(
+        'user_id'
+    ).values_list('user_id', flat=True)
+    size = settings.NOTIFICATION_BATCH_SIZE
+    batches = []
+    batch = []
+    for user_id in follower_ids.iterator():
+        batch.append(user_id)
+        if len(batch) == size:
+            batches.append({'post_id': post_id, 'user_ids': batch})
+            batch = []
+    if batch:
+        batches.append({'post_id': post_id, 'user_ids': batch})
+    send_post_notifications.delay_many(batches)
+
+
+@task
+def send_post_notifications(post_id, user_ids):
+    """Уведомления о новом посте пачке подписчиков: в ленту уведомлений
+    всем, письма - тем, у кого есть адрес, через одно соединение
+    EMAIL_BACKEND. При повторе пачки письма могут уйти дважды."""
+    post = Post.objects.select_related('author').filter(pk=post_id).first()
+    if post is None:
+        return
+    notifications.deliver(NEW_POST, user_ids, post.author_id, post_id)
+    users = User.objects.filter(pk__in=user_ids).exclude(email='').only(
+        'username', 'email'
+    )
+    subject = f'Новый пост: {post.author.username}'
+    messages = [
+        EmailMessage(
+            subject,
+            render_to_string('posts/emails/new_post.txt', {
+                'user': user,
+                'author': post.author,
+                'post': post,
+                'site_url': settings.SITE_URL,
+            }),
+            to=[user.email],
+        )
+        for user in users
+    ]
+    if messages:
+        get_connection().send_messages(messages)
+
+
+@task
+def notify_comment(comment_id):
+    """Уведомляет автора поста о комментарии и автора комментария, на
+    который ответили, об ответе; о своих комментариях не уведомляет."""
+    comment = Comment.objects.filter(pk=comment_id).values(
+        'author_id', 'post_id', 'post__author_id', 'parent__author_id'
+    ).first()
+    if comment is None:
+        return
+    recipients = {
+        comment['post__author_id']: NEW_COMMENT,
+        comment['parent__author_id']: NEW_REPLY,
+    }
+    recipients.pop(None, None)
+    recipients.pop(comment['author_id'], None)
+    for user_id, kind in recipients.items():
+        notifications.deliver(
+            kind, [user_id], comment['author_id'], comment['post_id'],
+            comment_id,
+        )
+
+
+@task
+def expire_notifications():
+    """Периодическая чистка уведомлений (TASK_PERIODIC)."""
+    notifications.expire()
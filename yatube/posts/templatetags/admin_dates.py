@@ -0,0 +1,97 @@
+import datetime
+
+from django import template
+from django.utils import formats, timezone
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+register = template.Library()
+
+
+def _bound(queryset, field_name, last=False):
+    ordering = f'-{field_name}' if last else field_name
+    value = queryset.order_by(ordering).values_list(
+        field_name, flat=True
+    ).first()
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        value = timezone.localtime(value)
+    return value
+
+
+@register.inclusion_tag('admin/date_hierarchy.html')
+def indexed_date_hierarchy(cl):
+    """Иерархия дат админки, которой хватает двух поисков по индексу.
+
+    Стандартный тег строит список периодов через DISTINCT по всем строкам
+    списка, здесь периоды берутся подряд между первой и последней датой,
+    поэтому среди них могут быть периоды без записей.
+    """
+    field_name = cl.date_hierarchy
+    year_field = f'{field_name}__year'
+    month_field = f'{field_name}__month'
+    day_field = f'{field_name}__day'
+    year = cl.params.get(year_field)
+    month = cl.params.get(month_field)
+    day = cl.params.get(day_field)
+
+    def link(filters):
+        return cl.get_query_string(filters, [f'{field_name}__'])
+
+    if year and month and day:
+        date = datetime.date(int(year), int(month), int(day))
+        return {
+            'show': True,
+            'back': {
+                'link': link({year_field: year, month_field: month}),
+                'title': capfirst(formats.date_format(
+                    date, 'YEAR_MONTH_FORMAT'
+                )),
+            },
+            'choices': [{'title': capfirst(
+                formats.date_format(date, 'MONTH_DAY_FORMAT')
+            )}],
+        }
+
+    first = _bound(cl.queryset, field_name)
+    last = _bound(cl.queryset, field_name, last=True)
+    if first is None:
+        return {'show': True, 'back': None, 'choices': []}
+    if not (year or month):
+        if first.year == last.year:
+            year = first.year
+            if first.month == last.month:
+                month = first.month
+
+    if year and month:
+        return {
+            'show': True,
+            'back': {'link': link({year_field: year}), 'title': str(year)},
+            'choices': [{
+                'link': link({
+                    year_field: year, month_field: month, day_field: number
+                }),
+                'title': capfirst(formats.date_format(
+                    datetime.date(int(year), int(month), number),
+                    'MONTH_DAY_FORMAT',
+                )),
+            } for number in range(first.day, last.day + 1)],
+        }
+    if year:
+        return {
+            'show': True,
+            'back': {'link': link({}), 'title': _('All dates')},
+            'choices': [{
+                'link': link({year_field: year, month_field: number}),
+                'title': capfirst(formats.date_format(
+                    datetime.date(int(year), number, 1), 'YEAR_MONTH_FORMAT'
+                )),
+            } for number in range(first.month, last.month + 1)],
+        }
+    return {
+        'show': True,
+        'back': None,
+        'choices': [{
+            'link': link({year_field: str(number)}),
+            'title': str(number),
+        } for number in range(first.year, last.year + 1)],
+    }
@@ -0,0 +1,12 @@
+from django import template
+
+from posts import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """Фрагмент страницы, который зависит от пользователя
+    (см. posts.page_cache)."""
+    return page_cache.hole(context['request'], name, *args)
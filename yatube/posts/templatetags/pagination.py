@@ -0,0 +1,13 @@
+from django import template
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Строка запроса текущей страницы с заменёнными параметрами,
+    чтобы навигация сохраняла, например, поисковый запрос."""
+    query = context['request'].GET.copy()
+    for name, value in params.items():
+        query[name] = value
+    return f'?{query.urlencode()}'
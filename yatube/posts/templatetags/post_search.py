@@ -0,0 +1,23 @@
+from django import template
+from django.utils.html import conditional_escape
+from django.utils.safestring import mark_safe
+
+from ..search import WORD_RE, stem
+
+register = template.Library()
+
+
+@register.filter(needs_autoescape=True)
+def highlight(text, terms, autoescape=True):
+    """Выделяет <mark> слова текста, основы которых есть в terms."""
+    escape = conditional_escape if autoescape else str
+    parts = []
+    position = 0
+    for match in WORD_RE.finditer(text):
+        if stem(match.group()) not in terms:
+            continue
+        parts.append(escape(text[position:match.start()]))
+        parts.append(f'<mark>{escape(match.group())}</mark>')
+        position = match.end()
+    parts.append(escape(text[position:]))
+    return mark_safe(''.join(parts))
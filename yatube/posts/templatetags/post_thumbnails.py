@@ -0,0 +1,16 @@
+from django import template
+
+from ..thumbnails import cached_thumbnail, schedule_thumbnails
+from ..variants import picture_sources
+
+register = template.Library()
+
+
+@register.simple_tag
+def feed_picture(image):
+    """Готовые миниатюра и источники <picture> для картинки поста."""
+    thumbnail = cached_thumbnail(image)
+    sources = picture_sources(image)
+    if image and (thumbnail is None or sources is None):
+        schedule_thumbnails(image)
+    return {'thumbnail': thumbnail, 'sources': sources}
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+from ..paginators import EstimatedCountPaginator
+
+User = get_user_model()
+
+
+class AdminChangelistTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        for index in range(5):
+            author = User.objects.create_user(username=f'author{index}')
+            post = Post.objects.create(
+                author=author, group=cls.group, text=f'Котики {index}'
+            )
+            Comment.objects.create(
+                post=post, author=author, text=f'Собаки {index}'
+            )
+            Follow.objects.create(user=cls.admin, author=author)
+
+    def setUp(self):
+        self.admin_client = Client()
+        self.admin_client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        """Число запросов списков не растёт с числом строк и нет
+        COUNT(*) по всей таблице"""
+        for name in ('post', 'comment', 'follow'):
+            url = reverse(f'admin:posts_{name}_changelist')
+            with self.subTest(model=name):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.admin_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['cl'].result_count, 5)
+                self.assertLessEqual(len(queries), 9)
+                self.assertFalse(any(
+                    'COUNT(*)' in query['sql']
+                    for query in queries.captured_queries
+                ))
+
+    def test_search_uses_index(self):
+        """Поиск в админке находит формы слова через индекс"""
+        for name, query, text in (
+            ('post', 'котик', 'Котики 3'),
+            ('comment', 'собака', 'Собаки 3'),
+        ):
+            with self.subTest(model=name):
+                response = self.admin_client.get(
+                    reverse(f'admin:posts_{name}_changelist'),
+                    {'q': f'{query} 3'},
+                )
+                self.assertEqual(
+                    [obj.text for obj in response.context['cl'].result_list],
+                    [text],
+                )
+
+    @override_settings(ADMIN_COUNT_LIMIT=3)
+    def test_filtered_count_limited(self):
+        """Отфильтрованный список считается не дальше ADMIN_COUNT_LIMIT"""
+        paginator = EstimatedCountPaginator(
+            Post.objects.filter(group=self.group), 2
+        )
+        self.assertEqual(paginator.count, 3)
+        paginator = EstimatedCountPaginator(Post.objects.all(), 2)
+        self.assertEqual(paginator.count, 5)
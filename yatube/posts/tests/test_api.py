@@ -0,0 +1,127 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+from http import HTTPStatus
+
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(API_PAGE_SIZE=3)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        for index in range(5):
+            Post.objects.create(
+                author=cls.user, group=cls.group, text=f'Пост {index}'
+            )
+        cls.other_post = Post.objects.create(author=cls.other, text='Другой')
+        cls.post = Post.objects.filter(author=cls.user).first()
+        for index in range(4):
+            Comment.objects.create(
+                post=cls.post, author=cls.other, text=f'Комментарий {index}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def get(self, name, *args, **extra):
+        return self.client.get(reverse(name, args=args), **extra)
+
+    def test_feeds(self):
+        """Ленты отдают компактный JSON и листаются курсорами"""
+        response = self.get('api:post_list')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        data = response.json()
+        self.assertEqual(
+            [post['text'] for post in data['results']],
+            ['Другой', 'Пост 4', 'Пост 3'],
+        )
+        self.assertEqual(data['results'][1], {
+            'id': data['results'][1]['id'],
+            'text': 'Пост 4',
+            'pub_date': data['results'][1]['pub_date'],
+            'author': 'author',
+            'group': 'slug',
+            'image': None,
+            'comments': 4,
+        })
+        self.assertIsNone(data['previous'])
+        response = self.client.get(
+            reverse('api:post_list'), {'cursor': data['next']}
+        )
+        self.assertEqual(
+            [post['text'] for post in response.json()['results']],
+            ['Пост 2', 'Пост 1', 'Пост 0'],
+        )
+        for name, arg in (
+            ('api:group_posts', 'slug'),
+            ('api:profile_posts', 'author'),
+        ):
+            with self.subTest(name=name):
+                results = self.get(name, arg).json()['results']
+                self.assertEqual(results[0]['text'], 'Пост 4')
+                self.assertNotIn('Другой', [post['text'] for post in results])
+        self.assertEqual(
+            self.get('api:group_posts', 'missing').status_code,
+            HTTPStatus.NOT_FOUND,
+        )
+
+    def test_post_and_comments(self):
+        """Пост и его комментарии"""
+        data = self.get('api:post_detail', self.post.pk).json()
+        self.assertEqual(data['text'], 'Пост 4')
+        self.assertEqual(data['comments'], 4)
+        data = self.get('api:comment_list', self.post.pk).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']],
+            ['Комментарий 3', 'Комментарий 2', 'Комментарий 1'],
+        )
+        self.assertEqual(data['results'][0]['author'], 'other')
+        self.assertEqual(
+            self.get('api:post_detail', 0).status_code, HTTPStatus.NOT_FOUND
+        )
+
+    def test_feed_not_modified(self):
+        """Повторный опрос неизменной ленты - 304 без запросов к базе,
+        новый пост меняет ETag"""
+        etag = self.get('api:post_list')['ETag']
+        with self.assertNumQueries(0):
+            response = self.get('api:post_list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Post.objects.create(author=self.user, text='Новый пост')
+        response = self.get('api:post_list', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_post_not_modified(self):
+        """Пост отдаёт 304 по ETag и Last-Modified, пока нет правок
+        и новых комментариев"""
+        response = self.get('api:post_detail', self.post.pk)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertEqual(last_modified, http_date(
+            self.post.comments.first().pub_date.timestamp()
+        ))
+        with self.assertNumQueries(2):
+            response = self.get(
+                'api:post_detail', self.post.pk, HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        Comment.objects.create(post=self.post, author=self.user, text='Ещё')
+        response = self.get(
+            'api:comment_list', self.post.pk, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Ещё')
@@ -0,0 +1,120 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..benchmark import compare_reports, percentile
+from ..models import (
+    NEW_COMMENT, Comment, Follow, Group, Notification, Post, UserCounters,
+)
+from ..urls import urlpatterns
+
+User = get_user_model()
+
+
+class BenchmarkCommandTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Котики и собаки'
+        )
+        Comment.objects.create(post=post, author=cls.user, text='Котики')
+        Notification.objects.create(
+            user=cls.user, kind=NEW_COMMENT, actor=cls.author, post=post
+        )
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.output = os.path.join(directory.name, 'report.json')
+
+    def benchmark(self, **options):
+        call_command(
+            'benchmark', username='reader', repeat=2, warmup=0,
+            output=self.output, stdout=StringIO(), stderr=StringIO(),
+            **options,
+        )
+        with open(self.output, encoding='utf-8') as report:
+            return json.load(report)
+
+    def test_report_covers_posts_urls(self):
+        """Отчёт содержит все страницы из posts/urls.py и не оставляет
+        следов в базе"""
+        report = self.benchmark()
+        names = {pattern.name for pattern in urlpatterns}
+        self.assertEqual(set(report['results']), names | {
+            'post_create_submit', 'post_edit_submit',
+        })
+        for name, result in report['results'].items():
+            with self.subTest(name=name):
+                self.assertIn(result['status'], (200, 302))
+                self.assertEqual(result['requests'], 2)
+                self.assertGreater(result['queries']['per_request'], 0)
+                self.assertLessEqual(
+                    result['latency_ms']['p50'], result['latency_ms']['max']
+                )
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertFalse(Follow.objects.exists())
+        self.assertFalse(Notification.objects.get().is_read)
+        self.assertEqual(
+            UserCounters.objects.get(user=self.user).unread_notifications, 1
+        )
+
+    def test_baseline_regression(self):
+        """Рост числа запросов относительно базового отчёта - ошибка"""
+        report = self.benchmark()
+        report['results']['index']['queries']['per_request'] = 0
+        baseline = self.output + '.baseline'
+        with open(baseline, 'w', encoding='utf-8') as output:
+            json.dump(report, output)
+        with self.assertRaisesMessage(CommandError, 'Регрессий'):
+            self.benchmark(baseline=baseline)
+
+
+class BenchmarkReportTests(TestCase):
+    def result(self, p95, queries, status=200):
+        return {
+            'status': status,
+            'latency_ms': {'p95': p95},
+            'queries': {'per_request': queries},
+        }
+
+    def test_percentile(self):
+        """Перцентиль считается с интерполяцией"""
+        self.assertEqual(percentile([4, 1, 3, 2], 50), 2.5)
+        self.assertEqual(percentile([1, 2, 3, 4], 100), 4)
+        self.assertEqual(percentile([7], 95), 7)
+
+    def test_compare_reports(self):
+        """Регрессии - заметный рост p95, рост запросов, смена статуса"""
+        baseline = {'results': {
+            'index': self.result(10, 3),
+            'profile': self.result(10, 3),
+            'search': self.result(10, 3),
+            'post_detail': self.result(10, 3),
+        }}
+        report = {'results': {
+            'index': self.result(14, 3),
+            'profile': self.result(20, 3),
+            'search': self.result(10, 4),
+            'post_detail': self.result(10, 3, status=500),
+            'follow_index': self.result(100, 10),
+        }}
+        self.assertEqual(compare_reports(baseline, report), [
+            'profile: p95 10 -> 20 мс',
+            'search: запросов 3 -> 4',
+            'post_detail: статус 200 -> 500',
+        ])
@@ -0,0 +1,169 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils.http import http_date
+from http import HTTPStatus
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ConditionalPageTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def assertNotModified(self, client, url, etag, modified=False):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(
+            response.status_code,
+            HTTPStatus.OK if modified else HTTPStatus.NOT_MODIFIED,
+        )
+        return response
+
+    def test_not_modified(self):
+        """Неизменная страница отвечает 304 по ETag"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                self.assertNotModified(self.guest_client, url, etag)
+                self.assertNotModified(
+                    self.guest_client, f'{url}?page=2', etag, modified=True
+                )
+
+    def test_new_post_changes_etag(self):
+        """Новый пост меняет ETag лент"""
+        etags = {url: self.guest_client.get(url)['ETag'] for url in self.urls}
+        Post.objects.create(author=self.user, group=self.group, text='Новый')
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertNotModified(
+                    self.guest_client, url, etags[url], modified=True
+                )
+
+    def test_group_change_changes_etag(self):
+        """Правка описания группы меняет ETag её страницы"""
+        url = self.urls[1]
+        etag = self.guest_client.get(url)['ETag']
+        Group.objects.filter(pk=self.group.pk).update(description='Другое')
+        self.assertNotModified(self.guest_client, url, etag, modified=True)
+
+    def test_group_change_changes_post_etag(self):
+        """Смена слага группы меняет ETag страницы её поста"""
+        url = self.urls[3]
+        etag = self.guest_client.get(url)['ETag']
+        Group.objects.filter(pk=self.group.pk).update(slug='other')
+        response = self.assertNotModified(
+            self.guest_client, url, etag, modified=True
+        )
+        self.assertContains(response, reverse(
+            'posts:group_list', kwargs={'slug': 'other'}
+        ))
+
+    def test_follow_changes_profile_etag(self):
+        """Подписка меняет ETag профиля"""
+        url = self.urls[2]
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.assertNotModified(
+            self.reader_client, url, etag, modified=True
+        )
+        self.assertContains(response, 'Отписаться')
+
+    def test_comment_changes_post_validators(self):
+        """Новый комментарий меняет ETag и Last-Modified поста"""
+        url = self.urls[3]
+        response = self.guest_client.get(url)
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(self.post.update_date.timestamp()),
+        )
+        response = self.guest_client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        etag = self.guest_client.get(url)['ETag']
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        response = self.assertNotModified(
+            self.guest_client, url, etag, modified=True
+        )
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date(comment.pub_date.timestamp()),
+        )
+
+    def test_comment_edit_changes_post_etag(self):
+        """Правка комментария меняет ETag и кешированную страницу поста"""
+        url = self.urls[3]
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        etag = self.guest_client.get(url)['ETag']
+        comment.text = 'Исправленный комментарий'
+        comment.save()
+        response = self.assertNotModified(
+            self.guest_client, url, etag, modified=True
+        )
+        self.assertContains(response, 'Исправленный комментарий')
+
+    def test_etag_depends_on_user(self):
+        """ETag разный у гостя и вошедшего пользователя"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.guest_client.get(url)['ETag']
+                self.assertNotModified(
+                    self.reader_client, url, etag, modified=True
+                )
+
+    def test_cache_headers(self):
+        """Гостевые страницы кеширует общий прокси, страницы
+        пользователя - только браузер, с Vary: Cookie"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertIn('public', response['Cache-Control'])
+                self.assertIn('s-maxage', response['Cache-Control'])
+                response = self.reader_client.get(url)
+                self.assertIn('Cookie', response['Vary'])
+                self.assertIn('private', response['Cache-Control'])
+                self.assertIn('no-cache', response['Cache-Control'])
+                self.assertNotIn('s-maxage', response['Cache-Control'])
+
+    def test_missing_page(self):
+        """Несуществующие группа, автор и пост - 404"""
+        for url in (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        ):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertFalse(response.has_header('ETag'))
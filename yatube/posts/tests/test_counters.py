@@ -0,0 +1,94 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, UserCounters
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа2',
+            slug='slug-2',
+            description='Описание тестовой группы2'
+        )
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос в другую группу и удаление поста
+        обновляют счётчики автора и групп"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        self.assertEqual(self.counters(self.author).post_count, 1)
+        self.group.refresh_from_db()
+        self.assertEqual(self.group.post_count, 1)
+
+        post.group = self.group2
+        post.save()
+        self.group.refresh_from_db()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.group.post_count, 0)
+        self.assertEqual(self.group2.post_count, 1)
+
+        post.delete()
+        self.group2.refresh_from_db()
+        self.assertEqual(self.counters(self.author).post_count, 0)
+        self.assertEqual(self.group2.post_count, 0)
+
+    def test_comment_and_follow_counters(self):
+        """Комментарии и подписки обновляют свои счётчики"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Ок'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.counters(self.author).follower_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
+
+        comment.delete()
+        Follow.objects.all().delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(self.counters(self.author).follower_count, 0)
+        self.assertEqual(self.counters(self.reader).following_count, 0)
+
+    def test_recount_command(self):
+        """Команда recount_counters восстанавливает счётчики"""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Comment.objects.create(post=post, author=self.reader, text='Ок')
+        Follow.objects.create(user=self.reader, author=self.author)
+        UserCounters.objects.update(
+            post_count=0, follower_count=0, following_count=0
+        )
+        Post.objects.update(comment_count=0)
+        Group.objects.update(post_count=0)
+
+        call_command('recount_counters', stdout=StringIO())
+
+        post.refresh_from_db()
+        self.group.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(self.group.post_count, 1)
+        self.assertEqual(self.counters(self.author).post_count, 1)
+        self.assertEqual(self.counters(self.author).follower_count, 1)
+        self.assertEqual(self.counters(self.reader).following_count, 1)
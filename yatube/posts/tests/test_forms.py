@@ -7,6 +7,9 @@ from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from io import BytesIO
+from PIL import Image
+
 import shutil
 import tempfile
 
@@ -170,3 +173,62 @@ class PostCreateFormTests(TestCase):
             follow=True
         )
         self.assertEqual(comments_count, self.post.comments.count())
+
+
+def make_image(size, image_format='JPEG', exif=None):
+    buffer = BytesIO()
+    options = {'exif': exif} if exif else {}
+    Image.new('RGB', size, 'red').save(buffer, image_format, **options)
+    return SimpleUploadedFile(
+        name=f'image.{image_format.lower()}',
+        content=buffer.getvalue(),
+        content_type=Image.MIME[image_format],
+    )
+
+
+@override_settings(
+    POST_IMAGE_MAX_SIZE=(100, 100),
+    POST_IMAGE_MAX_PIXELS=1_000_000,
+    POST_IMAGE_MAX_UPLOAD_SIZE=1024 * 1024,
+)
+class PostImageUploadTests(TestCase):
+    def clean_image(self, upload):
+        form = PostForm(data={'text': 'Пост'}, files={'image': upload})
+        self.assertTrue(form.is_valid(), form.errors)
+        return Image.open(form.cleaned_data['image'])
+
+    def test_large_image_downscaled(self):
+        """Большая картинка уменьшается до POST_IMAGE_MAX_SIZE"""
+        image = self.clean_image(make_image((400, 200)))
+        self.assertEqual(image.size, (100, 50))
+        self.assertEqual(image.format, 'JPEG')
+
+    def test_exif_stripped_and_applied(self):
+        """Поворот из EXIF применяется, а метаданные удаляются"""
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        image = self.clean_image(make_image((80, 40), exif=exif.tobytes()))
+        self.assertEqual(image.size, (40, 80))
+        self.assertFalse(image.getexif())
+
+    def test_too_many_pixels_rejected(self):
+        """Картинка с слишком большим числом точек отклоняется"""
+        with self.settings(POST_IMAGE_MAX_PIXELS=100):
+            form = PostForm(
+                data={'text': 'Пост'}, files={'image': make_image((20, 20))}
+            )
+            self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'too_many_pixels'
+        )
+
+    def test_large_file_rejected(self):
+        """Слишком большой файл отклоняется до декодирования"""
+        with self.settings(POST_IMAGE_MAX_UPLOAD_SIZE=10):
+            form = PostForm(
+                data={'text': 'Пост'}, files={'image': make_image((20, 20))}
+            )
+            self.assertFalse(form.is_valid())
+        self.assertEqual(
+            form.errors.as_data()['image'][0].code, 'file_too_large'
+        )
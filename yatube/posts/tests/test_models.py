@@ -1,8 +1,9 @@
 from django.contrib.auth import get_user_model
 from django.test import Client, TestCase
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.urls import reverse
-from ..models import Group, Post
+from ..models import Follow, Group, Post
 from django.core.files.uploadedfile import SimpleUploadedFile
 
 import shutil
@@ -98,3 +99,11 @@ class PostModelTest(TestCase):
             follow=True
         )
         self.assertFormError(response, 'form', 'text', 'Обязательное поле.')
+
+    def test_follow_unique(self):
+        """Повторная подписка на того же автора запрещена на уровне БД"""
+        reader = User.objects.create_user(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        with self.assertRaises(IntegrityError):
+            with transaction.atomic():
+                Follow.objects.create(user=reader, author=self.user)
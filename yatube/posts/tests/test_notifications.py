@@ -0,0 +1,215 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.models import QueuedTask
+from core.taskqueue import run_batch
+
+from ..models import (
+    NEW_COMMENT, NEW_POST, NEW_REPLY, Comment, Follow, Notification, Post,
+    UserCounters,
+)
+from ..notifications import deliver, expire, unread_count
+from ..tasks import send_post_notifications
+
+User = get_user_model()
+
+
+@override_settings(
+    TASK_BROKER='core.taskqueue.DatabaseBroker',
+    NOTIFICATION_BATCH_SIZE=2,
+)
+class FollowNotificationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        for index in range(3):
+            follower = User.objects.create_user(
+                username=f'reader{index}', email=f'reader{index}@yatube.ru'
+            )
+            Follow.objects.create(user=follower, author=cls.author)
+        silent = User.objects.create_user(username='silent')
+        Follow.objects.create(user=silent, author=cls.author)
+        User.objects.create_user(username='stranger', email='s@yatube.ru')
+
+    def test_new_post_notifies_followers_in_batches(self):
+        """Новый пост ставит задачу, она раскладывает письма подписчикам
+        с адресом по пачкам"""
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(QueuedTask.objects.count(), 1)
+        self.assertEqual(mail.outbox, [])
+        run_batch('worker', 1)
+        self.assertEqual(QueuedTask.objects.count(), 2)
+        run_batch('worker', 10)
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            [f'reader{index}@yatube.ru' for index in range(3)],
+        )
+        message = mail.outbox[0]
+        self.assertEqual(message.subject, 'Новый пост: author')
+        self.assertIn(f'/posts/{post.pk}/', message.body)
+
+    def test_edit_does_not_notify(self):
+        """Правка поста уведомлений не ставит"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        QueuedTask.objects.all().delete()
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertFalse(QueuedTask.objects.exists())
+
+
+@override_settings(TASK_BROKER='core.taskqueue.DatabaseBroker')
+class NotificationInboxTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.other = User.objects.create_user(username='other')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.other, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def run_tasks(self):
+        while run_batch('worker', 10):
+            pass
+
+    def unread(self, user):
+        return UserCounters.objects.get(user=user).unread_notifications
+
+    def test_new_post_delivered_to_followers(self):
+        """Новый пост попадает в уведомления всех подписчиков, повтор
+        пачки уведомления не удваивает"""
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.run_tasks()
+        for user in (self.reader, self.other):
+            with self.subTest(user=user.username):
+                notification = Notification.objects.get(user=user)
+                self.assertEqual(notification.kind, NEW_POST)
+                self.assertEqual(notification.actor, self.author)
+                self.assertEqual(self.unread(user), 1)
+        send_post_notifications(post.pk, [self.reader.pk, self.other.pk])
+        self.assertEqual(Notification.objects.count(), 2)
+        self.assertEqual(self.unread(self.reader), 1)
+
+    def test_comment_and_reply_notify_authors(self):
+        """Комментарий уведомляет автора поста, ответ - автора
+        комментария; о своих комментариях уведомлений нет"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.run_tasks()
+        Notification.objects.all().delete()
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        reply = Comment.objects.create(
+            post=post, author=self.other, parent=comment, text='Ответ'
+        )
+        Comment.objects.create(post=post, author=self.author, text='Свой')
+        self.run_tasks()
+        self.assertEqual(
+            sorted(Notification.objects.values_list(
+                'user__username', 'kind', 'comment_id'
+            )),
+            [
+                ('author', NEW_COMMENT, comment.pk),
+                ('author', NEW_COMMENT, reply.pk),
+                ('reader', NEW_REPLY, reply.pk),
+            ],
+        )
+
+    def test_header_counter_cached(self):
+        """Шапка показывает число непрочитанных из кеша, новое
+        уведомление сбрасывает кеш"""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.assertEqual(unread_count(self.reader), 0)
+        with self.assertNumQueries(0):
+            unread_count(self.reader)
+        self.run_tasks()
+        self.assertEqual(unread_count(self.reader), 1)
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertContains(response, 'badge-danger">1</span>')
+        etag = response['ETag']
+        deliver(NEW_COMMENT, [self.reader.pk], self.other.pk, post.pk)
+        response = self.reader_client.get(
+            reverse('posts:index'), HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertContains(response, 'badge-danger">2</span>')
+
+    def test_inbox_marks_read(self):
+        """Лента уведомлений показывает новые и отмечает их прочитанными"""
+        Post.objects.create(author=self.author, text='Пост в ленте')
+        self.run_tasks()
+        url = reverse('posts:notification_list')
+        response = self.reader_client.get(url)
+        self.assertContains(response, 'Пост в ленте')
+        self.assertContains(response, 'новое')
+        self.assertEqual(self.unread(self.reader), 0)
+        self.assertFalse(
+            Notification.objects.filter(user=self.reader, is_read=False)
+        )
+        self.assertNotContains(self.reader_client.get(url), 'новое')
+        self.assertRedirects(
+            Client().get(url), f'{reverse("login")}?next={url}'
+        )
+
+    @override_settings(NOTIFICATIONS_PER_PAGE=1)
+    def test_inbox_marks_only_shown(self):
+        """Прочитанными отмечаются только уведомления показанной
+        страницы"""
+        Post.objects.create(author=self.author, text='Первый пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+        self.run_tasks()
+        response = self.reader_client.get(
+            reverse('posts:notification_list')
+        )
+        self.assertContains(response, 'Второй пост')
+        self.assertEqual(self.unread(self.reader), 1)
+        self.assertEqual(unread_count(self.reader), 1)
+        self.assertEqual(
+            list(Notification.objects.filter(
+                user=self.reader, is_read=False
+            ).values_list('post__text', flat=True)),
+            ['Первый пост'],
+        )
+
+    @override_settings(
+        NOTIFICATION_READ_KEEP_DAYS=1,
+        NOTIFICATION_KEEP_DAYS=10,
+        NOTIFICATION_MAX_PER_USER=3,
+    )
+    def test_expire(self):
+        """Чистка удаляет старые уведомления, лишние сверх лимита и
+        пересчитывает счётчики"""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {index}')
+            for index in range(6)
+        ]
+        self.run_tasks()
+        now = timezone.now()
+        notifications = Notification.objects.filter(user=self.reader)
+        notifications.filter(post=posts[0]).update(
+            pub_date=now - timedelta(days=11)
+        )
+        notifications.filter(post=posts[1]).update(
+            is_read=True, pub_date=now - timedelta(days=2)
+        )
+        posts[5].delete()
+        self.assertEqual(self.unread(self.reader), 6)
+        self.assertEqual(expire(now), 4)
+        self.assertEqual(
+            set(notifications.values_list('post_id', flat=True)),
+            {posts[2].pk, posts[3].pk, posts[4].pk},
+        )
+        self.assertEqual(self.unread(self.reader), 3)
+        self.assertEqual(unread_count(self.reader), 3)
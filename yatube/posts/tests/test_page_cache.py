@@ -0,0 +1,122 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..counters import total_post_count
+from ..feed_cache import INDEX_FEED, feed_generation
+from ..models import Group, Post
+from .utils import on_commit_hooks
+
+User = get_user_model()
+
+
+class PageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост'
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'slug'}),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.pk}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_anonymous_page_cached(self):
+        """Повторная страница гостю отдаётся из кеша без представления"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                self.assertIsNotNone(first.context)
+                second = self.guest_client.get(url)
+                self.assertIsNone(second.context)
+                self.assertEqual(second.content, first.content)
+        with self.assertNumQueries(0):
+            self.guest_client.get(self.urls[0])
+
+    def test_new_post_invalidates_pages(self):
+        """Новый пост сбрасывает кеш лент"""
+        for url in self.urls:
+            self.guest_client.get(url)
+        with on_commit_hooks():
+            Post.objects.create(
+                author=self.user, group=self.group, text='Новый'
+            )
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.guest_client.get(url), 'Новый')
+
+    def test_feeds_bumped_after_commit(self):
+        """Лента сбрасывается ещё раз после коммита поста: страница,
+        прочитанная до коммита, не достанется по новой версии; число
+        постов меняется только после коммита"""
+        total = total_post_count()
+        with on_commit_hooks():
+            Post.objects.create(author=self.user, text='Новый')
+            generation = feed_generation(INDEX_FEED)
+            self.assertEqual(total_post_count(), total)
+        self.assertNotEqual(feed_generation(INDEX_FEED), generation)
+        self.assertEqual(total_post_count(), total + 1)
+
+    def test_group_change_invalidates_pages(self):
+        """Правка группы сбрасывает кеш её страницы и лент с её постами"""
+        for url in self.urls:
+            self.guest_client.get(url)
+        self.group.slug = 'renamed'
+        self.group.description = 'Новое описание'
+        with on_commit_hooks():
+            self.group.save()
+        self.assertContains(
+            self.guest_client.get(
+                reverse('posts:group_list', kwargs={'slug': 'renamed'})
+            ),
+            'Новое описание',
+        )
+        for url in self.urls[:3:2]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), '/group/renamed/'
+                )
+
+    def test_holes_per_user(self):
+        """Шапка, кнопка подписки, ссылка на правку и форма комментария
+        рисуются для каждого пользователя, остальное - общее"""
+        post_url = self.urls[3]
+        profile_url = self.urls[2]
+        for url in (post_url, profile_url):
+            self.author_client.get(url)
+        response = self.reader_client.get(post_url)
+        self.assertContains(response, 'Пользователь: reader')
+        self.assertNotContains(response, 'редактировать запись')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        response = self.author_client.get(post_url)
+        self.assertContains(response, 'редактировать запись')
+        response = self.guest_client.get(post_url)
+        self.assertContains(response, 'Войти')
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertContains(self.reader_client.get(profile_url), 'Подписаться')
+        self.assertNotContains(
+            self.author_client.get(profile_url), 'Подписаться'
+        )
+        for url in self.urls:
+            with self.subTest(url=url):
+                for client in (self.guest_client, self.reader_client):
+                    self.assertNotContains(client.get(url), '<!--hole')
@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-from ..models import Group, Post
+from http import HTTPStatus
+
+from ..models import Comment, Group, Post
+from ..paginators import CursorPaginator
 
 User = get_user_model()
 
@@ -52,3 +56,139 @@ class PaginatorViewsTest(TestCase):
         )
         self.assertEqual(
             len(response.context['page_obj']), PAGINATOR_PAGES_COUNT)
+
+
+@override_settings(POSTS_CURSOR_PAGINATION=True)
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        for i in range(1, 25):
+            Post.objects.create(
+                author=cls.user,
+                text=f'Тестовый пост {i}',
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+        cache.clear()
+
+    def test_cursor_pages_cover_feed(self):
+        """Курсоры вперёд проходят всю ленту без пропусков и повторов"""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        seen = []
+        cursor = ''
+        while cursor is not None:
+            response = self.authorized_client.get(
+                reverse('posts:index'), {'cursor': cursor}
+            )
+            page_obj = response.context['page_obj']
+            seen.extend(page_obj)
+            cursor = page_obj.next_cursor
+        self.assertEqual(seen, expected)
+
+    def test_cursor_previous_page(self):
+        """Курсор назад возвращает предыдущую страницу"""
+        first = self.authorized_client.get(reverse('posts:profile', kwargs={
+            'username': self.user.username
+        })).context['page_obj']
+        second = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            {'cursor': first.next_cursor},
+        ).context['page_obj']
+        back = self.authorized_client.get(
+            reverse('posts:profile', kwargs={'username': self.user.username}),
+            {'cursor': second.previous_cursor},
+        ).context['page_obj']
+        self.assertFalse(first.has_previous())
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        """Некорректный курсор открывает первую страницу"""
+        response = self.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'garbage'}
+        )
+        self.assertEqual(
+            len(response.context['page_obj']), PAGINATOR_PAGES_COUNT)
+        self.assertContains(response, '?cursor=')
+
+    def test_cursor_page_has_no_number(self):
+        """Методы страницы, которым нужен номер, сообщают о курсорах"""
+        page_obj = CursorPaginator(
+            Post.objects.all(), PAGINATOR_PAGES_COUNT
+        ).get_page(None)
+        for method in (
+            page_obj.next_page_number, page_obj.previous_page_number,
+            page_obj.start_index, page_obj.end_index,
+        ):
+            with self.subTest(method=method.__name__):
+                with self.assertRaisesMessage(
+                    NotImplementedError, 'next_cursor'
+                ):
+                    method()
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        for i in range(7):
+            reader = User.objects.create_user(username=f'reader{i}')
+            Comment.objects.create(
+                post=cls.post, author=reader, text=f'Комментарий {i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def comment_texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_post_shows_first_comments(self):
+        """Пост показывает первую страницу комментариев одним запросом
+        вместе с авторами"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        comments = response.context['comments']
+        self.assertEqual(
+            self.comment_texts(comments),
+            ['Комментарий 6', 'Комментарий 5', 'Комментарий 4'],
+        )
+        self.assertContains(response, 'data-comments-url')
+        with self.assertNumQueries(0):
+            self.assertEqual(comments[0].author.username, 'reader6')
+
+    def test_comment_pages(self):
+        """Фрагменты комментариев листаются курсором до конца"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        cursor = response.context['comments'].next_cursor
+        url = reverse('posts:comment_page', kwargs={'post_id': self.post.pk})
+        texts = []
+        while cursor:
+            with self.assertNumQueries(4):
+                response = self.client.get(url, {'cursor': cursor})
+            self.assertTemplateUsed(
+                response, 'posts/includes/comment_list.html'
+            )
+            self.assertNotContains(response, '<html')
+            comments = response.context['comments']
+            texts += self.comment_texts(comments)
+            cursor = comments.next_cursor
+        self.assertEqual(texts, [f'Комментарий {i}' for i in range(3, -1, -1)])
+        self.assertNotContains(response, 'data-comments-url')
+        self.assertEqual(
+            self.client.get(reverse(
+                'posts:comment_page', kwargs={'post_id': 0}
+            )).status_code,
+            HTTPStatus.NOT_FOUND,
+        )
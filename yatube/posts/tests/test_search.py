@@ -0,0 +1,92 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Comment, Post, SearchEntry
+from ..search import query_terms, search_posts, stem
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Красивые котики спят на диване'
+        )
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Собаки гуляют в парке'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, query):
+        return list(search_posts(query_terms(query)))
+
+    def test_stem(self):
+        """Разные формы слова приводятся к одной основе"""
+        for first, second in (
+            ('котики', 'котиков'),
+            ('красивая', 'красивого'),
+            ('гуляют', 'гулять'),
+            ('ёлки', 'елками'),
+        ):
+            with self.subTest(word=first):
+                self.assertEqual(stem(first), stem(second))
+
+    def test_search_word_forms(self):
+        """Пост находится по другой форме слова, все слова обязательны"""
+        self.assertEqual(self.search('котик'), [self.cats])
+        self.assertEqual(self.search('красивый котик'), [self.cats])
+        self.assertEqual(self.search('котик парк'), [])
+        self.assertEqual(query_terms('и в на'), [])
+
+    def test_search_comments(self):
+        """Слово из комментария находит пост, вхождение в пост выше"""
+        comment = Comment.objects.create(
+            post=self.dogs, author=self.author, text='Где живут котики?'
+        )
+        self.assertEqual(self.search('котики'), [self.cats, self.dogs])
+        comment.delete()
+        self.assertEqual(self.search('котики'), [self.cats])
+
+    def test_index_updated_on_edit(self):
+        """Редактирование поста обновляет только его записи индекса"""
+        Comment.objects.create(
+            post=self.cats, author=self.author, text='Пушистые'
+        )
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Черепахи'
+        post.save()
+        self.assertEqual(self.search('котики'), [])
+        self.assertEqual(self.search('черепаха пушистая'), [post])
+
+    def test_search_page(self):
+        """Страница поиска подсвечивает совпадения и сохраняет запрос
+        в ссылках навигации"""
+        for index in range(12):
+            Post.objects.create(author=self.author, text=f'Котик {index}')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'котики'}
+        )
+        page_obj = response.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 13)
+        self.assertContains(response, '<mark>Котик</mark> 11')
+        self.assertContains(response, '?q=%D0%BA')
+
+    def test_rebuild_index(self):
+        """Команда rebuild_search_index строит тот же индекс"""
+        entries = set(SearchEntry.objects.values_list(
+            'term', 'post_id', 'comment_id', 'weight'
+        ))
+        SearchEntry.objects.all().delete()
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(set(SearchEntry.objects.values_list(
+            'term', 'post_id', 'comment_id', 'weight'
+        )), entries)
@@ -0,0 +1,138 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from http import HTTPStatus
+
+from .. import threads
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENT_THREAD_DEPTH=2)
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.user, text='Тестовый пост')
+        cls.other_post = Post.objects.create(author=cls.user, text='Другой')
+        # Тред: корень - ответ - ответ на ответ - ещё глубже, и второй
+        # ответ корню; рядом ещё один корневой комментарий.
+        cls.root = cls.reply('Корень')
+        cls.first = cls.reply('Первый ответ', cls.root)
+        cls.nested = cls.reply('Ответ на ответ', cls.first)
+        cls.deep = cls.reply('Глубокий ответ', cls.nested)
+        cls.second = cls.reply('Второй ответ', cls.root)
+        cls.other_root = cls.reply('Другой корень')
+
+    @classmethod
+    def reply(cls, text, parent=None):
+        return Comment.objects.create(
+            post=cls.post, author=cls.user, text=text, parent=parent
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_paths(self):
+        """Путь ответа продолжает путь родителя, глубина на единицу
+        больше, у родителя считаются ответы"""
+        self.deep.refresh_from_db()
+        self.assertEqual(self.deep.depth, 3)
+        self.assertEqual(
+            self.deep.path,
+            ''.join(threads.segment(comment.pk) for comment in (
+                self.root, self.first, self.nested, self.deep
+            )),
+        )
+        self.root.refresh_from_db()
+        self.assertEqual(self.root.reply_count, 2)
+
+    def test_subtree_one_query(self):
+        """Поддерево до заданной глубины читается одним запросом в порядке
+        обхода"""
+        root = Comment.objects.get(pk=self.root.pk)
+        with self.assertNumQueries(1):
+            texts = self.texts(Comment.objects.feed().filter(
+                post=self.post
+            ).subtree(root.path, 2))
+        self.assertEqual(
+            texts,
+            ['Корень', 'Первый ответ', 'Ответ на ответ', 'Второй ответ'],
+        )
+        first = Comment.objects.get(pk=self.first.pk)
+        self.assertEqual(
+            self.texts(Comment.objects.subtree(first.path)),
+            ['Первый ответ', 'Ответ на ответ', 'Глубокий ответ'],
+        )
+
+    def test_post_detail_tree(self):
+        """Пост показывает корни с ответами до COMMENT_THREAD_DEPTH,
+        глубокие ветки свёрнуты"""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk})
+        )
+        self.assertEqual(self.texts(response.context['comments']), [
+            'Другой корень',
+            'Корень', 'Первый ответ', 'Ответ на ответ', 'Второй ответ',
+        ])
+        self.assertNotContains(response, 'Глубокий ответ')
+        thread_url = reverse('posts:comment_thread', kwargs={
+            'post_id': self.post.pk, 'comment_id': self.nested.pk
+        })
+        self.assertContains(response, f'data-comments-url="{thread_url}"')
+        response = self.client.get(thread_url)
+        self.assertEqual(self.texts(response.context['comments']), [
+            'Глубокий ответ'
+        ])
+        self.assertNotContains(response, '<html')
+        self.assertEqual(self.client.get(reverse(
+            'posts:comment_thread',
+            kwargs={'post_id': self.other_post.pk, 'comment_id': self.root.pk}
+        )).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_add_reply(self):
+        """Форма ответа прикрепляет комментарий к родителю того же поста"""
+        url = reverse('posts:add_comment', kwargs={'post_id': self.post.pk})
+        response = self.client.get(reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk}
+        ), {'reply_to': self.second.pk})
+        self.assertContains(
+            response, f'name="parent" value="{self.second.pk}"'
+        )
+        self.client.post(url, {'text': 'Ответ', 'parent': self.second.pk})
+        reply = Comment.objects.get(text='Ответ')
+        self.assertEqual(reply.parent_id, self.second.pk)
+        self.assertEqual(reply.depth, 2)
+        response = self.client.post(reverse(
+            'posts:add_comment', kwargs={'post_id': self.other_post.pk}
+        ), {'text': 'Чужой', 'parent': self.second.pk})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertFalse(Comment.objects.filter(text='Чужой').exists())
+
+    def test_max_depth(self):
+        """Ответ на самый глубокий комментарий становится ответом его
+        родителю"""
+        comment = Comment.objects.get(pk=self.deep.pk)
+        comment.depth = threads.MAX_DEPTH
+        self.assertEqual(threads.reply_parent(comment), self.nested)
+        comment.depth = threads.MAX_DEPTH - 1
+        self.assertEqual(threads.reply_parent(comment), comment)
+
+    def test_delete_branch(self):
+        """Удаление ветки удаляет ответы и поправляет счётчики"""
+        Comment.objects.get(pk=self.first.pk).delete()
+        self.assertFalse(Comment.objects.filter(
+            pk__in=[self.nested.pk, self.deep.pk]
+        ).exists())
+        self.assertEqual(Comment.objects.get(pk=self.root.pk).reply_count, 1)
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).comment_count, 3
+        )
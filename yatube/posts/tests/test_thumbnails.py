@@ -0,0 +1,167 @@
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from ..models import Post
+from ..templatetags.post_thumbnails import feed_picture
+from ..thumbnails import (
+    cached_thumbnail, generate_thumbnails, schedule_thumbnails
+)
+from ..variants import generate_variants, picture_sources
+from .utils import on_commit_hooks
+
+import os
+import shutil
+import tempfile
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        buffer = BytesIO()
+        Image.new('RGB', (1200, 800), 'red').save(buffer, 'JPEG')
+        cls.user = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('big.jpg', buffer.getvalue()),
+        )
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(
+            os.path.join(TEMP_MEDIA_ROOT, 'posts', 'variants'),
+            ignore_errors=True,
+        )
+
+    def test_tag_does_not_render_thumbnail(self):
+        """Шаблонный тег не строит миниатюру при отрисовке"""
+        picture = feed_picture(self.post.image)
+        self.assertIsNone(picture['thumbnail'])
+        self.assertIsNone(picture['sources'])
+        self.assertIsNone(cached_thumbnail(self.post.image))
+
+    def test_generated_thumbnail_is_read(self):
+        """Построенная заранее миниатюра отдаётся тегом"""
+        generate_thumbnails(self.post.image.name)
+        picture = feed_picture(self.post.image)
+        thumbnail = picture['thumbnail']
+        self.assertEqual((thumbnail.width, thumbnail.height), (960, 339))
+        self.assertEqual(picture['sources'][-1]['type'], 'image/jpeg')
+        self.assertIn('image/webp', [
+            source['type'] for source in picture['sources']
+        ])
+
+    def test_rolled_back_schedule_does_not_block_later_one(self):
+        """Построение, отменённое откатом транзакции, можно поставить
+        снова"""
+        try:
+            with transaction.atomic():
+                schedule_thumbnails(self.post.image)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        with on_commit_hooks():
+            schedule_thumbnails(self.post.image)
+        self.assertIsNotNone(cached_thumbnail(self.post.image))
+
+    def test_generated_thumbnail_resets_cached_pages(self):
+        """Готовая миниатюра сбрасывает закешированные ленты и страницу
+        поста, где была исходная картинка"""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:profile', kwargs={'username': 'author'}),
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}),
+        )
+        client = Client()
+        for url in urls:
+            client.get(url)
+        generate_thumbnails(self.post.image.name)
+        thumbnail = cached_thumbnail(self.post.image)
+        for url in urls[:2]:
+            with self.subTest(url=url):
+                self.assertContains(client.get(url), thumbnail.url)
+        self.assertContains(client.get(urls[2]), 'srcset')
+
+    def test_variants_have_requested_widths(self):
+        """Варианты строятся для всех ширин из настроек"""
+        generate_thumbnails(self.post.image.name)
+        for source in picture_sources(self.post.image):
+            with self.subTest(type=source['type']):
+                widths = [
+                    item.rsplit(' ', 1)[1]
+                    for item in source['srcset'].split(', ')
+                ]
+                self.assertEqual(widths, ['480w', '960w', '1440w'])
+
+    def test_variants_of_same_stem_differ(self):
+        """Картинки с одним именем и разными расширениями получают
+        свои варианты"""
+        posts = []
+        for fmt, color in (('jpeg', 'blue'), ('png', 'green')):
+            buffer = BytesIO()
+            Image.new('RGB', (1200, 800), color).save(buffer, fmt.upper())
+            posts.append(Post.objects.create(
+                author=self.user, text='Тёзка',
+                image=SimpleUploadedFile(f'cat.{fmt}', buffer.getvalue()),
+            ))
+        colors = []
+        for post in posts:
+            variants = generate_variants(post.image.name)
+            width, target = variants['jpeg'][0]
+            with Image.open(os.path.join(TEMP_MEDIA_ROOT, target)) as image:
+                colors.append(image.convert('RGB').getpixel((0, 0)))
+        self.assertNotEqual(
+            generate_variants(posts[0].image.name),
+            generate_variants(posts[1].image.name),
+        )
+        self.assertGreater(colors[0][2], colors[0][1])
+        self.assertGreater(colors[1][1], colors[1][2])
+
+    def test_variants_survive_cache_loss(self):
+        """Список вариантов хранится рядом с ними: после сброса кеша
+        шаблон находит их, а повторный запуск не открывает оригинал"""
+        generate_thumbnails(self.post.image.name)
+        sources = picture_sources(self.post.image)
+        cache.clear()
+        self.assertEqual(picture_sources(self.post.image), sources)
+        with mock.patch('posts.variants.Image.open') as image_open:
+            generate_variants(self.post.image.name)
+        image_open.assert_not_called()
+
+    def test_force_rebuilds_variants(self):
+        """Команда с --force строит готовые варианты заново"""
+        generate_thumbnails(self.post.image.name)
+        with mock.patch(
+            'posts.variants.Image.open', side_effect=Image.open
+        ) as image_open:
+            call_command('generate_thumbnails', stdout=StringIO())
+            image_open.assert_not_called()
+            call_command('generate_thumbnails', force=True, stdout=StringIO())
+            image_open.assert_called_once()
+        self.assertIsNotNone(picture_sources(self.post.image))
+
+    def test_backfill_command(self):
+        """Команда generate_thumbnails строит недостающие миниатюры"""
+        call_command('generate_thumbnails', stdout=StringIO())
+        self.assertIsNotNone(cached_thumbnail(self.post.image))
+        self.assertIsNotNone(picture_sources(self.post.image))
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Follow, Post, TimelineEntry
+from ..timeline import follow_feed
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новый пост попадает в материализованную ленту подписчика"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка дозаполняет ленту, отписка очищает её"""
+        Post.objects.create(author=self.author, text='Старый пост')
+        self.reader_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': self.author.username}
+        ))
+        self.assertEqual(TimelineEntry.objects.filter(
+            user=self.reader).count(), 1)
+        self.reader_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': self.author.username}
+        ))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.reader).exists()
+        )
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+    def test_heavy_author_read_on_demand(self):
+        """Посты популярного автора не раскладываются, но есть в ленте"""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост звезды')
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertIn(post, follow_feed(self.reader))
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=2)
+    def test_skipped_post_stays_after_author_loses_followers(self):
+        """Неразложенный пост остаётся в ленте и у новых подписчиков,
+        когда подписчиков у автора становится меньше порога"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        post = Post.objects.create(author=self.author, text='Пост звезды')
+        self.assertFalse(TimelineEntry.objects.exists())
+        Follow.objects.filter(user=other).delete()
+        self.assertIn(post, follow_feed(self.reader))
+        newcomer = User.objects.create_user(username='newcomer')
+        Follow.objects.create(user=newcomer, author=self.author)
+        self.assertIn(post, follow_feed(newcomer))
+        fresh = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertEqual(
+            list(follow_feed(newcomer).order_by('-pub_date')), [fresh, post]
+        )
@@ -6,7 +6,8 @@ from django import forms
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
 
-from ..models import Group, Post, Follow
+from ..models import Comment, Group, Post, Follow
+from ..notifications import unread_count
 
 import shutil
 import tempfile
@@ -202,22 +203,30 @@ class PostPagesTests(TestCase):
         self.assertEqual(test_image, self.post.image)
 
     def test_index_cache(self):
-        """Проверка кэширования главной страницы"""
+        """Главная страница кешируется, а новый или удалённый пост
+        сбрасывает кеш сразу"""
         default_response = self.authorized_client.get(
             reverse('posts:index')
         )
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        cached_response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(default_response.content, cached_response.content)
+
         new_post = Post.objects.create(text='cache test', author=self.user)
         create_response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(create_response, 'cache test')
+        self.assertContains(create_response, 'Без сигналов')
 
         new_post.delete()
-
         delete_response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(create_response.content, delete_response.content)
+        self.assertNotContains(delete_response, 'cache test')
 
-        cache.clear()
-
-        clean_response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(default_response.content, clean_response.content)
+    def test_group_cache_reset_by_comment(self):
+        """Новый комментарий сразу обновляет кешированную ленту группы"""
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertContains(self.authorized_client.get(url), 'Комментариев: 0')
+        Comment.objects.create(post=self.post, author=self.user, text='Ок')
+        self.assertContains(self.authorized_client.get(url), 'Комментариев: 1')
 
     def test_authorized_can_follow(self):
         """Авторизованный пользователь может подписываться
@@ -282,3 +291,50 @@ class PostPagesTests(TestCase):
         context = response.context['page_obj'].object_list
         follow_count = len(list(context))
         self.assertNotEqual(follow_count, posts_count)
+
+
+class FeedQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='slug',
+            description='Описание тестовой группы'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        for i in range(12):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=cls.reader, author=author)
+            post = Post.objects.create(
+                author=author,
+                text=f'Тестовый пост {i}',
+                group=cls.group,
+            )
+            Comment.objects.create(post=post, author=cls.reader, text='Ок')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def test_feed_query_count(self):
+        """Число запросов ленты не зависит от числа постов на странице"""
+        pages = {
+            reverse('posts:index'): 2,
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}): 2,
+            reverse('posts:profile', kwargs={'username': 'author0'}): 2,
+        }
+        for url, queries in pages.items():
+            with self.subTest(url=url):
+                cache.clear()
+                with self.assertNumQueries(queries):
+                    response = self.client.get(url)
+                self.assertContains(response, 'Комментариев: 1')
+
+    def test_follow_feed_query_count(self):
+        """Лента подписок строится фиксированным числом запросов"""
+        # Счётчик уведомлений шапки читается из кеша.
+        unread_count(self.reader)
+        with self.assertNumQueries(5):
+            self.reader_client.get(reverse('posts:follow_index'))
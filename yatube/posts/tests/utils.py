@@ -0,0 +1,17 @@
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def on_commit_hooks():
+    """Выполняет отложенные в блоке действия transaction.on_commit.
+
+    TestCase не фиксирует транзакцию, и сами они не срабатывают; аналог
+    captureOnCommitCallbacks(execute=True) из Django 3.2.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    while len(connection.run_on_commit) > start:
+        _, func = connection.run_on_commit.pop(start)
+        func()
@@ -0,0 +1,69 @@
+"""Деревья комментариев в материализованных путях.
+
+Путь комментария - путь родителя и собственный сегмент: первичный ключ
+в base36 фиксированной ширины. Строки путей сортируются в порядке обхода
+дерева в глубину, а поддерево занимает диапазон [path, path + PATH_END),
+поэтому тред или поддерево до заданной глубины читается одним
+упорядоченным запросом по индексу (post, path), без рекурсии. Ключ
+известен только после вставки, путь записывается следом в той же
+транзакции (AtomicSaveModel).
+"""
+from collections import defaultdict
+
+from django.db.models import Q
+
+from .models import PATH_END, Comment
+
+SEGMENT_WIDTH = 7
+SEGMENT_DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+# Ответ на комментарий глубже MAX_DEPTH становится ответом его родителю,
+# чтобы путь поместился в поле.
+MAX_DEPTH = Comment._meta.get_field('path').max_length // SEGMENT_WIDTH - 1
+
+
+def segment(pk):
+    digits = []
+    while pk:
+        pk, digit = divmod(pk, len(SEGMENT_DIGITS))
+        digits.append(SEGMENT_DIGITS[digit])
+    return ''.join(reversed(digits)).rjust(SEGMENT_WIDTH, '0')
+
+
+def reply_parent(comment):
+    """Комментарий, к которому прикрепляется ответ на comment."""
+    if comment.depth < MAX_DEPTH:
+        return comment
+    return comment.parent
+
+
+def assign_path(comment):
+    """Записывает путь и глубину только что созданного комментария."""
+    if comment.parent_id is None:
+        comment.path, comment.depth = segment(comment.pk), 0
+    else:
+        parent = comment.parent
+        comment.path = parent.path + segment(comment.pk)
+        comment.depth = parent.depth + 1
+    Comment.objects.filter(pk=comment.pk).update(
+        path=comment.path, depth=comment.depth
+    )
+
+
+def with_replies(roots, max_depth):
+    """Корневые комментарии, за каждым - его ответы не глубже max_depth
+    в порядке обхода; все ответы читаются одним запросом."""
+    roots = list(roots)
+    condition = Q()
+    for root in roots:
+        if root.reply_count:
+            condition |= Q(path__gt=root.path, path__lt=root.path + PATH_END)
+    if not condition or max_depth < 1:
+        return roots
+    replies = defaultdict(list)
+    for reply in Comment.objects.feed().filter(
+        condition, post_id=roots[0].post_id, depth__lte=max_depth
+    ).order_by('path'):
+        replies[reply.path[:SEGMENT_WIDTH]].append(reply)
+    return [
+        comment for root in roots for comment in (root, *replies[root.path])
+    ]
@@ -0,0 +1,135 @@
+"""Заранее подготовленные миниатюры картинок постов.
+
+Миниатюры и адаптивные варианты (posts.variants) строятся в фоновом пуле
+потоков после сохранения поста, а шаблоны только читают готовый
+результат и, пока его нет, показывают исходную картинку. Когда всё
+построено, ленты и страницы постов с картинкой сбрасываются, чтобы
+закешированная разметка с исходной картинкой не жила до конца TTL.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from .feed_cache import POST_PAGE, bump_feed, bump_post_feeds
+from .models import Post
+from .variants import generate_variants
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = {
+    'feed': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+_pending_lock = threading.Lock()
+
+
+def _sorl_thumbnail_name(source, geometry, options):
+    """Имя файла миниатюры, как его вычисляет
+    ThumbnailBackend.get_thumbnail, но без открытия картинки.
+
+    Повторяет sorl-thumbnail 12.7 и зовёт его закрытые _get_format и
+    _get_thumbnail_filename: при обновлении sorl сверить с его кодом
+    (расхождение ловит test_generated_thumbnail_is_read).
+    """
+    backend = default.backend
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def _thumbnail_file(source, geometry, options):
+    """Файл миниатюры, который построил бы sorl для этих параметров."""
+    return ImageFile(
+        _sorl_thumbnail_name(source, geometry, options), default.storage
+    )
+
+
+def cached_thumbnail(image, size='feed'):
+    """Готовая миниатюра или None; картинку не открывает и не декодирует."""
+    if not image:
+        return None
+    geometry, options = THUMBNAIL_SIZES[size]
+    return default.kvstore.get(
+        _thumbnail_file(ImageFile(image), geometry, options)
+    )
+
+
+def refresh_posts(name):
+    """Сбрасывает ленты и страницы постов с картинкой name."""
+    posts = list(Post.objects.filter(image=name).values_list(
+        'pk', 'author_id', 'group_id'
+    ))
+    for post_id, _, _ in posts:
+        bump_feed(POST_PAGE, post_id)
+    if posts:
+        bump_post_feeds(
+            [author_id for _, author_id, _ in posts],
+            [group_id for _, _, group_id in posts],
+        )
+
+
+def generate_thumbnails(name, force=False):
+    """Строит все размеры миниатюр и варианты для файла из MEDIA_ROOT;
+    с force варианты строятся заново."""
+    try:
+        generate_variants(name, force)
+        for geometry, options in THUMBNAIL_SIZES.values():
+            get_thumbnail(name, geometry, **options)
+        refresh_posts(name)
+    except Exception:
+        logger.exception('Не удалось построить миниатюры для %s', name)
+    finally:
+        with _pending_lock:
+            _pending.discard(name)
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def schedule_thumbnails(image):
+    """Ставит построение миниатюр в фоновый пул после коммита.
+
+    Файл попадает в _pending только после коммита: при откате
+    транзакции имя не остаётся в нём навсегда.
+    """
+    if not image:
+        return
+    name = image.name
+
+    def submit():
+        with _pending_lock:
+            if name in _pending:
+                return
+            _pending.add(name)
+        if settings.THUMBNAIL_WORKERS:
+            _get_executor().submit(generate_thumbnails, name)
+        else:
+            generate_thumbnails(name)
+
+    transaction.on_commit(submit)
@@ -0,0 +1,90 @@
+"""Материализованная лента подписок (fan-out-on-write).
+
+Новый пост сразу раскладывается в TimelineEntry всем подписчикам автора,
+поэтому follow_index читает ленту одним запросом по индексу
+(user, -pub_date). Посты авторов, у которых подписчиков не меньше
+TIMELINE_FANOUT_MAX_FOLLOWERS, не раскладываются, а подмешиваются
+при чтении (fan-out-on-read). Такой пост помечается in_timelines=False
+и подмешивается всегда, даже если подписчиков у автора потом стало
+меньше порога.
+"""
+from django.conf import settings
+from django.db.models import Exists, OuterRef, Q, Sum
+
+from .models import Follow, Post, TimelineEntry, UserCounters
+
+
+def is_fanout_author(author_id):
+    """Раскладываются ли посты автора по лентам подписчиков."""
+    return not UserCounters.objects.filter(
+        user_id=author_id,
+        follower_count__gte=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def fan_out_post(post):
+    """Кладёт пост в ленты всех подписчиков автора или помечает, что
+    он читается из ленты при чтении."""
+    if not is_fanout_author(post.author_id):
+        post.in_timelines = False
+        Post.objects.filter(pk=post.pk).update(in_timelines=False)
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in followers.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя уже разложенные посты автора;
+    остальные follow_feed подмешивает сам."""
+    posts = Post.objects.filter(
+        author_id=author_id, in_timelines=True
+    ).values_list('pk', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts.iterator()
+        ),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def follow_feed(user):
+    """Посты ленты подписок пользователя."""
+    pulled_authors = list(Follow.objects.filter(user=user).annotate(
+        pulled=Exists(Post.objects.filter(
+            author_id=OuterRef('author_id'), in_timelines=False
+        ))
+    ).filter(pulled=True).values_list('author_id', flat=True))
+    if not pulled_authors:
+        return Post.objects.filter(timeline_entries__user=user).order_by(
+            '-timeline_entries__pub_date'
+        )
+    materialized = TimelineEntry.objects.filter(user=user).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=materialized)
+        | Q(author_id__in=pulled_authors, in_timelines=False)
+    )
+
+
+def follow_feed_count(user):
+    """Число постов в ленте подписок по счётчикам авторов."""
+    return UserCounters.objects.filter(
+        user__following__user=user
+    ).aggregate(total=Sum('post_count'))['total'] or 0
@@ -13,7 +13,23 @@ urlpatterns = [
     path(
         'posts/<int:post_id>/comment/', views.add_comment, name='add_comment'
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.comment_page,
+        name='comment_page'
+    ),
+    path(
+        'posts/<int:post_id>/comments/<int:comment_id>/',
+        views.comment_thread,
+        name='comment_thread'
+    ),
+    path('search/', views.search, name='search'),
     path('follow/', views.follow_index, name='follow_index'),
+    path(
+        'notifications/',
+        views.notification_list,
+        name='notification_list'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
@@ -0,0 +1,141 @@
+"""Адаптивные варианты картинок постов для <picture> и srcset.
+
+Для каждой картинки строятся кадры ленты нескольких ширин в WebP, AVIF
+(если Pillow умеет его сохранять) и JPEG. Файлы лежат рядом с оригиналом
+в posts/variants/<имя файла>/<ширина>.<формат>, там же список готовых
+вариантов variants.json. Шаблон читает список из кеша и только при
+промахе - из хранилища, поэтому перезапуск процесса или вытеснение ключа
+не заставляют строить варианты заново.
+"""
+import json
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+try:
+    import pillow_avif  # noqa: F401
+except ImportError:
+    pass
+
+FEED_RATIO = 339 / 960
+# Сколько помнить, что у картинки ещё нет вариантов.
+MISSING_TIMEOUT = 60
+MIME_TYPES = {
+    'avif': 'image/avif',
+    'webp': 'image/webp',
+    'jpeg': 'image/jpeg',
+}
+
+
+def variant_formats():
+    """Форматы в порядке предпочтения; JPEG - запасной для <img>."""
+    Image.init()
+    formats = [fmt for fmt in ('avif', 'webp') if fmt.upper() in Image.SAVE]
+    return formats + ['jpeg']
+
+
+def variants_dir(name):
+    """Каталог вариантов по полному имени файла: у cat.jpg и cat.png
+    варианты разные."""
+    return os.path.join(
+        os.path.dirname(name), 'variants', os.path.basename(name)
+    )
+
+
+def variant_name(name, width, fmt):
+    return os.path.join(variants_dir(name), f'{width}.{fmt}')
+
+
+def manifest_name(name):
+    return os.path.join(variants_dir(name), 'variants.json')
+
+
+def _variants_key(name):
+    return f'image-variants:{name}'
+
+
+def load_manifest(name):
+    """Список вариантов из хранилища; пустой, если их ещё не строили."""
+    try:
+        with default_storage.open(manifest_name(name)) as manifest:
+            return json.loads(manifest.read())
+    except (OSError, ValueError, SuspiciousFileOperation):
+        # Имя вне MEDIA_ROOT: вариантов у такой картинки нет.
+        return {}
+
+
+def save_manifest(name, variants):
+    target = manifest_name(name)
+    # Хранилище не перезаписывает файлы, а даёт новому другое имя.
+    default_storage.delete(target)
+    default_storage.save(
+        target, ContentFile(json.dumps(variants).encode())
+    )
+
+
+def generate_variants(name, force=False):
+    """Строит недостающие варианты картинки (с force - все заново) и
+    сохраняет их список. Оригинал открывается, только если есть что
+    строить."""
+    targets = [
+        (width, fmt, variant_name(name, width, fmt))
+        for width in settings.IMAGE_VARIANT_WIDTHS
+        for fmt in variant_formats()
+    ]
+    missing = {
+        target for _, _, target in targets
+        if force or not default_storage.exists(target)
+    }
+    if missing:
+        with default_storage.open(name) as source:
+            image = ImageOps.exif_transpose(Image.open(source)).convert(
+                'RGB'
+            )
+    variants = {}
+    frames = {}
+    for width, fmt, target in targets:
+        if target in missing:
+            if width not in frames:
+                frames[width] = ImageOps.fit(
+                    image, (width, round(width * FEED_RATIO)), Image.LANCZOS,
+                )
+            buffer = BytesIO()
+            frames[width].save(
+                buffer, fmt.upper(), quality=settings.IMAGE_VARIANT_QUALITY,
+            )
+            default_storage.delete(target)
+            default_storage.save(target, ContentFile(buffer.getvalue()))
+        variants.setdefault(fmt, []).append((width, target))
+    if missing or not default_storage.exists(manifest_name(name)):
+        save_manifest(name, variants)
+    cache.set(_variants_key(name), variants, None)
+    return variants
+
+
+def picture_sources(image):
+    """Источники для <picture>: [{'type', 'srcset'}, ...] или None."""
+    if not image:
+        return None
+    key = _variants_key(image.name)
+    variants = cache.get(key)
+    if variants is None:
+        variants = load_manifest(image.name)
+        cache.set(key, variants, None if variants else MISSING_TIMEOUT)
+    if not variants:
+        return None
+    return [
+        {
+            'type': MIME_TYPES[fmt],
+            'srcset': ', '.join(
+                f'{default_storage.url(target)} {width}w'
+                for width, target in variants[fmt]
+            ),
+        }
+        for fmt in variant_formats() if fmt in variants
+    ]
@@ -1,84 +1,132 @@
 # -*- coding: cp1251 -*-
-from django.core.paginator import Paginator
+from django.conf import settings
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, get_object_or_404, redirect
-from .models import Post, Group, User, Follow
+from django.views.decorators.http import condition, require_safe
+from . import conditional, notifications, threads
+from .page_cache import page_cache
+from .models import Comment, Post, User, Follow
 from .forms import PostForm, CommentForm
+from .counters import get_counters, total_post_count
+from .feed_cache import GROUP_FEED, INDEX_FEED, PROFILE_FEED, feed_cache
+from .paginators import CursorPaginator, FeedPaginator
+from .search import query_terms, search_posts
+from .thumbnails import schedule_thumbnails
+from .timeline import follow_feed, follow_feed_count
 
 POSTS_PER_PAGE = 10
 
 
-def paginate_in_view(queryset, request):
-    page_number = request.GET.get('page')
-    paginator = Paginator(queryset, POSTS_PER_PAGE)
-    page_obj = paginator.get_page(page_number)
+def paginate_in_view(queryset, request, count=None):
+    cursor = request.GET.get('cursor')
+    if settings.POSTS_CURSOR_PAGINATION or cursor is not None:
+        paginator = CursorPaginator(queryset, POSTS_PER_PAGE, count)
+        page_obj = paginator.get_page(cursor)
+    else:
+        page_number = request.GET.get('page')
+        paginator = FeedPaginator(queryset, POSTS_PER_PAGE, count)
+        page_obj = paginator.get_page(page_number)
 
     return {
         'page_obj': page_obj,
-        'post_count': queryset.count()
+        'post_count': paginator.count,
     }
 
 
+@conditional.page_cache_headers
+@condition(etag_func=conditional.index_etag)
+@page_cache(conditional.index_version)
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.all()
     pagination_context = paginate_in_view(
         posts,
         request,
+        total_post_count(),
     )
     context = {
         'page_obj': pagination_context['page_obj'],
         'index': True,
+        'feed_cache': feed_cache(INDEX_FEED),
     }
     return render(request, template, context)
 
 
+@conditional.page_cache_headers
+@condition(etag_func=conditional.group_etag)
+@page_cache(conditional.group_version)
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
+    group = conditional.page_group(request, slug)
     posts = group.posts.all()
     pagination_context = paginate_in_view(
         posts,
         request,
+        group.post_count,
     )
     context = {
         'group': group,
         'page_obj': pagination_context['page_obj'],
+        'feed_cache': feed_cache(GROUP_FEED, group.pk),
     }
     return render(request, template, context)
 
 
+@conditional.page_cache_headers
+@condition(etag_func=conditional.profile_etag)
+@page_cache(conditional.profile_version)
 def profile(request, username):
     template = 'posts/profile.html'
-    following = False
-    user = get_object_or_404(User, username=username)
+    user = conditional.page_author(request, username)
+    counters = get_counters(user)
     posts = Post.objects.filter(author_id=user.id)
     pagination_context = paginate_in_view(
         posts,
         request,
+        counters.post_count,
     )
 
-    if request.user.is_authenticated:
-        followers = Follow.objects.filter(
-            author_id=user.id, user_id=request.user)
-        if followers:
-            following = True
-
     context = {
         'page_obj': pagination_context['page_obj'],
         'post_count': pagination_context['post_count'],
         'username': user,
-        'following': following,
+        'counters': counters,
+        'feed_cache': feed_cache(PROFILE_FEED, user.pk),
     }
     return render(request, template, context)
 
 
+def search(request):
+    template = 'posts/search.html'
+    query = request.GET.get('q', '').strip()
+    terms = query_terms(query)
+    page_obj = None
+    if terms:
+        #    ,     .
+        paginator = FeedPaginator(search_posts(terms), POSTS_PER_PAGE)
+        page_obj = paginator.get_page(request.GET.get('page'))
+    context = {
+        'query': query,
+        'search_terms': set(terms),
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
+@conditional.page_cache_headers
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+@page_cache(conditional.post_version)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__counters', 'group'), pk=post_id
+    )
     form = CommentForm()
-    comment = post.comments.all()
-    posts_count = Post.objects.filter(author=post.author).count()
+    comment = comment_page_obj(request, post.pk)
+    posts_count = get_counters(post.author).post_count
     title = post.text[0:30]
     context = {
         'post': post,
@@ -86,6 +134,70 @@ def post_detail(request, post_id):
         'posts_count': posts_count,
         'form': form,
         'comments': comment,
+        'collapse_depth': settings.COMMENT_THREAD_DEPTH,
+    }
+    return render(request, template, context)
+
+
+def comment_page_obj(request, post_id):
+    """  ,   -   
+     COMMENT_THREAD_DEPTH."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id, depth=0),
+        settings.COMMENTS_PER_PAGE,
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    page_obj.object_list = threads.with_replies(
+        page_obj.object_list, settings.COMMENT_THREAD_DEPTH
+    )
+    return page_obj
+
+
+@require_safe
+@conditional.page_cache_headers
+@condition(
+    etag_func=conditional.post_etag,
+    last_modified_func=conditional.post_last_modified,
+)
+def comment_page(request, post_id):
+    """    HTML."""
+    template = 'posts/includes/comment_list.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post': post,
+        'comments': comment_page_obj(request, post_id),
+        'collapse_depth': settings.COMMENT_THREAD_DEPTH,
+    }
+    return render(request, template, context)
+
+
+@require_safe
+@conditional.page_cache_headers
+@condition(
+    etag_func=lambda request, post_id, comment_id: conditional.post_etag(
+        request, post_id
+    ),
+    last_modified_func=lambda request, post_id, comment_id: (
+        conditional.post_last_modified(request, post_id)
+    ),
+)
+def comment_thread(request, post_id, comment_id):
+    """     HTML."""
+    template = 'posts/includes/comment_list.html'
+    comment = get_object_or_404(
+        Comment.objects.select_related('post').only(
+            'path', 'depth', 'post__id'
+        ),
+        pk=comment_id,
+        post_id=post_id,
+    )
+    collapse_depth = comment.depth + settings.COMMENT_THREAD_DEPTH
+    context = {
+        'post': comment.post,
+        'comments': Comment.objects.feed().filter(
+            post_id=post_id, depth__gt=comment.depth
+        ).subtree(comment.path, collapse_depth),
+        'collapse_depth': collapse_depth,
     }
     return render(request, template, context)
 
@@ -105,6 +217,8 @@ def post_create(request):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    if 'image' in form.changed_data:
+        schedule_thumbnails(post.image)
     return redirect('posts:profile', username=request.user)
 
 
@@ -131,6 +245,8 @@ def post_edit(request, post_id):
     post = form.save(commit=False)
     post.author = request.user
     post.save()
+    if 'image' in form.changed_data:
+        schedule_thumbnails(post.image)
     return redirect(return_view, post_id=post.pk)
 
 
@@ -142,6 +258,11 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
+        parent_id = request.POST.get('parent', '')
+        if parent_id.isdigit():
+            comment.parent = threads.reply_parent(get_object_or_404(
+                Comment, pk=parent_id, post_id=post_id
+            ))
         comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
@@ -149,13 +270,11 @@ def add_comment(request, post_id):
 @login_required
 def follow_index(request):
     template = 'posts/follow.html'
-    authors = Follow.objects.filter(user=request.user).values_list(
-        'author_id', flat=True
-    )
-    posts = Post.objects.filter(author_id__in=authors)
+    posts = follow_feed(request.user)
     pagination_context = paginate_in_view(
         posts,
         request,
+        follow_feed_count(request.user),
     )
 
     context = {
@@ -167,6 +286,26 @@ def follow_index(request):
     return render(request, template, context)
 
 
+@login_required
+def notification_list(request):
+    template = 'posts/notifications.html'
+    paginator = CursorPaginator(
+        request.user.notifications.all(), settings.NOTIFICATIONS_PER_PAGE
+    )
+    page_obj = paginator.get_page(request.GET.get('cursor'))
+    #     ,   .
+    unread_ids = [
+        notification.pk for notification in page_obj
+        if not notification.is_read
+    ]
+    if unread_ids:
+        notifications.mark_read(request.user, unread_ids)
+    context = {
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def profile_follow(request, username):
     following = get_object_or_404(User, username=username)
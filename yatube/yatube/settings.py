@@ -40,12 +40,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metrics.RequestMetricsMiddleware',
+    'core.profiling.SlowRequestProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.routers.ReplicaRoutingMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
@@ -60,7 +63,8 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.template_backends.InstrumentedTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -81,12 +85,84 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# База задаётся переменными окружения. DB_ENGINE: sqlite (по умолчанию,
+# DB_NAME - путь к файлу) или postgresql (DB_NAME, DB_USER, DB_PASSWORD,
+# DB_HOST, DB_PORT; нужен psycopg2). DB_REPLICAS - через запятую хосты
+# реплик только для чтения, для SQLite - пути к файлам (локально их
+# обновляет manage.py sync_replicas)
+DB_ENGINES = {
+    'sqlite': 'django.db.backends.sqlite3',
+    'postgresql': 'django.db.backends.postgresql',
+}
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+DB_DEFAULT_NAMES = {
+    'sqlite': os.path.join(BASE_DIR, 'db.sqlite3'),
+    'postgresql': 'yatube',
+}
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'ENGINE': DB_ENGINES[DB_ENGINE],
+        'NAME': os.getenv('DB_NAME', DB_DEFAULT_NAMES[DB_ENGINE]),
+        'USER': os.getenv('DB_USER', ''),
+        'PASSWORD': os.getenv('DB_PASSWORD', ''),
+        'HOST': os.getenv('DB_HOST', ''),
+        'PORT': os.getenv('DB_PORT', ''),
+        # Соединение живёт между запросами, а не открывается на каждый
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+    }
+}
+for number, replica in enumerate(
+    filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1
+):
+    DATABASES[f'replica{number}'] = {
+        **DATABASES['default'],
+        'NAME' if DB_ENGINE == 'sqlite' else 'HOST': replica.strip(),
+        'TEST': {'MIRROR': 'default'},
     }
+
+# Чтения представлений DATABASE_REPLICA_VIEWS идут в реплики
+# (core.routers), остальное - в основную базу. После записи пользователь
+# DATABASE_PRIMARY_STICKY_SECONDS читает из основной базы, чтобы видеть
+# свои изменения, пока реплики отстают
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+# Приложения, модели которых читаются из реплик; кеш в базе и очередь
+# задач всегда идут в основную базу
+DATABASE_REPLICA_APPS = ('posts', 'auth', 'sessions')
+DATABASE_REPLICA_VIEWS = (
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:comment_page',
+    'posts:comment_thread',
+    'posts:follow_index',
+    'api:post_list',
+    'api:group_posts',
+    'api:profile_posts',
+    'api:post_detail',
+    'api:comment_list',
+)
+DATABASE_PRIMARY_STICKY_SECONDS = 10
+DATABASE_PRIMARY_STICKY_COOKIE = 'use_primary'
+
+# PRAGMA для каждого нового соединения с SQLite (core.signals); профиль
+# выбирается переменной окружения SQLITE_PROFILE. rollback - умолчания
+# SQLite: запись блокирует читателей. wal - читатели не ждут писателей,
+# fsync только при контрольных точках, горячие страницы читаются через
+# mmap и кеш в 64 МБ, занятая база ждёт до 5 с вместо ошибки
+SQLITE_PROFILES = {
+    'rollback': {'journal_mode': 'DELETE', 'synchronous': 'FULL'},
+    'wal': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 5000,
+        'cache_size': -64 * 1024,
+        'mmap_size': 256 * 1024 * 1024,
+        'temp_store': 'MEMORY',
+    },
 }
+SQLITE_PRAGMAS = SQLITE_PROFILES[os.getenv('SQLITE_PROFILE', 'wal')]
 
 
 # Password validation
@@ -127,6 +203,9 @@ LOGIN_REDIRECT_URL = 'posts:index'
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Адрес сайта для ссылок в письмах
+SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
@@ -139,8 +218,145 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Сколько секунд общий прокси может отдавать анонимам ленты и посты без
+# перепроверки (posts.conditional); браузеры перепроверяют всегда
+PAGE_SHARED_MAX_AGE = 60
+
+# Размер страницы JSON API (posts.api_views)
+API_PAGE_SIZE = 20
+
+# Сколько комментариев показывает пост; следующие подгружаются
+# по курсору (posts:comment_page)
+COMMENTS_PER_PAGE = 20
+
+# До какой глубины ответы показываются сразу; более глубокие ветки
+# свёрнуты и подгружаются по ссылке (posts:comment_thread)
+COMMENT_THREAD_DEPTH = 3
+
+# Лента постов листается курсорами (?cursor=) вместо номеров страниц
+POSTS_CURSOR_PAGINATION = False
+
+# Посты авторов с таким числом подписчиков не раскладываются по лентам
+# подписок при публикации, а подмешиваются при чтении
+TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Как долго кешируется общее число постов для навигации по главной
+POSTS_TOTAL_COUNT_TIMEOUT = 60 * 5
+
+# TTL фрагментов лент: сбрасываются по поколению при изменении постов.
+# С кешем в памяти процесса сброс не виден другим процессам, поэтому TTL
+# короткий
+FEED_CACHE_TIMEOUT = 60 * 60 * 6
+FEED_CACHE_LOCAL_TIMEOUT = 20
+
+# Бэкенд кеша выбирается переменной окружения CACHE_BACKEND:
+# locmem - свой кеш у каждого процесса (по умолчанию),
+# file и db - общий кеш в каталоге или таблице без внешних сервисов
+# (для db нужен manage.py createcachetable),
+# memcached и redis - общий сетевой кеш по адресу из CACHE_LOCATION
+# (нужны pylibmc и django-redis из requirements.txt); соединений с ним
+# у процесса не больше CACHE_MAX_CONNECTIONS.
+CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', '', {}),
+    'file': (
+        'django.core.cache.backends.filebased.FileBasedCache',
+        os.path.join(BASE_DIR, 'cache'),
+        {},
+    ),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'yatube_cache', {}),
+    'memcached': (
+        'core.cache.PooledPyLibMCCache',
+        '127.0.0.1:11211',
+        {
+            'POOL_SIZE': int(os.getenv('CACHE_MAX_CONNECTIONS', 50)),
+            'binary': True,
+            'behaviors': {'tcp_nodelay': True, 'ketama': True},
+        },
+    ),
+    'redis': (
+        'django_redis.cache.RedisCache',
+        'redis://127.0.0.1:6379/1',
+        {
+            'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            'CONNECTION_POOL_KWARGS': {
+                'max_connections': int(os.getenv('CACHE_MAX_CONNECTIONS', 50)),
+            },
+        },
+    ),
+}
+CACHE_PROFILE = CACHE_BACKENDS[os.getenv('CACHE_BACKEND', 'locmem')]
+
+# Потоки фонового построения миниатюр; 0 - строить сразу после коммита
+THUMBNAIL_WORKERS = 2
+
+# Фоновые задачи (core.taskqueue). DatabaseBroker держит очередь в базе,
+# её выполняют воркеры manage.py run_tasks; ImmediateBroker выполняет
+# задачу сразу после коммита, без воркеров. Упавшая задача повторяется
+# через TASK_RETRY_DELAY секунд, пауза удваивается с каждой попыткой
+TASK_BROKER = os.getenv('TASK_BROKER', 'core.taskqueue.DatabaseBroker')
+TASK_MAX_ATTEMPTS = 5
+TASK_RETRY_DELAY = 30
+TASK_LEASE_SECONDS = 300
+TASK_BATCH_SIZE = 20
+# Периодические задачи: имя задачи - интервал в секундах
+TASK_PERIODIC = {
+    'posts.tasks.expire_notifications': 60 * 60,
+}
+
+# Сколько подписчиков получают уведомление о новом посте одной задачей
+NOTIFICATION_BATCH_SIZE = 200
+
+# Лента уведомлений: прочитанные хранятся NOTIFICATION_READ_KEEP_DAYS
+# дней, непрочитанные - NOTIFICATION_KEEP_DAYS, и у пользователя остаются
+# только NOTIFICATION_MAX_PER_USER последних
+NOTIFICATIONS_PER_PAGE = 20
+NOTIFICATION_READ_KEEP_DAYS = 30
+NOTIFICATION_KEEP_DAYS = 90
+NOTIFICATION_MAX_PER_USER = 500
+
+# Доля запросов, для которых core.metrics.RequestMetricsMiddleware
+# замеряет время, SQL, шаблоны и кеш (0 - только счёт запросов); метрики
+# по представлениям отдаются на /metrics/requests/
+REQUEST_METRICS_SAMPLE_RATE = float(
+    os.getenv('REQUEST_METRICS_SAMPLE_RATE', 1)
+)
+# Один и тот же SQL, выполненный за запрос столько раз, считается N+1
+REQUEST_METRICS_DUPLICATE_THRESHOLD = 5
+
+# Профили стеков запросов дольше SLOW_REQUEST_THRESHOLD_MS
+# (core.profiling); включаются переменной окружения SLOW_REQUEST_PROFILING
+SLOW_REQUEST_PROFILING = bool(os.getenv('SLOW_REQUEST_PROFILING'))
+SLOW_REQUEST_THRESHOLD_MS = int(os.getenv('SLOW_REQUEST_THRESHOLD_MS', 500))
+SLOW_REQUEST_PROFILE_INTERVAL_MS = 5
+SLOW_REQUEST_PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+SLOW_REQUEST_PROFILE_KEEP = 200
+
+# Больше стольких строк админка не считает для отфильтрованных списков
+ADMIN_COUNT_LIMIT = 10000
+
+# Размер пачки при записи поискового индекса
+SEARCH_BATCH_SIZE = 500
+
+# Ограничения и нормализация картинок постов при загрузке
+POST_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+POST_IMAGE_MAX_PIXELS = 50_000_000
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_QUALITY = 85
+POST_IMAGE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+# Ширины и качество адаптивных вариантов картинок постов (WebP/AVIF/JPEG)
+IMAGE_VARIANT_WIDTHS = (480, 960, 1440)
+IMAGE_VARIANT_QUALITY = 80
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.InstrumentedCache',
+        'LOCATION': os.getenv('CACHE_LOCATION', CACHE_PROFILE[1]),
+        'KEY_PREFIX': os.getenv('CACHE_KEY_PREFIX', 'yatube-dev'),
+        'OPTIONS': {
+            'BACKEND': CACHE_PROFILE[0],
+            'OPTIONS': CACHE_PROFILE[2],
+        },
     }
 }
@@ -9,6 +9,8 @@ urlpatterns = [
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', include('core.urls', namespace='core')),
+    path('api/v1/', include('posts.api_urls', namespace='api')),
 ]
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'